@@ -3,44 +3,19 @@ import re
 import yaml
 import os
 import sys
-from funasr import AutoModel
+import threading
+from vocabulary import VocabularyCorrector
+from result_cache import ResultCache
+from thread_tuning import apply_torch_threads
+from device_manager import DeviceManager
+from engine_process import ENGINE_CHILD_ENV
+from quantization import quantization_mode, quantize_auto_model
+from inference_scheduler import InferenceScheduler, INTERACTIVE, BATCH
+from resampler import MODEL_SAMPLE_RATE
+import tracing
+from model_store import get_base_path, resolve_user_path, resolve_model_path, require_local_model
 
-# === 路径解析辅助函数 ===
-def resolve_model_path(config_path_str):
-    """
-    逻辑：
-    1. 如果 config 为空 -> 返回 None (走云端)
-    2. 如果 config 是绝对路径且存在 -> 返回绝对路径
-    3. 如果 config 是相对路径 -> 拼接当前程序所在目录 -> 存在则返回，不存在则返回 None
-    """
-    if not config_path_str:
-        return None
-
-    # 获取程序运行的基础路径（兼容 源码运行 和 打包运行）
-    if getattr(sys, 'frozen', False):
-        #如果是打包后的 EXE/文件夹，base_path 是可执行文件所在目录
-        base_path = os.path.dirname(sys.executable)
-    else:
-        # 如果是 Python 源码运行，base_path 是当前文件所在目录的 上一级 (假设 asr_core.py 在 src/ 下)
-        # 你需要根据你的文件结构调整这里，通常指向 main.py 同级或项目根目录
-        base_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-
-    # 1. 尝试直接当作绝对路径
-    if os.path.isabs(config_path_str) and os.path.exists(config_path_str):
-        # print(f"✅ 发现绝对路径模型: {config_path_str}")
-        return config_path_str
-
-    # 2. 尝试当作相对路径拼接
-    full_path = os.path.join(base_path, config_path_str)
-    # 归一化路径分隔符
-    full_path = os.path.normpath(full_path)
-    
-    if os.path.exists(full_path):
-        # print(f"✅ 发现本地相对路径模型: {full_path}")
-        return full_path
-    
-    print(f"⚠️ Config指定了 '{config_path_str}' 但路径不存在: {full_path}")
-    return None
+# 路径解析 (get_base_path / resolve_user_path / resolve_model_path) 在 model_store 里，这里一并导出
 
 # === 读取配置 ===
 try:
@@ -62,10 +37,15 @@ local_asr_path_cfg = config.get("local_asr_path", "")
 disable_update_cfg = config.get("disable_update", True)
 vad_factor = config.get("vad_sensitivity_factor", 1.0)
 target_lang = config.get("language", "auto")
-device_cfg = config.get("device", "cuda")
+device_cfg = config.get("device", "auto")
 target_model_name = config.get("model_name", "iic/SenseVoiceSmall")
+# 离线模式: 只用 model_store provision 好的本地模型，校验不过直接报错，不会去 ModelScope 下载
+offline_mode = bool(config.get("offline_mode", False))
 # === 核心判定逻辑 ===
 final_model_path = resolve_model_path(local_asr_path_cfg)
+if offline_mode:
+    require_local_model(final_model_path, "local_asr_path")
+    disable_update_cfg = True
 
 if final_model_path:
     # 情况A: Config 指定了有效路径
@@ -84,19 +64,165 @@ DEFAULT_VAD_THRESHOLD = 0.5
 # 2. 根据因子计算新的阈值
 new_vad_threshold = DEFAULT_VAD_THRESHOLD * vad_factor
 
-# === 加载模型 ===
-model = AutoModel(
-    model=model_id,
-    trust_remote_code=True,
-    local_files_only=local_files_only, 
-    disable_update= disable_update_cfg,
-    device=device_cfg, 
-    vad_kwargs={
-        "threshold": new_vad_threshold 
-        # FSMN-VAD 模型通常使用 "threshold" 或 "vad_threshold" 
-        # 实际参数名请以 funasr 库所使用的模型参数为准，通常是 "threshold"。
-    }
-)
+# === 模型加载时机 ===
+# engine_process 模式下识别在子进程里跑，UI 进程 import 本模块只用到词典 / 后处理，不加载模型 (也不碰 torch)；
+# background_model_loading 时由 model_loader 在后台线程里和 VAD 并行加载 (界面不卡)；
+# 其他情况 import 时就加载，第一次识别不用等
+defer_model_loading = os.environ.get(ENGINE_CHILD_ENV) != "1" and (
+    bool(config.get("engine_process", False)) or bool(config.get("background_model_loading", True)))
+
+device_manager = None
+model = None
+# SenseVoice / VAD 可能在两个加载线程里同时加载，各用各的锁，互不等待
+_device_lock = threading.Lock()
+_model_lock = threading.Lock()
+_vad_lock = threading.Lock()
+
+def get_device_manager():
+    global device_manager
+    with _device_lock:
+        if device_manager is None:
+            # 推理线程数 (必须在第一次推理前设置)
+            apply_torch_threads(config)
+            # 推理设备：探测可用后端，GPU 出错时自动回退 CPU
+            device_manager = DeviceManager(config)
+    return device_manager
+
+# 过载降级用的更快的模型 (overload_strategies 里有 cheap_model 时)，用到才加载
+overload_model_path = resolve_model_path(config.get("overload_model_path", ""))
+fast_model = None
+
+def get_fast_model():
+    """没配置 overload_model_path 或加载失败返回 None (调用方退回主模型)"""
+    global fast_model, overload_model_path
+    if fast_model is None and overload_model_path:
+        try:
+            if offline_mode:
+                require_local_model(overload_model_path, "overload_model_path")
+            from funasr import AutoModel
+            fast_model = get_device_manager().load(lambda device, fp16: AutoModel(
+                model=overload_model_path,
+                trust_remote_code=True,
+                local_files_only=True,
+                disable_update=True,
+                device=device,
+                fp16=fp16,
+            ), name="降级模型")
+        except Exception as e:
+            print(f"❌ 降级模型加载失败，继续用主模型: {e}")
+            overload_model_path = None
+    return fast_model
+
+# int8 动态量化 (只在 CPU 上生效)：结果缓存的 key 要和 fp32 区分开
+quantize_mode = quantization_mode(config)
+quantize_cache_dir = resolve_user_path(config.get("quantize_cache_dir", "models/quantized"))
+
+def cache_model_tag(active_model):
+    """结果缓存里的模型标识：按这个模型实际有没有量化 (GPU 上 / 量化失败时配置了 int8 也是原精度)"""
+    quantized = getattr(active_model, "quantization", None)
+    return f"{model_id}#{quantized}" if quantized else model_id
+
+def _load_asr_model(device, fp16):
+    from funasr import AutoModel
+    auto_model = AutoModel(
+            model=model_id,
+            trust_remote_code=True,
+            local_files_only=local_files_only, 
+            disable_update= disable_update_cfg,
+            device=device, 
+            fp16=fp16,
+            vad_kwargs={
+                "threshold": new_vad_threshold 
+                # FSMN-VAD 模型通常使用 "threshold" 或 "vad_threshold" 
+                # 实际参数名请以 funasr 库所使用的模型参数为准，通常是 "threshold"。
+            }
+        )
+    if quantize_mode == "int8":
+        auto_model = quantize_auto_model(auto_model, device, config, cache_dir=quantize_cache_dir)
+    return auto_model
+
+def get_model():
+    global model
+    if model is None:
+        with _model_lock:
+            if model is None:
+                model = get_device_manager().load(_load_asr_model, name="SenseVoice")
+    return model
+
+if not defer_model_loading:
+    get_model()
+
+VAD_MODEL_NAME = "iic/speech_fsmn_vad_zh-cn-16k-common-pytorch"
+
+# 已加载的 VAD 模型按模型路径复用，Worker 反复重启 (切语言/灵敏度) 不会每次新建一份
+# 设备由 device_manager 统一决定 (回退到 CPU 时已加载的模型会一起搬过去)
+_vad_models = {}
+# 后台任务 (shared=False) 用的另一份，同样按模型路径复用：每个任务都新建的话 device_manager 里会越积越多
+_background_vad_models = {}
+
+def load_vad_model(cfg=None, shared=True):
+    """
+    加载 FSMN-VAD (支持本地路径)，失败返回 None。
+    shared=False 时用后台专用的那一份 (和实时听写在不同线程同时跑 VAD 的后台任务用，
+    同一时间只给一个后台任务用，界面上后台转写一次只跑一个)
+    """
+    with _vad_lock:
+        return _load_vad_model_locked(cfg if cfg is not None else config, shared)
+
+def _load_vad_model_locked(cfg, shared=True):
+    local_vad_path = resolve_model_path(cfg.get("local_vad_path", ""))
+    if cfg.get("offline_mode", offline_mode):
+        try:
+            require_local_model(local_vad_path, "local_vad_path")
+        except Exception as e:
+            print(f"❌ VAD 模型加载失败: {e}")
+            return None
+    cache_key = local_vad_path or VAD_MODEL_NAME
+    models = _vad_models if shared else _background_vad_models
+    if cache_key in models:
+        return models[cache_key]
+    if local_vad_path:
+        print(f"✅ Worker 锁定本地 VAD 模型: {local_vad_path}")
+        vad_model_id = local_vad_path
+        vad_local_only = True
+    else:
+        print(f"⚠️ 未找到本地 VAD 路径，尝试使用云端: speech_fsmn_vad_zh-cn-16k-common-pytorch")
+        vad_model_id = VAD_MODEL_NAME
+        vad_local_only = False
+
+    # 版本号只对云端模型有意义，本地路径带上它 ModelScope 可能还会去查一次
+    revision_kwargs = {} if vad_local_only else {"model_revision": "v2.0.4"}
+    try:
+        from funasr import AutoModel
+        # FSMN-VAD 很小，不用半精度
+        vad_model = get_device_manager().load(lambda device, fp16: AutoModel(
+            model=vad_model_id,
+            **revision_kwargs,
+            trust_remote_code=True,
+            disable_pbar=True,
+            max_end_silence_time=1000,
+            disable_update=True,
+            device=device,
+            local_files_only=vad_local_only
+        ), name="FSMN-VAD")
+    except Exception as e:
+        print(f"❌ VAD 模型加载失败: {e}")
+        return None
+    models[cache_key] = vad_model
+    return vad_model
+
+def set_vad_sensitivity(model_vad, factor):
+    """
+    把 FSMN-VAD 的 speech_noise_thres 设成 模型默认值 × factor：因子越小越灵敏 (小声也算说话)，越大越抗噪。
+    Worker 启动切分器时按 vad_sensitivity_factor 设置 (过载 raise_vad 再乘上 overload_vad_boost)，
+    离线评测 (evaluation / param_sweep) 按各自的配置设置。VAD 模型是共享的，谁用谁设。
+    """
+    opts = getattr(getattr(model_vad, "model", None), "vad_opts", None)
+    if opts is None or not hasattr(opts, "speech_noise_thres"):
+        return
+    if not hasattr(opts, "default_speech_noise_thres"):
+        opts.default_speech_noise_thres = opts.speech_noise_thres
+    opts.speech_noise_thres = opts.default_speech_noise_thres * float(factor)
 
 # === [补全] 漏掉的字典定义 (Window.py 需要用到 emo_set) ===
 emo_dict = {
@@ -123,6 +249,21 @@ lang_dict = {
 emo_set = {"😊", "😔", "😡", "😰", "🤢", "😮"}
 event_set = {"🎼", "👏", "😀", "😭", "🤧", "😷"}
 
+# === 用户纠错词典 (可选，文件修改后自动热加载) ===
+vocabulary_path = resolve_user_path(config.get("vocabulary_path", ""))
+vocabulary = VocabularyCorrector(vocabulary_path) if vocabulary_path else None
+
+# === 识别结果缓存 (文件转写 / 回放时复用推理结果) ===
+result_cache_path = resolve_user_path(config.get("result_cache_path", ""))
+result_cache_max_mb = config.get("result_cache_max_mb", 512)
+result_cache = None
+
+def get_result_cache():
+    global result_cache
+    if result_cache is None and result_cache_path:
+        result_cache = ResultCache(result_cache_path, result_cache_max_mb * 1024 * 1024)
+    return result_cache
+
 # === 核心处理函数 ===
 def clean_punctuation(text):
     if not text: return ""
@@ -136,36 +277,132 @@ def clean_punctuation(text):
     text = re.sub(r'\s+', ' ', text)
     return text.strip()
 
-def asr_transcribe(input_wav: np.ndarray, config_override=None) -> str:
+# === 推理调度：实时听写 (interactive) 优先，文件转写等批量任务 (batch) 按片让路 ===
+scheduler = InferenceScheduler(config)
+
+def transcribe_raw(input_wav: np.ndarray, language=None, use_itn=True, use_cache=False, fast=False,
+                   priority=INTERACTIVE, abort=None) -> str:
+    """
+    只做推理，返回模型原始富文本 (带 <|...|> 标签)。
+    use_cache=True 时先查结果缓存 (文件转写 / 回放模式用，实时麦克风几乎不可能命中)。
+    fast=True 时用降级模型 (有的话)，结果不进缓存。
+    priority: interactive (实时听写) / batch (后台任务，有实时请求时让路)
+    abort: 拿到推理位置后调用，返回 True 就不推理、返回 None (作废的投机识别排到了也不占模型)
+    """
+    current_lang = language or target_lang
+    active_model = get_fast_model() if fast else None
+    cache = get_result_cache() if use_cache and active_model is None else None
+    active_model = active_model or get_model()
+    key = None
+    if cache is not None:
+        key = ResultCache.make_key(input_wav, cache_model_tag(active_model), current_lang, use_itn)
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+    with scheduler.slot(priority):
+        if abort is not None and abort():
+            return None
+        res = active_model.generate(
+            input=input_wav,
+            cache={},
+            language=current_lang,
+            use_itn=use_itn,
+            batch_size=64
+        )
+    raw_text = res[0]["text"]
+    if cache is not None:
+        cache.put(key, raw_text)
+    return raw_text
+
+def transcribe_raw_batch(inputs, language=None, use_itn=True, use_cache=False, priority=INTERACTIVE):
+    """
+    一次推理多段音频 (多路输入共用一个模型时攒批用)，返回和 inputs 一一对应的原始富文本。
+    同一批必须是同一种语言 / use_itn。
+    priority=batch 时按 batch_slice_seconds 切成几次推理，每片之间给实时请求让路。
+    """
+    current_lang = language or target_lang
+    cache = get_result_cache() if use_cache else None
+    texts = [None] * len(inputs)
+    keys = [None] * len(inputs)
+    active_model = get_model()
+    if cache is not None:
+        tag = cache_model_tag(active_model)
+        for i, audio in enumerate(inputs):
+            keys[i] = ResultCache.make_key(audio, tag, current_lang, use_itn)
+            texts[i] = cache.get(keys[i])
+
+    todo = [i for i, t in enumerate(texts) if t is None]
+    if todo:
+        if priority == BATCH:
+            slices = [[todo[j] for j in part]
+                      for part in scheduler.batch_slices([len(inputs[i]) / MODEL_SAMPLE_RATE for i in todo])]
+        else:
+            slices = [todo]
+        for part in slices:
+            with scheduler.slot(priority):
+                res = active_model.generate(
+                    input=[inputs[i] for i in part],
+                    cache={},
+                    language=current_lang,
+                    use_itn=use_itn,
+                    batch_size=64
+                )
+            for i, r in zip(part, res):
+                texts[i] = r["text"]
+                if cache is not None:
+                    cache.put(keys[i], texts[i])
+    return texts
+
+def format_text(raw_text, use_emoji=False) -> str:
+    """把原始富文本处理成最终上屏文本 (emoji / 清洗标签 / 标点 / 用户词典)"""
+    text = raw_text
+    # Emoji 处理
+    if use_emoji:
+        for tag, icon in emoji_dict.items():
+            text = text.replace(tag, icon)
+
+    # 清洗 rich text tags
+    text = re.sub(r'<\|[^>]+\|>', '', text)
+    formatted_text = clean_punctuation(text)
+    if vocabulary is not None:
+        formatted_text = vocabulary.apply(formatted_text)
+    return formatted_text
+
+def asr_transcribe(input_wav: np.ndarray, config_override=None, use_cache=False, fast=False,
+                   priority=INTERACTIVE, abort=None) -> str:
     try:
         # === [修正] 动态参数优先 ===
         # 如果传入了新的配置(比如从菜单切了语言)，就用新的，否则用启动时的默认值
         current_lang = target_lang # 默认值
         use_emoji = False
+        use_itn = True
         
         if config_override:
             current_lang = config_override.get("language", target_lang)
             use_emoji = config_override.get("use_emoji", False)
-            
-        res = model.generate(
-            input=input_wav,
-            cache={},
-            language=current_lang, # 这里现在是动态的了
-            use_itn=True,
-            batch_size=64
-        )
-        text = res[0]["text"]
-        
-        # Emoji 处理
-        if use_emoji:
-            for tag, icon in emoji_dict.items():
-                text = text.replace(tag, icon)
-        
+            use_itn = config_override.get("use_itn", True)
+
+        with tracing.span("inference"):
+            raw_text = transcribe_raw(input_wav, current_lang, use_itn, use_cache=use_cache, fast=fast,
+                                      priority=priority, abort=abort)
     except Exception as e:
         print(f"推理错误: {e}")
         return ""
+    if raw_text is None:
+        return ""
 
-    # 清洗 rich text tags
-    text = re.sub(r'<\|[^>]+\|>', '', text)
-    formatted_text = clean_punctuation(text)
-    return formatted_text
+    with tracing.span("post_process"):
+        return format_text(raw_text, use_emoji)
+
+def asr_transcribe_batch(inputs, config_override=None, use_cache=False, priority=INTERACTIVE):
+    """asr_transcribe 的批量版，出错时退回逐条识别 (单条出错只影响那一条)"""
+    cfg = config_override or {}
+    current_lang = cfg.get("language", target_lang)
+    use_emoji = cfg.get("use_emoji", False)
+    use_itn = cfg.get("use_itn", True)
+    try:
+        raw_texts = transcribe_raw_batch(inputs, current_lang, use_itn, use_cache=use_cache, priority=priority)
+    except Exception as e:
+        print(f"批量推理错误，改为逐条识别: {e}")
+        return [asr_transcribe(audio, config_override, use_cache, priority=priority) for audio in inputs]
+    return [format_text(raw, use_emoji) for raw in raw_texts]
@@ -0,0 +1,147 @@
+import time
+import wave
+import threading
+import numpy as np
+from resampler import PolyphaseResampler, MODEL_SAMPLE_RATE
+
+
+def read_wav(path):
+    """读取 PCM WAV，返回 (float32 单声道 [-1, 1], 采样率)"""
+    with wave.open(path, "rb") as wf:
+        channels = wf.getnchannels()
+        width = wf.getsampwidth()
+        rate = wf.getframerate()
+        raw = wf.readframes(wf.getnframes())
+    return pcm_to_float(raw, width, channels), rate
+
+
+def pcm_to_float(raw, width, channels=1):
+    if width == 2:
+        samples = np.frombuffer(raw, dtype=np.int16).astype(np.float32) / 32767.0
+    elif width == 4:
+        samples = (np.frombuffer(raw, dtype=np.int32) / 2147483647.0).astype(np.float32)
+    elif width == 1:
+        samples = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0
+    elif width == 3:
+        b = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        v = (b[:, 0] | (b[:, 1] << 8) | (b[:, 2] << 16))
+        v = np.where(v & 0x800000, v - 0x1000000, v)
+        samples = (v / 8388607.0).astype(np.float32)
+    else:
+        raise ValueError(f"不支持的采样位宽: {width * 8} bit")
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1)
+    return samples
+
+
+def read_wav_16k(path):
+    """读取 WAV 并重采样到模型采样率"""
+    samples, rate = read_wav(path)
+    return PolyphaseResampler(rate, MODEL_SAMPLE_RATE).process(samples)
+
+
+def write_wav(path, samples, rate=MODEL_SAMPLE_RATE):
+    """float32 [-1, 1] -> 16bit PCM WAV"""
+    audio_int16 = (np.clip(samples, -1.0, 1.0) * 32767).astype(np.int16)
+    with wave.open(path, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(rate)
+        wf.writeframes(audio_int16.tobytes())
+
+
+class ReplayStream:
+    """
+    用音频数组模拟 PyAudio 输入流 (read / stop_stream / close 接口一致)，
+    用于回放测试: 按 speed 倍速节拍输出，loop=True 时循环播放。
+    给了 stream_callback 时和 PyAudio 回调模式一样: 后台线程按节拍每 chunk 调一次回调，不能再 read。
+    """
+
+    def __init__(self, samples, chunk, rate=16000, speed=1.0, loop=True, stream_callback=None):
+        self.rate = rate
+        self.pcm = (np.clip(np.asarray(samples, dtype=np.float32), -1.0, 1.0) * 32767).astype(np.int16)
+        self.chunk = chunk
+        self.speed = speed
+        self.loop = loop
+        self.pos = 0
+        self.frames_read = 0
+        self.active = True
+        self._clock_start = None
+        self.stream_callback = stream_callback
+        self._closed = False
+        self._running = threading.Event()
+        self._running.set()
+        self._feeder = None
+        if stream_callback is not None:
+            self._feeder = threading.Thread(target=self._feed_loop, name="replay-callback", daemon=True)
+            self._feeder.start()
+
+    def _feed_loop(self):
+        while not self._closed:
+            if not self.active:
+                self._running.wait()
+                continue
+            data = self.read(self.chunk)
+            if self.active and not self._closed:
+                self.stream_callback(data, self.chunk, None, 0)
+
+    def read(self, num_frames, exception_on_overflow=False):
+        if self._clock_start is None:
+            self._clock_start = time.perf_counter()
+            self._clock_frames = self.frames_read
+        out = np.zeros(num_frames, dtype=np.int16)
+        filled = 0
+        while filled < num_frames:
+            if self.pos >= len(self.pcm):
+                if not self.loop:
+                    break
+                self.pos = 0
+            n = min(num_frames - filled, len(self.pcm) - self.pos)
+            out[filled:filled + n] = self.pcm[self.pos:self.pos + n]
+            self.pos += n
+            filled += n
+        self.frames_read += num_frames
+
+        # 按倍速节拍阻塞，和真实麦克风一样 read 会等数据
+        if self.speed and self.speed > 0:
+            due = self._clock_start + (self.frames_read - self._clock_frames) / (self.rate * self.speed)
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        return out.tobytes()
+
+    @property
+    def exhausted(self):
+        """非循环模式下音频已经全部读完 (之后 read 返回静音)"""
+        return not self.loop and self.pos >= len(self.pcm)
+
+    def start_stream(self):
+        self._clock_start = None
+        self.active = True
+        self._running.set()
+
+    def stop_stream(self):
+        self.active = False
+        self._running.clear()
+
+    def is_active(self):
+        return self.active
+
+    def close(self):
+        self.active = False
+        self._closed = True
+        self._running.set()
+        if self._feeder is not None and self._feeder is not threading.current_thread():
+            self._feeder.join(timeout=1.0)
+
+
+def replay_stream_factory(samples, rate, speed=1.0, loop=True):
+    """
+    生成给 ASRWorkerThread(stream_factory=...) 用的工厂函数，
+    Worker 需要什么采集率就把回放音频重采样到什么采样率；回调模式下 Worker 会传 stream_callback。
+    """
+    def factory(worker_rate, chunk, stream_callback=None):
+        data = samples if worker_rate == rate else PolyphaseResampler(rate, worker_rate).process(samples)
+        return ReplayStream(data, chunk, rate=worker_rate, speed=speed, loop=loop,
+                            stream_callback=stream_callback)
+    return factory
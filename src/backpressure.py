@@ -0,0 +1,204 @@
+"""
+识别跟不上实时时的过载策略。
+
+Worker 线程只做 采集 + VAD 切分 (永远跟得上实时)，切好的段放进 DecodeQueue，由单独的识别线程消费。
+这样识别慢的时候积压的是 "待识别的语音段"，可以测量、可以处理，而不是录音缓冲区溢出、
+一直触发强制切分 (segmenter 里说的那个死循环)。
+
+- 积压测量: 队列里几段 / 多少秒音频、最老一段等了多久，按实测的识别速度 (RTF) 估算 "现在说的话多久后上屏" (lag)
+- lag 超过 overload_lag_seconds 进入降级模式，低于 overload_recover_seconds 持续 overload_recover_hold 秒后恢复；
+  补识别的积压 (put(..., replay=True)，模型加载期间攒的录音一次性切出来的段) 还没识别完时不进入降级
+- 降级时按 overload_strategies 依次生效:
+    merge        把排队的相邻段拼成一段识别 (少几次模型调用，强制切分的 1 秒重叠会去掉)
+    drop_oldest  估算 lag 还超过 overload_max_lag_seconds 时丢掉最老的段 (至少保留最新一段)
+    raise_vad    提高 VAD 阈值 / 噪声门限，少切出没用的段 (由 Worker 执行)
+    cheap_model  改用 overload_model_path 配置的更快的模型 (由 Worker 执行)
+- 状态变化回调 on_state(degraded, reason)，在锁外调用 (可能在 Worker 线程或识别线程里)，指标写进 metrics (overload_*)
+"""
+import time
+import threading
+from collections import deque
+
+import numpy as np
+
+import metrics
+import tracing
+from segmenter import Segment
+
+STRATEGIES = ("merge", "drop_oldest", "raise_vad", "cheap_model")
+
+
+class DecodeQueue:
+    def __init__(self, decode, config, on_state=None, on_thread_start=None):
+        # decode(segment) 在识别线程里调用；on_thread_start() 在识别线程启动时、第一次识别之前调用 (绑核用)
+        self.decode = decode
+        self.on_thread_start = on_thread_start
+        self.on_state = on_state
+        self.strategies = [s for s in config.get("overload_strategies", ["merge", "raise_vad", "drop_oldest"])
+                           if s in STRATEGIES]
+        self.enter_lag = config.get("overload_lag_seconds", 3.0)
+        self.exit_lag = config.get("overload_recover_seconds", 1.0)
+        self.recover_hold = config.get("overload_recover_hold", 5.0)
+        self.max_lag = config.get("overload_max_lag_seconds", 10.0)
+        self.merge_max_seconds = config.get("overload_merge_max_seconds", 20.0)
+
+        self._items = deque()               # (Segment, 入队时间)
+        self._cond = threading.Condition()
+        self._busy_since = None             # 正在识别的那段的入队时间
+        self._replay_ids = set()            # 还在排队的补识别段 (id)
+        self._busy_replay = False           # 正在识别的是补识别段
+        self._running = True
+        # 识别耗时 / 音频时长，指数平均；初始值按 SenseVoice 在普通 CPU 上的大致水平
+        self.rtf = 0.3
+        self.degraded = False
+        self._calm_since = None
+        self._thread = threading.Thread(target=self._loop, name="asr-decode", daemon=True)
+        self._thread.start()
+
+    # === Worker 线程 ===
+    def put(self, segment, replay=False):
+        """replay=True: 积压录音补识别出来的段，一下子进来很多，不算实时跟不上"""
+        with self._cond:
+            if replay:
+                self._replay_ids.add(id(segment))
+            self._items.append((segment, time.perf_counter()))
+            change = self._update_locked()
+            self._cond.notify()
+        self._notify(change)
+
+    def clear(self):
+        """丢掉还没开始识别的段 (停止时用)"""
+        with self._cond:
+            for segment, _ in self._items:
+                tracing.end(segment.trace_id, outcome="cleared")
+            self._items.clear()
+            self._replay_ids.clear()
+            change = self._update_locked()
+        self._notify(change)
+
+    def stop(self, timeout=5.0):
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        self._thread.join(timeout)
+
+    # === 测量 ===
+    def queued_seconds(self):
+        with self._cond:
+            return sum(seg.duration for seg, _ in self._items)
+
+    def _lag_locked(self, now):
+        """最老的还没出结果的段已经等了多久 + 排队音频按当前 RTF 还要识别多久"""
+        oldest = self._busy_since if self._busy_since is not None else (self._items[0][1] if self._items else None)
+        waited = now - oldest if oldest is not None else 0.0
+        return waited + sum(seg.duration for seg, _ in self._items) * self.rtf
+
+    def _update_locked(self):
+        """更新指标和降级状态；状态变了返回 (degraded, 原因)，由调用方放开锁之后 _notify"""
+        now = time.perf_counter()
+        lag = self._lag_locked(now)
+        metrics.set_gauge("overload_queue_depth", len(self._items))
+        metrics.set_gauge("overload_lag_s", round(lag, 2))
+        metrics.set_gauge("overload_rtf", round(self.rtf, 3))
+
+        change = None
+        if not self.degraded and lag > self.enter_lag and not (self._replay_ids or self._busy_replay):
+            self.degraded = True
+            self._calm_since = None
+            change = f"识别积压 {lag:.1f}s (RTF {self.rtf:.2f})"
+        elif self.degraded:
+            if lag < self.exit_lag:
+                if self._calm_since is None:
+                    self._calm_since = now
+                elif now - self._calm_since >= self.recover_hold:
+                    self.degraded = False
+                    change = "积压已消化"
+            else:
+                self._calm_since = None
+        if change is not None:
+            metrics.set_gauge("overload_state", "degraded" if self.degraded else "normal")
+            metrics.inc("overload_entries" if self.degraded else "overload_recoveries")
+            print(f"{'⚠️ 进入降级模式' if self.degraded else '✅ 退出降级模式'}: {change}")
+            return self.degraded, change
+        return None
+
+    def _notify(self, change):
+        if change is not None and self.on_state:
+            self.on_state(*change)
+
+    # === 识别线程 ===
+    def _take_locked(self):
+        """取下一段要识别的 (降级时先按策略丢弃 / 合并)"""
+        if self.degraded and "drop_oldest" in self.strategies:
+            now = time.perf_counter()
+            while len(self._items) > 1 and self._lag_locked(now) > self.max_lag:
+                segment, _ = self._items.popleft()
+                self._replay_ids.discard(id(segment))
+                metrics.inc("overload_dropped_segments")
+                metrics.inc("overload_dropped_seconds", segment.duration)
+                tracing.end(segment.trace_id, outcome="dropped")
+                print(f"🗑️ 识别跟不上，丢弃 {segment.duration:.1f}s 的积压语音")
+
+        segment, queued_at = self._items.popleft()
+        self._busy_replay = id(segment) in self._replay_ids
+        self._replay_ids.discard(id(segment))
+        if self.degraded and "merge" in self.strategies and self._items:
+            parts = [segment]
+            total = segment.duration
+            while self._items and total + self._items[0][0].duration <= self.merge_max_seconds:
+                nxt, _ = self._items.popleft()
+                self._replay_ids.discard(id(nxt))
+                parts.append(nxt)
+                total += nxt.duration
+            if len(parts) > 1:
+                segment = merge_segments(parts)
+                metrics.inc("overload_merged_segments", len(parts) - 1)
+        return segment, queued_at
+
+    def _loop(self):
+        if self.on_thread_start:
+            self.on_thread_start()
+        while True:
+            change = segment = None
+            with self._cond:
+                if self._running and not self._items:
+                    # 降级时空闲也要定期检查能不能恢复
+                    self._cond.wait(1.0 if self.degraded else None)
+                    if self.degraded:
+                        change = self._update_locked()
+                if not self._running:
+                    return
+                if self._items:
+                    segment, queued_at = self._take_locked()
+                    self._busy_since = queued_at
+            self._notify(change)
+            if segment is None:
+                continue
+            tracing.add_span(segment.trace_id, "decode_queue_wait", queued_at)
+            start = time.perf_counter()
+            try:
+                self.decode(segment)
+            except Exception as e:
+                print(f"识别错误: {e}")
+            spent = time.perf_counter() - start
+            if segment.duration > 0:
+                self.rtf = 0.7 * self.rtf + 0.3 * (spent / segment.duration)
+            with self._cond:
+                self._busy_since = None
+                self._busy_replay = False
+                change = self._update_locked()
+            self._notify(change)
+
+
+def merge_segments(parts):
+    """按流中位置拼接相邻段，前后重叠的部分 (强制切分保留的 1 秒) 只留一份"""
+    audio = [parts[0].audio]
+    end = parts[0].end
+    for seg in parts[1:]:
+        overlap = max(0, end - seg.start)
+        audio.append(seg.audio[overlap:])
+        end = max(end, seg.end)
+    for seg in parts[1:]:
+        tracing.end(seg.trace_id, outcome="merged")
+    return Segment(np.concatenate(audio), parts[0].start, end, forced=parts[-1].forced,
+                   trace_id=parts[0].trace_id)
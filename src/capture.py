@@ -0,0 +1,136 @@
+"""
+回调式录音 (配置 capture_mode: callback)。
+
+PyAudio 的回调在 PortAudio 自己的线程里把每一小块录音写进 CaptureRing，
+攒够消费端要的帧数 (一个 VAD 窗口) 才 set 一次 Event 叫醒 Worker，
+Worker 不再每 chunk 醒一次去阻塞读，也不用 sleep 凑节拍。
+
+CallbackStream 对外和 PyAudio 阻塞流接口一样 (read / start_stream / stop_stream / is_active / close)，
+Worker 的主循环、暂停逻辑不用区分两种模式；另外多一个 interrupt()，停止时叫醒正在等数据的 read。
+"""
+import time
+import threading
+
+import numpy as np
+
+import metrics
+
+# pyaudio.paContinue (这里不 import pyaudio，回放流也能用)
+PA_CONTINUE = 0
+
+
+class CaptureRing:
+    """
+    单生产者 / 单消费者环形缓冲区 (int16 单声道)，和 engine_process.SharedAudioRing 同样的做法:
+    写位置只有回调线程改、读位置只有 Worker 改，都是单调递增的总样本数，不需要锁。
+    """
+
+    def __init__(self, capacity):
+        self.capacity = int(capacity)
+        self._data = np.zeros(self.capacity, dtype=np.int16)
+        self.write_pos = 0
+        self.read_pos = 0
+        self.dropped = 0
+
+    def available(self):
+        return self.write_pos - self.read_pos
+
+    def write(self, pcm):
+        """写端: 放不下的部分直接丢弃 (Worker 卡在识别里太久)，返回实际写入的样本数"""
+        w = self.write_pos
+        n = min(len(pcm), self.capacity - (w - self.read_pos))
+        if n < len(pcm):
+            self.dropped += len(pcm) - n
+        if n <= 0:
+            return 0
+        start = w % self.capacity
+        first = min(n, self.capacity - start)
+        self._data[start:start + first] = pcm[:first]
+        if n > first:
+            self._data[:n - first] = pcm[first:n]
+        # 先写数据再移动写位置
+        self.write_pos = w + n
+        return n
+
+    def read(self, n):
+        r = self.read_pos
+        n = min(n, self.write_pos - r)
+        start = r % self.capacity
+        first = min(n, self.capacity - start)
+        if n > first:
+            out = np.concatenate((self._data[start:], self._data[:n - first]))
+        else:
+            out = self._data[start:start + n].copy()
+        self.read_pos = r + n
+        return out
+
+    def clear(self):
+        """读端: 丢掉所有未读数据"""
+        self.read_pos = self.write_pos
+
+
+class CallbackStream:
+    """
+    open_stream(callback) 负责打开真正的流 (PyAudio 的 stream_callback / 回放流)，返回流对象。
+    read(n) 等到环里有 n 帧才返回 (bytes)，被 interrupt / close 或等待超时时返回 b""。
+    """
+
+    def __init__(self, open_stream, rate, capacity_seconds=10.0):
+        self.rate = rate
+        self.ring = CaptureRing(int(rate * capacity_seconds))
+        self._ready = threading.Event()
+        self._want = 1
+        self._ready_at = 0.0
+        self._interrupted = False
+        self.frames_read = 0        # 回调收到的总帧数 (和 ReplayStream.frames_read 一样，压力测试按它算音频时长)
+        self.stream = open_stream(self._callback)
+
+    # === 回调线程 ===
+    def _callback(self, in_data, frame_count, time_info, status):
+        self.frames_read += frame_count
+        self.ring.write(np.frombuffer(in_data, dtype=np.int16))
+        if not self._ready.is_set() and self.ring.available() >= self._want:
+            self._ready_at = time.perf_counter()
+            self._ready.set()
+        return None, PA_CONTINUE
+
+    # === Worker 线程 ===
+    def read(self, num_frames, exception_on_overflow=False):
+        # 正常情况下一个 VAD 窗口内回调就会凑够；设备被拔掉等情况下超时返回，让 Worker 有机会检查状态
+        timeout = max(1.0, 4.0 * num_frames / self.rate)
+        while not self._interrupted:
+            if self.ring.available() >= num_frames:
+                dropped = self.ring.dropped
+                if dropped:
+                    metrics.set_gauge("capture_dropped_frames", dropped)
+                return self.ring.read(num_frames).tobytes()
+            self._want = num_frames
+            self._ready.clear()
+            # clear 之后再看一次，防止回调恰好在 clear 之前 set 过 (唤醒丢失)
+            if self.ring.available() >= num_frames:
+                continue
+            if not self._ready.wait(timeout):
+                return b""
+            # 回调凑够数据到 Worker 真正醒来的时间
+            metrics.set_gauge("capture_wake_latency_ms", round((time.perf_counter() - self._ready_at) * 1000, 2))
+        return b""
+
+    def interrupt(self):
+        """叫醒阻塞在 read 里的 Worker (停止时用)，之后 read 都直接返回 b"" """
+        self._interrupted = True
+        self._ready.set()
+
+    def start_stream(self):
+        # 暂停前留在环里的旧录音不要了
+        self.ring.clear()
+        self.stream.start_stream()
+
+    def stop_stream(self):
+        self.stream.stop_stream()
+
+    def is_active(self):
+        return self.stream.is_active()
+
+    def close(self):
+        self.interrupt()
+        self.stream.close()
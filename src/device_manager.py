@@ -0,0 +1,200 @@
+"""
+推理设备管理:
+- 启动时探测可用后端 (CUDA / MPS / CPU)，选能用的最快的那个
+- GPU 上可选半精度 (fp16)
+- 运行中遇到显存不足 / 驱动错误，自动把所有已注册的模型搬回 CPU 并重试，不用重启程序
+
+没有 GPU 的机器上也能测试回退逻辑 (配置 simulate_device_failure 或环境变量 ASRINPUT_SIMULATE_FAILURE):
+    probe    探测时假装 GPU 不可用
+    load     在 GPU 上加载模型时抛出驱动错误
+    oom:N    第 N 次推理时抛出 CUDA out of memory (只触发一次)
+"""
+import os
+import threading
+
+import metrics
+
+DEVICE_ERROR_PATTERNS = (
+    "out of memory", "cuda", "cudnn", "cublas", "device-side assert",
+    "driver", "expected all tensors to be on the same device", "mps",
+)
+
+
+class SimulatedDeviceError(RuntimeError):
+    pass
+
+
+def is_device_error(e):
+    try:
+        import torch
+        if isinstance(e, torch.cuda.OutOfMemoryError):
+            return True
+    except (ImportError, AttributeError):
+        pass
+    msg = str(e).lower()
+    return isinstance(e, RuntimeError) and any(p in msg for p in DEVICE_ERROR_PATTERNS)
+
+
+class GuardedModel:
+    """
+    包一层 AutoModel: generate() 出现设备错误时交给 DeviceManager 回退后重试，
+    其他属性原样透传，调用方 (asr_core / VADSegmenter) 不需要改写法。
+    """
+
+    def __init__(self, manager, model, name):
+        self._manager = manager
+        self._model = model
+        self.name = name
+
+    def generate(self, **kwargs):
+        return self._manager.generate(self, **kwargs)
+
+    def __getattr__(self, item):
+        return getattr(self._model, item)
+
+
+class DeviceManager:
+    def __init__(self, config):
+        self.preferred = str(config.get("device", "auto") or "auto").lower()
+        self.want_fp16 = bool(config.get("fp16", False))
+        self.auto_fallback = config.get("device_fallback", True)
+        self.simulate = str(os.environ.get("ASRINPUT_SIMULATE_FAILURE",
+                                           config.get("simulate_device_failure", "")) or "").lower()
+        self._simulate_oom_at = None
+        if self.simulate.startswith("oom:"):
+            self._simulate_oom_at = int(self.simulate.split(":", 1)[1])
+        self._lock = threading.RLock()
+        self._models = []
+        self.calls = 0
+        self.device = self.select_device()
+
+    # === 探测 ===
+    def probe(self):
+        """返回 [(设备, 是否可用, 说明)]，按速度从快到慢排列"""
+        results = []
+        try:
+            import torch
+        except ImportError:
+            return [("cpu", True, "torch 未安装")]
+
+        if self.simulate == "probe":
+            results.append(("cuda", False, "模拟: GPU 不可用"))
+        elif torch.cuda.is_available():
+            try:
+                # 真跑一次小运算，驱动坏了 is_available() 也可能返回 True
+                x = torch.ones((64, 64), device="cuda")
+                (x @ x).sum().item()
+                results.append(("cuda", True, torch.cuda.get_device_name(0)))
+            except Exception as e:
+                results.append(("cuda", False, str(e)))
+        else:
+            results.append(("cuda", False, "torch.cuda.is_available() = False"))
+
+        mps = getattr(torch.backends, "mps", None)
+        if mps is not None and mps.is_available():
+            try:
+                (torch.ones(4, device="mps") * 2).sum().item()
+                results.append(("mps", True, "Apple MPS"))
+            except Exception as e:
+                results.append(("mps", False, str(e)))
+
+        results.append(("cpu", True, f"{os.cpu_count()} cores"))
+        return results
+
+    def select_device(self):
+        if self.preferred == "cpu":
+            device = "cpu"
+        else:
+            probes = self.probe()
+            usable = [d for d, ok, _ in probes if ok]
+            for d, ok, info in probes:
+                print(f"🔍 设备探测: {d:5s} {'✅' if ok else '❌'} {info}")
+            if self.preferred == "auto":
+                device = usable[0]
+            elif self.preferred.split(":")[0] in usable:
+                device = self.preferred
+            else:
+                print(f"⚠️ 配置的设备 '{self.preferred}' 不可用，改用 {usable[0]}")
+                device = usable[0]
+        metrics.set_gauge("device", device)
+        print(f"🖥️ 推理设备: {device}{' (fp16)' if self.use_fp16_on(device) else ''}")
+        return device
+
+    def use_fp16_on(self, device):
+        return self.want_fp16 and device.startswith("cuda")
+
+    # === 加载 ===
+    def load(self, factory, name="model"):
+        """
+        factory(device=..., fp16=...) 返回 AutoModel。
+        在 GPU 上加载失败会自动改用 CPU 再试一次。
+        """
+        device = self.device
+        try:
+            if self.simulate == "load" and device != "cpu":
+                raise SimulatedDeviceError(f"模拟: {device} 驱动错误")
+            model = factory(device=device, fp16=self.use_fp16_on(device))
+        except Exception as e:
+            if device == "cpu" or not self.auto_fallback:
+                raise
+            print(f"❌ {name} 在 {device} 上加载失败 ({e})，改用 CPU")
+            self.fallback_to_cpu(reason=e)
+            model = factory(device="cpu", fp16=False)
+        guarded = GuardedModel(self, model, name)
+        with self._lock:
+            self._models.append(guarded)
+        return guarded
+
+    # === 推理 (带回退) ===
+    def generate(self, guarded, **kwargs):
+        try:
+            self._maybe_simulate_oom()
+            return guarded._model.generate(**kwargs)
+        except Exception as e:
+            if not self.auto_fallback or not (isinstance(e, SimulatedDeviceError) or is_device_error(e)):
+                raise
+            if self.device == "cpu" and not isinstance(e, SimulatedDeviceError):
+                raise
+            print(f"❌ {guarded.name} 推理出现设备错误 ({e})，切换到 CPU 重试")
+            self.fallback_to_cpu(reason=e)
+            return guarded._model.generate(**kwargs)
+
+    def _maybe_simulate_oom(self):
+        if self._simulate_oom_at is None:
+            return
+        with self._lock:
+            self.calls += 1
+            if self.calls == self._simulate_oom_at:
+                self._simulate_oom_at = None
+                raise SimulatedDeviceError("CUDA out of memory (模拟)")
+
+    def fallback_to_cpu(self, reason=None):
+        with self._lock:
+            previous = self.device
+            self.device = "cpu"
+            for guarded in self._models:
+                self._move_to_cpu(guarded._model)
+            try:
+                import torch
+                if previous.startswith("cuda") and torch.cuda.is_available():
+                    torch.cuda.empty_cache()
+            except Exception:
+                pass
+            metrics.set_gauge("device", "cpu")
+            metrics.inc("device_fallbacks")
+            print(f"🔁 模型已从 {previous} 转移到 CPU (原因: {reason})")
+
+    @staticmethod
+    def _move_to_cpu(model):
+        # FunASR AutoModel: model.model 是 torch 模块，kwargs["device"] 决定输入数据放在哪
+        module = getattr(model, "model", None)
+        if module is not None:
+            try:
+                module.to("cpu")
+                module.float()
+            except Exception as e:
+                print(f"⚠️ 模型转移到 CPU 失败: {e}")
+        kwargs = getattr(model, "kwargs", None)
+        if isinstance(kwargs, dict):
+            kwargs["device"] = "cpu"
+            kwargs["fp16"] = False
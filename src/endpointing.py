@@ -0,0 +1,92 @@
+import os
+import json
+from collections import deque
+import numpy as np
+
+import metrics
+
+
+class AdaptiveEndpointer:
+    """
+    自适应断句：学习说话人的句内停顿长度，动态调整 "静音几个窗口算说完"。
+
+    - observe_pause(hops): 静音了 hops 个窗口后又接着说了 -> 一次句内停顿
+    - observe_restart(hops): 刚断完句，很快 (hops 个窗口) 又开口了 -> 很可能是把一句话切断了，
+      按 (断句阈值 + hops) 记为一次句内停顿，让阈值往上走
+    - 阈值 = 最近停顿的 quantile 分位数 + margin，限制在 [endpoint_min_delay, endpoint_max_delay]
+
+    说得快的人停顿短，阈值会降下来少等；说得慢的人阈值升上去，不会被切成半句。
+    学到的停顿分布存到 state_path，下次启动接着用。
+    """
+
+    MIN_SAMPLES = 8
+
+    def __init__(self, config, chunk_ms=256, state_path=None):
+        chunk_sec = chunk_ms / 1000.0
+        self.chunk_sec = chunk_sec
+        self.default_count = max(1, int(config.get("vad_pause_delay", 0.8) / chunk_sec))
+        self.min_count = max(1, int(round(config.get("endpoint_min_delay", 0.5) / chunk_sec)))
+        self.max_count = max(self.min_count, int(round(config.get("endpoint_max_delay", 1.6) / chunk_sec)))
+        self.quantile = config.get("endpoint_quantile", 0.9)
+        self.margin = config.get("endpoint_margin_hops", 1)
+        self.pauses = deque(maxlen=config.get("endpoint_history", 200))
+        self.state_path = state_path
+        self._unsaved = 0
+        self.load()
+        self._update()
+
+    @property
+    def required_silence_count(self):
+        return self._required
+
+    def observe_pause(self, hops):
+        if hops > 0:
+            self.pauses.append(int(hops))
+            self._changed()
+
+    def observe_restart(self, hops):
+        # 只认 "很快" 又开口的情况 (不超过最小断句等待)，否则两句之间的正常间隔也会把阈值越推越高
+        if hops <= self.min_count:
+            self.pauses.append(int(self._required + hops))
+            self._changed()
+
+    def _changed(self):
+        self._update()
+        self._unsaved += 1
+        if self._unsaved >= 20:
+            self.save()
+
+    def _update(self):
+        if len(self.pauses) < self.MIN_SAMPLES:
+            required = self.default_count
+        else:
+            required = int(np.ceil(np.quantile(np.asarray(self.pauses), self.quantile))) + self.margin
+        self._required = int(min(self.max_count, max(self.min_count, required)))
+        metrics.set_gauge("endpoint_silence_hops", self._required)
+        metrics.set_gauge("endpoint_delay_s", round(self._required * self.chunk_sec, 3))
+        metrics.set_gauge("endpoint_samples", len(self.pauses))
+
+    def load(self):
+        if not self.state_path or not os.path.exists(self.state_path):
+            return
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+            self.pauses.extend(int(p) for p in state.get("pauses", []))
+        except Exception as e:
+            print(f"⚠️ 断句学习数据读取失败: {e}")
+
+    def save(self):
+        self._unsaved = 0
+        if not self.state_path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.state_path) or ".", exist_ok=True)
+            tmp = self.state_path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"pauses": list(self.pauses),
+                           "required_silence_count": self._required,
+                           "chunk_sec": self.chunk_sec}, f)
+            os.replace(tmp, self.state_path)
+        except Exception as e:
+            print(f"⚠️ 断句学习数据保存失败: {e}")
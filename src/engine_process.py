@@ -0,0 +1,311 @@
+"""
+把 VAD + ASR 放到子进程里跑 (配置 engine_process: true)。
+
+UI 进程 (Qt 界面 / keyboard 钩子 / 录音) 和推理进程不再抢同一个 GIL，识别时界面不卡；
+模型崩溃 (显卡驱动、native 扩展段错误) 也只会带走子进程，UI 进程自动重启它。
+
+- 音频: SharedAudioRing，一块共享内存做单生产者 / 单消费者环形缓冲区，
+  录音线程写进去，子进程从里面读，音频不经过 pickle / 管道。
+  读出来的是一份拷贝 (不是零拷贝)：读位置随即前移，写端马上可以覆盖那段空间
+- 结果和控制命令: multiprocessing.Pipe，消息都很小
+  父 -> 子: ("reset", epoch) / ("flush",) / ("config", dict) / ("stop",)
+  子 -> 父: ("ready", pid) / ("result", epoch, text, start, end, forced)
+- flush (暂停恢复 / 待机) 只丢掉还没切分的录音，已经切出来、正在识别的那句话结果照常回来
+- reset 还会让 epoch + 1，子进程带着 epoch 回结果，旧 epoch 的结果直接丢掉
+- 子进程短时间内崩溃太多次就不再重启: failed = True，failure 里是原因，Worker 据此通知界面
+"""
+import os
+import sys
+import time
+import multiprocessing as mp
+from multiprocessing import shared_memory
+
+import numpy as np
+
+import metrics
+from resampler import MODEL_SAMPLE_RATE
+
+ENGINE_CHILD_ENV = "ASRINPUT_ENGINE_CHILD"
+
+
+class SharedAudioRing:
+    """
+    共享内存环形缓冲区 (float32 单声道)。
+    头部 3 个 int64: 写位置 / 读位置 / 丢弃样本数，位置都是单调递增的总样本数，取模得到下标。
+    只有写端改写位置、只有读端改读位置，不需要锁。
+    """
+
+    HEADER_BYTES = 64
+
+    def __init__(self, capacity, name=None):
+        self.capacity = int(capacity)
+        size = self.HEADER_BYTES + self.capacity * 4
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+        else:
+            self.shm = _attach_shared_memory(name)
+        self.name = self.shm.name
+        self._header = np.ndarray((3,), dtype=np.int64, buffer=self.shm.buf)
+        self._data = np.ndarray((self.capacity,), dtype=np.float32, buffer=self.shm.buf,
+                                offset=self.HEADER_BYTES)
+        if name is None:
+            self._header[:] = 0
+
+    @property
+    def write_pos(self):
+        return int(self._header[0])
+
+    @property
+    def read_pos(self):
+        return int(self._header[1])
+
+    @property
+    def dropped(self):
+        return int(self._header[2])
+
+    def available(self):
+        return self.write_pos - self.read_pos
+
+    def write(self, samples):
+        """写端: 放不下的部分直接丢弃 (推理进程跟不上 / 正在重启)，返回实际写入的样本数"""
+        w = self.write_pos
+        free = self.capacity - (w - self.read_pos)
+        n = min(len(samples), free)
+        if n < len(samples):
+            self._header[2] += len(samples) - n
+        if n <= 0:
+            return 0
+        start = w % self.capacity
+        first = min(n, self.capacity - start)
+        self._data[start:start + first] = samples[:first]
+        if n > first:
+            self._data[:n - first] = samples[first:n]
+        # 先写数据再移动写位置，读端看到新位置时数据一定已经在了
+        self._header[0] = w + n
+        return n
+
+    def read(self, max_samples=None):
+        """读端: 取出所有 (或最多 max_samples 个) 未读样本 (拷贝出来，返回后这段空间就交还给写端)"""
+        r = self.read_pos
+        n = self.write_pos - r
+        if max_samples is not None:
+            n = min(n, max_samples)
+        if n <= 0:
+            return np.zeros(0, dtype=np.float32)
+        start = r % self.capacity
+        first = min(n, self.capacity - start)
+        if n > first:
+            out = np.concatenate((self._data[start:], self._data[:n - first]))
+        else:
+            out = self._data[start:start + n].copy()
+        self._header[1] = r + n
+        return out
+
+    def skip_to_latest(self, keep_samples=0):
+        """读端: 丢掉积压的旧音频，只保留最近 keep_samples 个"""
+        self._header[1] = max(self.read_pos, self.write_pos - int(keep_samples))
+
+    def close(self, unlink=False):
+        # numpy 视图必须先释放，否则 Windows 上 close 会报 BufferError
+        del self._header
+        del self._data
+        self.shm.close()
+        if unlink:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+
+
+def _attach_shared_memory(name):
+    # 子进程只是借用父进程的共享内存，由父进程负责 unlink
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13 没有 track 参数；spawn 出来的子进程和父进程共用一个 resource_tracker，
+        # 重复登记同一个名字没有影响，父进程 unlink 时一起注销
+        return shared_memory.SharedMemory(name=name)
+
+
+# === 子进程 ===
+def engine_main(ring_name, capacity, conn, config, data_ready, chunk_ms=256, epoch=0):
+    # 标记自己是推理进程：asr_core 在这里才真正加载模型
+    os.environ[ENGINE_CHILD_ENV] = "1"
+    src_dir = os.path.dirname(os.path.abspath(__file__))
+    if src_dir not in sys.path:
+        sys.path.insert(0, src_dir)
+
+    import asr_core
+    from segmenter import VADSegmenter
+    from endpointing import AdaptiveEndpointer
+    from thread_tuning import pin_engine_process
+
+    config = dict(config)
+    # 绑核要在第一次推理之前，OpenMP 线程池才会继承
+    pin_engine_process(config)
+    # spawn 时 asr_core 可能已经被主模块间接 import 过 (那时还是 "不加载" 模式)，这里显式加载
+    asr_core.get_model()
+    model_vad = asr_core.load_vad_model(config)
+    endpointer = None
+    if config.get("adaptive_endpointing", False):
+        endpointer = AdaptiveEndpointer(
+            config, chunk_ms=chunk_ms,
+            state_path=asr_core.resolve_user_path(config.get("endpoint_state_path", "log/endpoint_state.json")))
+    segmenter = VADSegmenter(model_vad, config, chunk_ms=chunk_ms, endpointer=endpointer)
+    ring = SharedAudioRing(capacity, name=ring_name)
+    # 加载模型期间 (或重启前) 积压的音频只留最后 1 秒
+    ring.skip_to_latest(MODEL_SAMPLE_RATE)
+    conn.send(("ready", os.getpid()))
+
+    try:
+        while True:
+            while conn.poll():
+                msg = conn.recv()
+                if msg[0] == "stop":
+                    return
+                if msg[0] in ("reset", "flush"):
+                    if msg[0] == "reset":
+                        epoch = msg[1]
+                    segmenter.reset()
+                    ring.skip_to_latest(0)
+                elif msg[0] == "config":
+                    config.update(msg[1])
+
+            data_ready.wait(0.2)
+            data_ready.clear()
+            samples = ring.read()
+            if not len(samples):
+                continue
+            for segment in segmenter.feed(samples):
+                text = asr_core.asr_transcribe(segment.audio, config_override=config)
+                conn.send(("result", epoch, text, segment.start, segment.end, segment.forced))
+    except (EOFError, BrokenPipeError, KeyboardInterrupt):
+        # 父进程没了
+        pass
+    finally:
+        if endpointer:
+            endpointer.save()
+        ring.close()
+
+
+# === 父进程 (UI 进程) 这边 ===
+class EngineProcess:
+    """
+    管理推理子进程: start / write(16k 音频) / poll() 取结果 / reset / stop。
+    子进程意外退出时 poll() 会自动重启它 (max_restarts 次 / restart_window 秒内，超过就放弃)。
+    """
+
+    def __init__(self, config, ring_seconds=30, chunk_ms=256):
+        self.config = dict(config)
+        self.chunk_ms = chunk_ms
+        self.capacity = int(ring_seconds * MODEL_SAMPLE_RATE)
+        self.max_restarts = self.config.get("engine_max_restarts", 5)
+        self.restart_window = self.config.get("engine_restart_window", 60)
+        # spawn: 所有平台行为一致，也避免 fork 带着 torch 线程状态
+        self.ctx = mp.get_context("spawn")
+        self.ring = None
+        self.proc = None
+        self.conn = None
+        self.data_ready = None
+        self.epoch = 0
+        self.ready = False
+        self.running = False
+        self.failed = False
+        self.failure = ""
+        self._restarts = []
+
+    def start(self):
+        if self.ring is None:
+            self.ring = SharedAudioRing(self.capacity)
+        self.data_ready = self.ctx.Event()
+        self.conn, child_conn = self.ctx.Pipe(duplex=True)
+        self.ready = False
+        self.proc = self.ctx.Process(
+            target=engine_main,
+            args=(self.ring.name, self.capacity, child_conn, self.config, self.data_ready, self.chunk_ms,
+                  self.epoch),
+            name="asr-engine", daemon=True)
+        self.proc.start()
+        child_conn.close()
+        self.running = True
+        print(f"🧩 推理进程已启动 (pid {self.proc.pid})")
+
+    def write(self, samples):
+        if self.ring is None or self.failed:
+            return
+        self.ring.write(samples)
+        self.data_ready.set()
+
+    def reset(self):
+        """丢掉录音和所有还没回来的结果"""
+        self.epoch += 1
+        self._send(("reset", self.epoch))
+
+    def flush(self):
+        """只丢掉还没切分的录音，已经在识别的结果照常回来"""
+        self._send(("flush",))
+
+    def update_config(self, values):
+        self.config.update(values)
+        self._send(("config", dict(values)))
+
+    def _send(self, msg):
+        try:
+            if self.conn is not None:
+                self.conn.send(msg)
+        except (OSError, BrokenPipeError):
+            pass
+
+    def poll(self):
+        """取回所有已出来的结果 [(text, start, end, forced)]，顺便检查子进程是否还活着"""
+        results = []
+        if not self.running:
+            return results
+        try:
+            while self.conn.poll():
+                msg = self.conn.recv()
+                if msg[0] == "ready":
+                    self.ready = True
+                    print(f"✅ 推理进程模型加载完成 (pid {msg[1]})")
+                elif msg[0] == "result" and msg[1] == self.epoch:
+                    results.append(msg[2:])
+        except (EOFError, OSError):
+            pass
+        if not self.proc.is_alive():
+            self._handle_crash()
+        metrics.set_gauge("engine_ring_backlog_s", round(self.ring.available() / MODEL_SAMPLE_RATE, 2))
+        metrics.set_gauge("engine_ring_dropped", self.ring.dropped)
+        return results
+
+    def _handle_crash(self):
+        code = self.proc.exitcode
+        metrics.inc("engine_crashes")
+        now = time.time()
+        self._restarts = [t for t in self._restarts if now - t < self.restart_window]
+        if len(self._restarts) >= self.max_restarts:
+            self.failure = f"推理进程 {self.restart_window} 秒内崩溃 {len(self._restarts) + 1} 次 (退出码 {code})"
+            print(f"❌ {self.failure}，不再重启")
+            self.running = False
+            self.failed = True
+            return
+        self._restarts.append(now)
+        print(f"⚠️ 推理进程意外退出 (退出码 {code})，正在重启...")
+        try:
+            self.conn.close()
+        except OSError:
+            pass
+        self.start()
+
+    def stop(self):
+        self.running = False
+        self._send(("stop",))
+        if self.proc is not None:
+            self.proc.join(timeout=3)
+            if self.proc.is_alive():
+                self.proc.terminate()
+                self.proc.join(timeout=1)
+        if self.conn is not None:
+            self.conn.close()
+        if self.ring is not None:
+            self.ring.close(unlink=True)
+            self.ring = None
@@ -0,0 +1,148 @@
+"""
+识别效果评测: 带标注的音频集 + 字错误率 (CER) + 按真实切分流程回放一遍的延迟 / 代价统计。
+param_sweep.py 用它在一组参数上逐个跑。
+
+标注集格式 (三选一):
+- 目录: 每个 xxx.wav 旁边放一个同名 xxx.txt (参考文本)
+- TSV:  每行 "音频路径<TAB>参考文本"，路径相对于 TSV 文件所在目录
+- JSONL: 每行 {"audio": 路径, "text": 参考文本}
+"""
+import os
+import re
+import json
+import time
+
+import numpy as np
+
+from resampler import MODEL_SAMPLE_RATE
+from segmenter import VADSegmenter
+
+# 空白、标点、emoji 都不算字 (中文字符属于 \w，会保留)
+_NON_CHAR = re.compile(r"[\W_]+", re.UNICODE)
+
+
+def normalize_text(text):
+    return _NON_CHAR.sub("", text or "").lower()
+
+
+def edit_distance(ref, hyp):
+    """Levenshtein 距离，按行向量化 (长音频的参考文本也能很快算完)"""
+    if not ref:
+        return len(hyp)
+    if not hyp:
+        return len(ref)
+    hyp_codes = np.array([ord(c) for c in hyp])
+    idx = np.arange(len(hyp) + 1)
+    prev = idx.copy()
+    for i, ch in enumerate(ref, 1):
+        cost = (hyp_codes != ord(ch)).astype(np.int64)
+        # 先算 删除 / 替换，再用前缀最小值处理同一行里的插入: cur[j] = min_k (tmp[k] + j - k)
+        tmp = np.empty_like(prev)
+        tmp[0] = i
+        tmp[1:] = np.minimum(prev[1:] + 1, prev[:-1] + cost)
+        prev = np.minimum.accumulate(tmp - idx) + idx
+    return int(prev[-1])
+
+
+def cer(ref, hyp):
+    """返回 (编辑距离, 参考文本字数)，多条汇总时用 sum(编辑距离) / sum(字数)"""
+    ref_n = normalize_text(ref)
+    return edit_distance(ref_n, normalize_text(hyp)), len(ref_n)
+
+
+def load_labeled_set(path):
+    """返回 [(音频路径, 参考文本)]"""
+    items = []
+    if os.path.isdir(path):
+        for name in sorted(os.listdir(path)):
+            stem, ext = os.path.splitext(name)
+            txt = os.path.join(path, stem + ".txt")
+            if ext.lower() == ".wav" and os.path.exists(txt):
+                with open(txt, "r", encoding="utf-8") as f:
+                    items.append((os.path.join(path, name), f.read().strip()))
+        return items
+
+    base = os.path.dirname(os.path.abspath(path))
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if path.lower().endswith(".jsonl"):
+                entry = json.loads(line)
+                audio, text = entry["audio"], entry["text"]
+            else:
+                audio, _, text = line.partition("\t")
+            items.append((os.path.join(base, audio), text.strip()))
+    return items
+
+
+def trailing_silence(audio, frame_ms=10, rel_threshold=0.1):
+    """段末尾有多少秒静音 (最后一个有声帧之后)，近似 "说完话到切分" 的等待时间"""
+    frame = int(MODEL_SAMPLE_RATE * frame_ms / 1000)
+    n = len(audio) // frame
+    if n == 0:
+        return 0.0
+    rms = np.sqrt(np.mean(audio[:n * frame].reshape(n, frame) ** 2, axis=1))
+    voiced = np.nonzero(rms > rms.max() * rel_threshold)[0]
+    if not len(voiced):
+        return 0.0
+    return (n - 1 - voiced[-1]) * frame_ms / 1000.0
+
+
+def evaluate(items, config, model_vad, transcribe, block_seconds=0.5):
+    """
+    items: [(名字, 参考文本, 16k 音频)]；transcribe(audio, config) -> 文本。
+    按块喂给 VADSegmenter (和 Worker 同一套切分逻辑)，统计:
+    - cer: 总编辑距离 / 总字数
+    - latency_mean_s / latency_p90_s: 自然断句的段，末尾静音 + 识别耗时 ≈ 说完到上屏
+    - force_cut_rate: 强制切分段占比
+    - rtf: 识别总耗时 / 音频总时长；decode_ratio: 送进模型的音频时长 / 音频总时长 (重叠、多切的代价)
+    """
+    block = int(block_seconds * MODEL_SAMPLE_RATE)
+    # 和实时听写一样，VAD 阈值按 vad_sensitivity_factor 设置
+    from asr_core import set_vad_sensitivity
+    set_vad_sensitivity(model_vad, config.get("vad_sensitivity_factor", 1.0))
+    edits = chars = 0
+    latencies = []
+    segments = forced = 0
+    asr_time = decoded = total = 0.0
+
+    for _, ref, audio in items:
+        segmenter = VADSegmenter(model_vad, config)
+        hyps = []
+        total += len(audio) / MODEL_SAMPLE_RATE
+
+        def handle(segs, end_of_file=False):
+            nonlocal segments, forced, asr_time, decoded
+            for seg in segs:
+                segments += 1
+                forced += seg.forced
+                decoded += seg.duration
+                start = time.perf_counter()
+                text = transcribe(seg.audio, config)
+                spent = time.perf_counter() - start
+                asr_time += spent
+                if not seg.forced and not end_of_file:
+                    latencies.append(trailing_silence(seg.audio) + spent)
+                if text:
+                    hyps.append(text)
+
+        for i in range(0, len(audio), block):
+            handle(segmenter.feed(audio[i:i + block]))
+        handle(segmenter.flush(), end_of_file=True)
+
+        e, n = cer(ref, "".join(hyps))
+        edits += e
+        chars += n
+
+    lat = np.asarray(latencies) if latencies else np.zeros(1)
+    return {
+        "cer": edits / max(chars, 1),
+        "latency_mean_s": float(lat.mean()),
+        "latency_p90_s": float(np.percentile(lat, 90)),
+        "force_cut_rate": forced / max(segments, 1),
+        "rtf": asr_time / max(total, 1e-9),
+        "decode_ratio": decoded / max(total, 1e-9),
+        "segments": segments,
+    }
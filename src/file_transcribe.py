@@ -0,0 +1,231 @@
+"""
+长音频文件流式转写 -> SRT / VTT / JSON 字幕。
+
+音频按块读取 (WAV 用内存映射)，经过和实时识别相同的 VAD 切分，
+每切出一段就识别并立即写出一条字幕，峰值内存和文件长度无关。
+
+    python src/file_transcribe.py 会议录音.wav -o 会议录音.srt
+    python src/file_transcribe.py 会议录音.wav --format vtt --language en
+"""
+import os
+import sys
+import json
+import struct
+import argparse
+import numpy as np
+
+from resampler import PolyphaseResampler, MODEL_SAMPLE_RATE
+from segmenter import VADSegmenter
+
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_IEEE_FLOAT = 0x0003
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+
+# === 分块读取音频 ===
+def open_wav_memmap(path):
+    """解析 WAV 头，返回 (np.memmap [帧, 声道], 采样率)，不会把整个文件读进内存"""
+    with open(path, "rb") as f:
+        riff, _, wave_id = struct.unpack("<4sI4s", f.read(12))
+        if riff not in (b"RIFF", b"RF64") or wave_id != b"WAVE":
+            raise ValueError(f"不是 WAV 文件: {path}")
+        fmt = None
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                raise ValueError(f"WAV 文件缺少 data 块: {path}")
+            chunk_id, chunk_size = struct.unpack("<4sI", header)
+            if chunk_id == b"fmt ":
+                raw = f.read(chunk_size)
+                tag, channels, rate, _, _, bits = struct.unpack("<HHIIHH", raw[:16])
+                if tag == WAVE_FORMAT_EXTENSIBLE and len(raw) >= 26:
+                    tag = struct.unpack("<H", raw[24:26])[0]
+                fmt = (tag, channels, rate, bits)
+            elif chunk_id == b"data":
+                data_offset = f.tell()
+                data_size = chunk_size
+                if riff == b"RF64" or data_size == 0xFFFFFFFF:
+                    data_size = os.path.getsize(path) - data_offset
+                break
+            else:
+                f.seek(chunk_size + (chunk_size & 1), 1)
+    if fmt is None:
+        raise ValueError(f"WAV 文件缺少 fmt 块: {path}")
+
+    tag, channels, rate, bits = fmt
+    if tag == WAVE_FORMAT_PCM and bits == 16:
+        dtype = np.int16
+    elif tag == WAVE_FORMAT_PCM and bits == 32:
+        dtype = np.int32
+    elif tag == WAVE_FORMAT_IEEE_FLOAT and bits == 32:
+        dtype = np.float32
+    else:
+        raise ValueError(f"暂不支持的 WAV 编码 (format={tag}, {bits} bit)")
+    frames = data_size // (np.dtype(dtype).itemsize * channels)
+    mm = np.memmap(path, dtype=dtype, mode="r", offset=data_offset, shape=(frames, channels))
+    return mm, rate
+
+
+def _to_float_mono(block):
+    if block.dtype == np.int16:
+        block = block.astype(np.float32) / 32767.0
+    elif block.dtype == np.int32:
+        block = (block / 2147483647.0).astype(np.float32)
+    else:
+        block = np.asarray(block, dtype=np.float32)
+    if block.ndim == 2:
+        block = block.mean(axis=1) if block.shape[1] > 1 else block[:, 0]
+    return block
+
+
+def iter_audio_blocks(path, block_seconds=2.0):
+    """逐块产出 (float32 单声道, 采样率)。WAV 走内存映射，其他格式需要安装 soundfile"""
+    if path.lower().endswith(".wav"):
+        mm, rate = open_wav_memmap(path)
+        block = int(rate * block_seconds)
+        for i in range(0, len(mm), block):
+            yield _to_float_mono(mm[i:i + block]), rate
+        return
+    try:
+        import soundfile as sf
+    except ImportError:
+        raise RuntimeError("非 WAV 文件需要安装 soundfile (pip install soundfile)，或先转换成 WAV")
+    rate = sf.info(path).samplerate
+    for block in sf.blocks(path, blocksize=int(rate * block_seconds), dtype="float32", always_2d=True):
+        yield _to_float_mono(block), rate
+
+
+# === 字幕输出 (每条立即写盘) ===
+def _timestamp(seconds, sep):
+    ms = int(round(seconds * 1000))
+    h, ms = divmod(ms, 3600000)
+    m, ms = divmod(ms, 60000)
+    s, ms = divmod(ms, 1000)
+    return f"{h:02d}:{m:02d}:{s:02d}{sep}{ms:03d}"
+
+
+class SrtWriter:
+    def __init__(self, f):
+        self.f = f
+
+    def write(self, index, start, end, text):
+        self.f.write(f"{index}\n{_timestamp(start, ',')} --> {_timestamp(end, ',')}\n{text}\n\n")
+        self.f.flush()
+
+    def close(self):
+        pass
+
+
+class VttWriter:
+    def __init__(self, f):
+        self.f = f
+        self.f.write("WEBVTT\n\n")
+
+    def write(self, index, start, end, text):
+        self.f.write(f"{index}\n{_timestamp(start, '.')} --> {_timestamp(end, '.')}\n{text}\n\n")
+        self.f.flush()
+
+    def close(self):
+        pass
+
+
+class JsonWriter:
+    """边写边输出一个 JSON 数组，中途中断也只差结尾的 ]"""
+
+    def __init__(self, f):
+        self.f = f
+        self.count = 0
+        self.f.write("[\n")
+
+    def write(self, index, start, end, text):
+        item = json.dumps({"index": index, "start": round(start, 3), "end": round(end, 3), "text": text},
+                          ensure_ascii=False)
+        self.f.write(("" if self.count == 0 else ",\n") + "  " + item)
+        self.f.flush()
+        self.count += 1
+
+    def close(self):
+        self.f.write("\n]\n")
+
+
+WRITERS = {"srt": SrtWriter, "vtt": VttWriter, "json": JsonWriter}
+
+
+def transcribe_file(path, out_path, fmt="srt", config=None, use_cache=True, block_seconds=2.0,
+                    priority="batch", shared_vad=True):
+    """
+    流式转写一个音频文件，返回写出的字幕条数。
+    默认按 batch 优先级推理：和实时听写在同一个进程里跑时，每段都给实时请求让路
+    (这时传 shared_vad=False，用后台专用的 VAD 实例，不和 Worker 抢同一个；它跨任务复用，不会每次新建)。
+    """
+    # 放在函数里导入：加载模型比较慢，--help 之类不需要
+    import asr_core
+    config = dict(asr_core.config if config is None else config)
+
+    model_vad = asr_core.load_vad_model(config, shared=shared_vad)
+    if not shared_vad:
+        # 后台实例只有这里在用，按本次任务的配置设阈值 (共享实例的阈值归 Worker 管)
+        asr_core.set_vad_sensitivity(model_vad, config.get("vad_sensitivity_factor", 1.0))
+    segmenter = VADSegmenter(model_vad, config)
+    resampler = None
+    count = 0
+    last_end = 0.0
+
+    with open(out_path, "w", encoding="utf-8") as f:
+        writer = WRITERS[fmt](f)
+
+        def handle(segments):
+            nonlocal count, last_end
+            for segment in segments:
+                text = asr_core.asr_transcribe(segment.audio, config_override=config, use_cache=use_cache,
+                                               priority=priority)
+                if not text:
+                    continue
+                # 强制切分有 1 秒重叠，字幕时间轴不重叠
+                start = max(segment.start / MODEL_SAMPLE_RATE, last_end)
+                end = segment.end / MODEL_SAMPLE_RATE
+                count += 1
+                writer.write(count, start, end, text)
+                last_end = end
+                print(f"[{_timestamp(start, '.')} -> {_timestamp(end, '.')}] {text}")
+
+        for block, rate in iter_audio_blocks(path, block_seconds):
+            if resampler is None:
+                resampler = PolyphaseResampler(rate, MODEL_SAMPLE_RATE)
+            handle(segmenter.feed(resampler.process(block)))
+        handle(segmenter.flush())
+        writer.close()
+
+    cache = asr_core.get_result_cache() if use_cache else None
+    if cache is not None:
+        print(f"📦 结果缓存: {cache.stats()}")
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="长音频文件流式转写为字幕")
+    parser.add_argument("input", help="音频文件 (WAV；其他格式需要 soundfile)")
+    parser.add_argument("-o", "--output", help="输出路径 (默认与输入同名)")
+    parser.add_argument("--format", choices=sorted(WRITERS), default=None, help="输出格式 (默认按扩展名，否则 srt)")
+    parser.add_argument("--language", help="识别语言 (默认读取 config.yaml)")
+    parser.add_argument("--no-cache", action="store_true", help="不使用识别结果缓存")
+    args = parser.parse_args()
+
+    fmt = args.format
+    if fmt is None and args.output:
+        fmt = os.path.splitext(args.output)[1].lstrip(".").lower()
+    if fmt not in WRITERS:
+        fmt = "srt"
+    out_path = args.output or os.path.splitext(args.input)[0] + "." + fmt
+
+    import asr_core
+    config = dict(asr_core.config)
+    if args.language:
+        config["language"] = args.language
+
+    count = transcribe_file(args.input, out_path, fmt, config, use_cache=not args.no_cache)
+    print(f"✅ 共 {count} 条字幕，已写入 {out_path}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,201 @@
+"""
+飞行记录仪 (配置 flight_recorder_minutes > 0)：内存里一直保留最近 N 分钟的原始录音 + Worker 的决策事件，
+用户说 "卡了" / "同一句打了两遍" 时按热键或托盘菜单存下来，拿回来用同一套流水线回放复现。
+
+- 录音: 采集率下的 int16 原始 PCM (重采样 / 降噪之前)，固定大小的环形缓冲区，写满后覆盖最老的
+- 事件: (样本位置, 时间, 类型, 数据)，固定条数的 deque；样本位置是写入录音环的累计样本数，
+  回放时按同样的位置对齐 (VAD 状态、静音计数、强制切分、识别结果、暂停恢复、降级 ...)
+- 平时每个录音块只多一次数组拷贝和几次 deque.append
+- 保存为目录: audio.wav + events.jsonl + meta.json (当时的配置)
+
+命令行:
+    python src/flight_recorder.py show   log/flight_20250101_120000        打印事件时间线
+    python src/flight_recorder.py replay log/flight_20250101_120000        用保存的配置和录音重跑 Worker，对比事件
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from collections import deque
+
+import numpy as np
+
+# 回放时遇到这些事件要在同样的位置重置流水线 (原来是用户操作 / 重启 Worker 触发的，录音里体现不出来)
+REPLAY_RESET_EVENTS = ("resume", "worker_start")
+
+
+class FlightRecorder:
+    def __init__(self, sample_rate, minutes=5.0, max_events=20000, config=None):
+        self.sample_rate = int(sample_rate)
+        self.capacity = max(1, int(self.sample_rate * minutes * 60))
+        self.config = dict(config or {})
+        self._pcm = np.zeros(self.capacity, dtype=np.int16)
+        self._events = deque(maxlen=max_events)
+        self._lock = threading.Lock()
+        self.position = 0          # 累计写入的样本数
+        self.started = time.time()
+
+    # === Worker 线程 ===
+    def write(self, data):
+        """写入一块原始录音 (PyAudio 读出来的 bytes 或 int16 数组)"""
+        pcm = np.frombuffer(data, dtype=np.int16) if isinstance(data, (bytes, bytearray)) else data
+        n = len(pcm)
+        if n == 0:
+            return
+        with self._lock:
+            if n >= self.capacity:
+                pcm = pcm[-self.capacity:]
+                self.position += n - self.capacity
+                n = self.capacity
+            start = self.position % self.capacity
+            first = min(n, self.capacity - start)
+            self._pcm[start:start + first] = pcm[:first]
+            if n > first:
+                self._pcm[:n - first] = pcm[first:]
+            self.position += n
+
+    def event(self, kind, **data):
+        self._events.append((self.position, time.time(), kind, data))
+
+    # === 保存 ===
+    def snapshot(self):
+        """返回 (录音 int16, 录音开头的累计样本位置, 事件列表)"""
+        with self._lock:
+            n = min(self.position, self.capacity)
+            end = self.position % self.capacity
+            if n < self.capacity:
+                audio = self._pcm[:n].copy()
+            else:
+                audio = np.concatenate((self._pcm[end:], self._pcm[:end]))
+            base = self.position - n
+            events = list(self._events)
+        return audio, base, [e for e in events if e[0] >= base]
+
+    def dump(self, out_dir, reason="manual"):
+        """保存到 out_dir (目录)，返回目录路径"""
+        import wave
+        audio, base, events = self.snapshot()
+        os.makedirs(out_dir, exist_ok=True)
+        with wave.open(os.path.join(out_dir, "audio.wav"), "wb") as wf:
+            wf.setnchannels(1)
+            wf.setsampwidth(2)
+            wf.setframerate(self.sample_rate)
+            wf.writeframes(audio.tobytes())
+        with open(os.path.join(out_dir, "events.jsonl"), "w", encoding="utf-8") as f:
+            for pos, ts, kind, data in events:
+                f.write(json.dumps({"pos": pos - base, "t": round(ts, 3), "kind": kind, **data},
+                                   ensure_ascii=False) + "\n")
+        meta = {
+            "reason": reason,
+            "dumped_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "sample_rate": self.sample_rate,
+            "seconds": round(len(audio) / self.sample_rate, 2),
+            "events": len(events),
+            "config": self.config,
+        }
+        with open(os.path.join(out_dir, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2, default=str)
+        print(f"🛩️ 飞行记录已保存 ({meta['seconds']:.0f}s 录音, {len(events)} 条事件): {out_dir}")
+        return out_dir
+
+
+def load_recording(path):
+    """返回 (录音 float32, 采样率, 事件列表, meta)"""
+    from audio_io import read_wav
+    samples, rate = read_wav(os.path.join(path, "audio.wav"))
+    with open(os.path.join(path, "events.jsonl"), "r", encoding="utf-8") as f:
+        events = [json.loads(line) for line in f if line.strip()]
+    with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    return samples, rate, events, meta
+
+
+def format_event(event, rate):
+    data = {k: v for k, v in event.items() if k not in ("pos", "t", "kind")}
+    detail = " ".join(f"{k}={v}" for k, v in data.items())
+    return f"{event['pos'] / rate:8.2f}s  {event['kind']:<14} {detail}"
+
+
+def show(path):
+    _, rate, events, meta = load_recording(path)
+    print(f"📼 {path}: {meta['seconds']}s @ {rate}Hz，{len(events)} 条事件 (原因: {meta['reason']})")
+    for event in events:
+        print(format_event(event, rate))
+
+
+def replay(path, speed=1.0):
+    """用保存的配置把录音按原来的采集率重新喂给 ASRWorkerThread，对比两次的事件"""
+    from PyQt6.QtCore import QCoreApplication
+    from audio_io import replay_stream_factory
+    import worker_thread
+
+    samples, rate, events, meta = load_recording(path)
+    config = dict(meta["config"])
+    config["flight_recorder_minutes"] = meta["seconds"] / 60.0 + 1
+    config["engine_process"] = False
+    config["background_model_loading"] = False
+
+    app = QCoreApplication(sys.argv)
+    worker = worker_thread.ASRWorkerThread(
+        sample_rate=rate,
+        chunk=config.get("chunk", 256),
+        buffer_seconds=config.get("buffer_seconds", 6),
+        config=config,
+        stream_factory=replay_stream_factory(samples, rate, speed=speed, loop=False),
+    )
+    resets = [(e["pos"], e["kind"]) for e in events if e["kind"] in REPLAY_RESET_EVENTS and e["pos"] > 0]
+    worker.start()
+    try:
+        # 多给几秒让最后一段断句、识别完
+        while worker.recorder.position < len(samples):
+            app.processEvents()
+            while resets and worker.recorder.position >= resets[0][0]:
+                _, kind = resets.pop(0)
+                worker._record(kind)
+                worker._reset_pending = True
+            time.sleep(0.01)
+        deadline = time.time() + 5
+        while time.time() < deadline:
+            app.processEvents()
+            time.sleep(0.05)
+    finally:
+        replayed = worker.recorder.snapshot()[2]
+        worker.stop()
+
+    replayed = [{"pos": pos, "kind": kind, **data} for pos, _, kind, data in replayed]
+    print(f"{'类型':<14} {'原始':>6} {'回放':>6}")
+    for kind in sorted({e["kind"] for e in events} | {e["kind"] for e in replayed}):
+        a = sum(e["kind"] == kind for e in events)
+        b = sum(e["kind"] == kind for e in replayed)
+        print(f"{kind:<14} {a:>6} {b:>6}{'' if a == b else '   ≠'}")
+    print("\n识别结果 (原始 | 回放):")
+    original = [e for e in events if e["kind"] == "result"]
+    again = [e for e in replayed if e["kind"] == "result"]
+    for i in range(max(len(original), len(again))):
+        a = original[i] if i < len(original) else None
+        b = again[i] if i < len(again) else None
+        print(f"  {a['pos'] / rate if a else 0:7.2f}s {a['text'] if a else '-'}  |  "
+              f"{b['pos'] / rate if b else 0:7.2f}s {b['text'] if b else '-'}")
+    return events, replayed
+
+
+def main():
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    parser = argparse.ArgumentParser(description="飞行记录仪: 查看 / 回放保存下来的录音和事件")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("show", help="打印事件时间线")
+    p.add_argument("path")
+    p = sub.add_parser("replay", help="用同一套流水线回放，对比事件和识别结果")
+    p.add_argument("path")
+    p.add_argument("--speed", type=float, default=1.0, help="回放倍速 (1 = 实时，时序最接近现场)")
+    args = parser.parse_args()
+    if args.command == "show":
+        show(args.path)
+    else:
+        replay(args.path, args.speed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+"""
+识别历史: 每条识别结果除了写 log/recognition_*.log，还存进 SQLite (log/history.db)，
+用 FTS5 全文索引 (trigram 分词，中文任意 3 字以上子串都能走索引) 搜索，几年的历史也是毫秒级。
+
+- add() 只是放进队列，后台线程攒一批 (batch_size 条或 flush_interval 秒) 一个事务写入，不阻塞界面
+- search() / recent() 在调用方线程里用单独的只读连接查询 (WAL 模式，读写互不阻塞)
+- 两个字的词 (人名、"开会") 通过 FTS 词表展开成 trigram 查询，同样走索引；
+  单个字用 LIKE: 和别的词一起搜时在索引命中里过滤，只搜单字时退回按时间倒序扫描
+- 结果按写入顺序倒序 (import-logs 导入的旧日志排在导入那一刻的位置)
+
+命令行:
+    python src/history.py search 会议纪要 -n 20
+    python src/history.py recent -n 50
+    python src/history.py import-logs log/        # 把以前的 recognition_*.log 导进来
+    python src/history.py stats
+"""
+import os
+import re
+import time
+import queue
+import sqlite3
+import argparse
+import threading
+
+from model_store import resolve_user_path
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    text TEXT NOT NULL,
+    language TEXT,
+    audio_id TEXT
+);
+CREATE INDEX IF NOT EXISTS results_ts ON results(ts);
+"""
+
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS results_fts USING fts5(
+    text, content='results', content_rowid='id', tokenize='trigram'
+);
+CREATE TRIGGER IF NOT EXISTS results_ai AFTER INSERT ON results BEGIN
+    INSERT INTO results_fts(rowid, text) VALUES (new.id, new.text || '  ');
+END;
+CREATE TRIGGER IF NOT EXISTS results_ad AFTER DELETE ON results BEGIN
+    INSERT INTO results_fts(results_fts, rowid, text) VALUES ('delete', old.id, old.text || '  ');
+END;
+CREATE VIRTUAL TABLE IF NOT EXISTS results_vocab USING fts5vocab(results_fts, row);
+"""
+
+TRIGRAM_MIN_CHARS = 3
+# 两个字的词: 在词表里找所有以它开头的 trigram，OR 起来查 (索引里每条文本末尾补了两个空格，
+# 所以结尾处的两个字也会是某个 trigram 的开头)；开头相同的 trigram 太多就退回扫描
+BIGRAM_MAX_EXPANSION = 500
+
+
+def _connect(path):
+    conn = sqlite3.connect(path, timeout=10, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+class HistoryStore:
+    def __init__(self, db_path, batch_size=50, flush_interval=1.0):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+
+        conn = _connect(db_path)
+        conn.executescript(SCHEMA)
+        try:
+            conn.executescript(FTS_SCHEMA)
+            self.has_fts = True
+        except sqlite3.OperationalError as e:
+            # 老版本 SQLite 没有 FTS5 / trigram，只能 LIKE 全表扫描
+            print(f"⚠️ SQLite 不支持 FTS5 trigram ({e})，历史搜索会比较慢")
+            self.has_fts = False
+        conn.commit()
+        conn.close()
+
+        self._read_conn = _connect(db_path)
+        self._read_lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._flushed = threading.Condition()
+        self._pending = 0
+        self._writer = threading.Thread(target=self._write_loop, name="history-writer", daemon=True)
+        self._writer.start()
+
+    # === 写入 (后台批量) ===
+    def add(self, text, language="", audio_id=None, ts=None):
+        if not text or not text.strip():
+            return
+        with self._flushed:
+            self._pending += 1
+        self._queue.put((time.time() if ts is None else ts, text.strip(), language or "", audio_id))
+
+    def _write_loop(self):
+        conn = _connect(self.db_path)
+        stop = False
+        while not stop:
+            batch = []
+            try:
+                item = self._queue.get()
+                deadline = time.time() + self.flush_interval
+                while True:
+                    if item is None:
+                        stop = True
+                        break
+                    batch.append(item)
+                    if len(batch) >= self.batch_size:
+                        break
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        break
+                    item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                pass
+            if batch:
+                try:
+                    with conn:
+                        conn.executemany("INSERT INTO results(ts, text, language, audio_id) VALUES (?, ?, ?, ?)",
+                                         batch)
+                except Exception as e:
+                    print(f"历史记录写入失败: {e}")
+            with self._flushed:
+                self._pending -= len(batch)
+                self._flushed.notify_all()
+        conn.close()
+
+    def flush(self, timeout=5.0):
+        """等队列里的记录都写进数据库"""
+        deadline = time.time() + timeout
+        with self._flushed:
+            while self._pending > 0 and time.time() < deadline:
+                self._flushed.wait(deadline - time.time())
+
+    def close(self):
+        self._queue.put(None)
+        self._writer.join(timeout=5)
+        with self._read_lock:
+            self._read_conn.close()
+
+    # === 查询 ===
+    def search(self, query, limit=50, since=None, until=None):
+        """返回 [(id, ts, text, language)]，最新的在前"""
+        query = (query or "").strip()
+        if not query:
+            return self.recent(limit)
+        where, params = [], []
+        if since is not None:
+            where.append("r.ts >= ?")
+            params.append(since)
+        if until is not None:
+            where.append("r.ts < ?")
+            params.append(until)
+
+        # 每个空格分开的词都要出现
+        terms = query.split()
+        match_parts, like_terms = [], []
+        for t in terms:
+            if self.has_fts and len(t) >= TRIGRAM_MIN_CHARS:
+                match_parts.append(_quote(t))
+            elif self.has_fts and len(t) == TRIGRAM_MIN_CHARS - 1:
+                grams = self._grams_with_prefix(t)
+                if grams is None:
+                    like_terms.append(t)
+                elif not grams:
+                    return []
+                else:
+                    match_parts.append("(" + " OR ".join(_quote(g) for g in grams) + ")")
+            else:
+                like_terms.append(t)
+        like = ["r.text LIKE ? ESCAPE '\\'" for _ in like_terms]
+        like_params = ["%" + _escape_like(t) + "%" for t in like_terms]
+
+        if match_parts:
+            # 走索引 (双引号包起来按字面匹配，用户输入的符号不会被当成 FTS 语法)，单字在命中结果里再过滤
+            match = " AND ".join(match_parts)
+            sql = ("SELECT r.id, r.ts, r.text, r.language FROM results_fts f "
+                   "JOIN results r ON r.id = f.rowid WHERE results_fts MATCH ?")
+            sql += "".join(" AND " + w for w in like + where)
+            # rowid 就是写入顺序 (≈ 时间顺序)，FTS5 可以按 rowid 倒序边找边停，不用先取出全部命中再排序
+            sql += " ORDER BY f.rowid DESC LIMIT ?"
+            return self._query(sql, [match] + like_params + params + [limit])
+
+        like = ["r.text LIKE ? ESCAPE '\\'" for _ in terms]
+        like_params = ["%" + _escape_like(t) + "%" for t in terms]
+        sql = "SELECT r.id, r.ts, r.text, r.language FROM results r WHERE " + " AND ".join(like + where)
+        sql += " ORDER BY r.ts DESC LIMIT ?"
+        return self._query(sql, like_params + params + [limit])
+
+    def _grams_with_prefix(self, prefix):
+        prefix = prefix.lower()   # trigram 默认不区分大小写，词表里都是小写
+        rows = self._query("SELECT term FROM results_vocab WHERE term >= ? AND term < ? LIMIT ?",
+                           [prefix, prefix + "\U0010ffff", BIGRAM_MAX_EXPANSION + 1])
+        if len(rows) > BIGRAM_MAX_EXPANSION:
+            return None
+        return [r[0] for r in rows]
+
+    def recent(self, limit=50):
+        return self._query("SELECT id, ts, text, language FROM results ORDER BY ts DESC LIMIT ?", [limit])
+
+    def count(self):
+        return self._query("SELECT COUNT(*) FROM results", [])[0][0]
+
+    def _query(self, sql, params):
+        with self._read_lock:
+            return self._read_conn.execute(sql, params).fetchall()
+
+    # === 导入旧日志 ===
+    def import_logs(self, log_dir):
+        """导入 recognition_YYYYmmdd_HHMMSS.log (每行 "HH:MM:SS - 文本")，返回导入条数"""
+        name_re = re.compile(r"recognition_(\d{8})_(\d{6})\.log$")
+        line_re = re.compile(r"^(\d{2}):(\d{2}):(\d{2}) - (.*)$")
+        count = 0
+        for name in sorted(os.listdir(log_dir)):
+            m = name_re.match(name)
+            if not m:
+                continue
+            day = time.mktime(time.strptime(m.group(1), "%Y%m%d"))
+            start = time.mktime(time.strptime(m.group(1) + m.group(2), "%Y%m%d%H%M%S"))
+            with open(os.path.join(log_dir, name), "r", encoding="utf-8", errors="replace") as f:
+                for line in f:
+                    lm = line_re.match(line.rstrip("\n"))
+                    if not lm:
+                        continue
+                    h, mi, s = int(lm.group(1)), int(lm.group(2)), int(lm.group(3))
+                    ts = day + h * 3600 + mi * 60 + s
+                    if ts < start:
+                        # 跨过了午夜
+                        ts += 86400
+                    self.add(lm.group(4), ts=ts)
+                    count += 1
+        self.flush(timeout=60)
+        return count
+
+
+def _quote(term):
+    return '"' + term.replace('"', '""') + '"'
+
+
+def _escape_like(text):
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def format_row(row):
+    _, ts, text, language = row
+    return f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(ts))}  {text}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="识别历史搜索")
+    # 和程序写的是同一个库 (按程序根目录，不按当前目录)
+    parser.add_argument("--db", default=resolve_user_path("log/history.db"))
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("search", help="全文搜索")
+    p.add_argument("query", nargs="+")
+    p.add_argument("-n", type=int, default=20)
+    p.add_argument("--since", default=None, help="起始日期 YYYY-MM-DD")
+    p = sub.add_parser("recent", help="最近的记录")
+    p.add_argument("-n", type=int, default=20)
+    p = sub.add_parser("import-logs", help="导入旧的 recognition_*.log")
+    p.add_argument("log_dir")
+    sub.add_parser("stats", help="统计")
+    args = parser.parse_args()
+
+    store = HistoryStore(args.db)
+    try:
+        if args.cmd == "search":
+            since = time.mktime(time.strptime(args.since, "%Y-%m-%d")) if args.since else None
+            start = time.perf_counter()
+            rows = store.search(" ".join(args.query), limit=args.n, since=since)
+            elapsed = (time.perf_counter() - start) * 1000
+            for row in rows:
+                print(format_row(row))
+            print(f"🔍 {len(rows)} 条 ({elapsed:.1f} ms)")
+        elif args.cmd == "recent":
+            for row in reversed(store.recent(args.n)):
+                print(format_row(row))
+        elif args.cmd == "import-logs":
+            print(f"✅ 导入 {store.import_logs(args.log_dir)} 条")
+        elif args.cmd == "stats":
+            print(f"📚 {store.count()} 条记录，FTS5: {'是' if store.has_fts else '否'}，数据库: {args.db}")
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""
+推理调度: 实时听写 (interactive) 优先于后台批量任务 (batch，文件转写等)。
+
+asr_core 的模型是进程内共享的一份，后台转写一个长文件时，实时说的下一句话不能排在几分钟的批量任务后面。
+所有 model.generate 都要先拿 slot(priority)，同一时刻只有一个 generate 在跑 (一个模型一个位置):
+
+- interactive 之间按顺序排队 (投机识别和最终识别不会在同一个模型上并发)，有 interactive 在等时 batch 不能开始
+- batch 一次只跑一片 (transcribe_raw_batch 按 batch_slice_seconds 切片)，有 interactive 在跑 / 在等、
+  interactive 刚结束不到 batch_yield_ms、或者实时录音里正在说话 (speech_started 到 speech_ended) 时不开始新的一片
+- Worker 在 VAD 检测到开口时调用 speech_started：正在跑的那一片在这句话说完之前就结束了，
+  断句后的识别请求来的时候模型是空的 (BATCH_SPEECH_HOLD 秒后自动失效，防止一直不结束的 "说话" 饿死 batch)
+- interactive 的 等待时间 / 等待 + 推理总耗时 按最近 200 次统计 p50 / p95，
+  超过 interactive_slo_ms 记一次违约，都写进 metrics (sched_*)
+"""
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+import metrics
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+PRIORITIES = (INTERACTIVE, BATCH)
+# 开口后最多拦住 batch 这么久 (一直不断句时)
+BATCH_SPEECH_HOLD = 10.0
+
+
+def _percentile(values, q):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class InferenceScheduler:
+    def __init__(self, config):
+        self.slo_ms = config.get("interactive_slo_ms", 1500)
+        self.batch_slice_seconds = config.get("batch_slice_seconds", 1.0)
+        self.batch_yield = config.get("batch_yield_ms", 300) / 1000.0
+        self._cond = threading.Condition()
+        self._running = {INTERACTIVE: 0, BATCH: 0}
+        self._waiting = {INTERACTIVE: 0, BATCH: 0}
+        self._last_interactive = 0.0
+        self._speech_since = None
+        self._waits = deque(maxlen=200)
+        self._latencies = deque(maxlen=200)
+        self.slo_violations = 0
+
+    # === 实时录音的说话状态 (Worker 线程调用) ===
+    def speech_started(self):
+        with self._cond:
+            if self._speech_since is None:
+                self._speech_since = time.perf_counter()
+
+    def speech_ended(self):
+        """这句话切出来了 (或者流水线重置)：和 interactive 刚结束一样，再让路 batch_yield_ms，等识别请求排上队"""
+        with self._cond:
+            if self._speech_since is not None:
+                self._speech_since = None
+                self._last_interactive = max(self._last_interactive, time.perf_counter())
+                self._cond.notify_all()
+
+    # === 排队 ===
+    def _busy(self):
+        return self._running[INTERACTIVE] + self._running[BATCH] > 0
+
+    def _batch_wait_time(self, now):
+        """batch 现在能开始返回 0，否则返回最多还要等多久 (None = 等通知)"""
+        if self._busy() or self._waiting[INTERACTIVE]:
+            return None
+        waits = [self.batch_yield - (now - self._last_interactive)]
+        if self._speech_since is not None:
+            waits.append(BATCH_SPEECH_HOLD - (now - self._speech_since))
+        remaining = max(waits)
+        return remaining if remaining > 0 else 0
+
+    def _acquire(self, priority):
+        with self._cond:
+            self._waiting[priority] += 1
+            try:
+                if priority == INTERACTIVE:
+                    while self._busy():
+                        self._cond.wait()
+                else:
+                    yielded = False
+                    while True:
+                        remaining = self._batch_wait_time(time.perf_counter())
+                        if remaining == 0:
+                            break
+                        yielded = True
+                        # 让路窗口 / 开口拦截到期时自己醒来再看
+                        self._cond.wait(remaining)
+                    if yielded:
+                        metrics.inc("sched_batch_yields")
+            finally:
+                self._waiting[priority] -= 1
+            self._running[priority] += 1
+
+    def _release(self, priority):
+        with self._cond:
+            self._running[priority] -= 1
+            if priority == INTERACTIVE:
+                self._last_interactive = time.perf_counter()
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, priority=INTERACTIVE):
+        """with scheduler.slot(priority): model.generate(...)"""
+        if priority not in PRIORITIES:
+            priority = INTERACTIVE
+        start = time.perf_counter()
+        self._acquire(priority)
+        acquired = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._release(priority)
+            if priority == INTERACTIVE:
+                self._record(acquired - start, time.perf_counter() - start)
+            else:
+                metrics.inc("sched_batch_slices")
+                metrics.inc("sched_batch_wait_s", acquired - start)
+
+    # === SLO 统计 ===
+    def _record(self, wait, latency):
+        with self._cond:
+            self._waits.append(wait * 1000)
+            self._latencies.append(latency * 1000)
+            if latency * 1000 > self.slo_ms:
+                self.slo_violations += 1
+                metrics.inc("sched_slo_violations")
+            stats = self._stats_locked()
+        for name, value in stats.items():
+            metrics.set_gauge(f"sched_{name}", value)
+
+    def _stats_locked(self):
+        return {
+            "interactive_wait_p95_ms": round(_percentile(self._waits, 0.95), 1),
+            "interactive_latency_p50_ms": round(_percentile(self._latencies, 0.5), 1),
+            "interactive_latency_p95_ms": round(_percentile(self._latencies, 0.95), 1),
+        }
+
+    def stats(self):
+        with self._cond:
+            stats = self._stats_locked()
+            stats["interactive_count"] = len(self._latencies)
+            stats["slo_ms"] = self.slo_ms
+            stats["slo_violations"] = self.slo_violations
+            return stats
+
+    # === 批量切片 ===
+    def batch_slices(self, durations):
+        """把一批音频 (各自的秒数) 切成若干片下标，每片总时长不超过 batch_slice_seconds (单条超长的自成一片)"""
+        slices, current, total = [], [], 0.0
+        for i, seconds in enumerate(durations):
+            if current and total + seconds > self.batch_slice_seconds:
+                slices.append(current)
+                current, total = [], 0.0
+            current.append(i)
+            total += seconds
+        if current:
+            slices.append(current)
+        return slices
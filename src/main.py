@@ -31,6 +31,9 @@ def main():
 
 if __name__ == "__main__":
     import sys
+    # 打包成 exe 后 engine_process 的子进程需要这一句
+    import multiprocessing
+    multiprocessing.freeze_support()
     print(f"当前 Python 版本：{sys.version}")
     import torch
     print(f"PyTorch 版本：{torch.__version__}")
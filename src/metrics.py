@@ -0,0 +1,39 @@
+"""
+进程内运行指标: 计数器 (inc) 和当前值 (set_gauge)。
+各模块直接写，调试 / 压力测试 / 托盘提示随时用 snapshot() 读。
+"""
+import threading
+
+_lock = threading.Lock()
+_gauges = {}
+_counters = {}
+
+
+def set_gauge(name, value):
+    with _lock:
+        _gauges[name] = value
+
+
+def inc(name, n=1):
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + n
+
+
+def get(name, default=None):
+    with _lock:
+        if name in _gauges:
+            return _gauges[name]
+        return _counters.get(name, default)
+
+
+def snapshot():
+    with _lock:
+        data = dict(_counters)
+        data.update(_gauges)
+        return data
+
+
+def reset():
+    with _lock:
+        _gauges.clear()
+        _counters.clear()
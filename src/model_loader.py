@@ -0,0 +1,99 @@
+"""
+后台并行加载模型 (配置 background_model_loading: true)。
+
+以前 SenseVoice 在 import asr_core 时加载、FSMN-VAD 在 Worker 构造时 (界面线程里) 加载，一个接一个，
+界面要卡十几秒。现在两个模型各开一个线程同时加载，Worker 先把录音缓冲起来，
+模型就绪后把缓冲的语音补识别出来，加载期间说的话不会丢。
+
+- 进度通过 on_progress(文字, 是否结束) 通知 (在加载线程里调用，Worker 转成 Qt 信号给托盘 / 输入框)
+- 两个模型在 asr_core 里都是进程级共享的，Worker 重启 (切语言 / 灵敏度) 时加载会立即完成
+"""
+import time
+import threading
+
+import metrics
+
+STATE_TEXT = {"pending": "等待", "loading": "加载中", "ready": "✅", "failed": "❌"}
+
+
+class ModelLoader:
+    """
+    start() 之后每个模型一个线程并行加载；done() / wait(timeout) 查询是否全部结束。
+    vad_model: 加载好的 VAD (失败为 None，切分器改用能量检测)；errors: {模型名: 错误信息}
+    """
+
+    def __init__(self, config, on_progress=None):
+        self.config = config
+        self.on_progress = on_progress
+        self.vad_model = None
+        self.errors = {}
+        self.state = {"SenseVoice": "pending", "FSMN-VAD": "pending"}
+        self.elapsed = {}
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._started = None
+        self._threads = []
+
+    def start(self):
+        if self._started is not None:
+            return
+        import asr_core
+        self._started = time.perf_counter()
+        jobs = {"SenseVoice": asr_core.get_model, "FSMN-VAD": self._load_vad}
+        for name, job in jobs.items():
+            thread = threading.Thread(target=self._run, args=(name, job), name=f"load-{name}", daemon=True)
+            self._threads.append(thread)
+            thread.start()
+
+    def _load_vad(self):
+        import asr_core
+        self.vad_model = asr_core.load_vad_model(self.config)
+        if self.vad_model is None:
+            # load_vad_model 已经打印了原因；切分器会退回能量检测
+            raise RuntimeError("VAD 模型不可用，改用能量检测")
+
+    def _run(self, name, job):
+        self._set_state(name, "loading")
+        start = time.perf_counter()
+        try:
+            job()
+            state = "ready"
+        except Exception as e:
+            print(f"❌ {name} 加载失败: {e}")
+            self.errors[name] = str(e)
+            state = "failed"
+        self.elapsed[name] = time.perf_counter() - start
+        metrics.set_gauge(f"model_load_{name.lower().replace('-', '_')}_s", round(self.elapsed[name], 2))
+        self._set_state(name, state)
+
+    def _set_state(self, name, state):
+        with self._lock:
+            self.state[name] = state
+            finished = all(s in ("ready", "failed") for s in self.state.values())
+            if finished:
+                total = time.perf_counter() - self._started
+                metrics.set_gauge("model_load_total_s", round(total, 2))
+                print(f"📦 模型加载完成，用时 {total:.1f}s")
+                self._done.set()
+            text = self.progress_text()
+        if self.on_progress:
+            self.on_progress(text, finished)
+
+    def progress_text(self):
+        """结束且都成功时返回空字符串，否则是给托盘 / 输入框占位符看的一行状态"""
+        parts = []
+        for name, state in self.state.items():
+            if state in ("ready", "failed") and name in self.elapsed:
+                parts.append(f"{name} {STATE_TEXT[state]} {self.elapsed[name]:.1f}s")
+            else:
+                parts.append(f"{name} {STATE_TEXT[state]}")
+        ready = sum(s in ("ready", "failed") for s in self.state.values())
+        if ready == len(self.state):
+            return "" if not self.errors else "⚠️ 模型加载失败: " + ", ".join(self.errors)
+        return f"⏳ 正在加载模型 ({ready}/{len(self.state)}): " + " | ".join(parts)
+
+    def done(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        return self._done.wait(timeout)
@@ -0,0 +1,223 @@
+"""
+本地模型仓库: 提前把模型下载到 models/，并给每个模型目录生成校验清单 (manifest.json: 每个文件的大小 + sha256)。
+
+配置 offline_mode: true 后启动时只认本地模型:
+- 路径不存在 / 清单对不上直接报错，提示先运行 provision，绝不回退到 ModelScope 下载
+- 启动时的校验只看清单里的文件是否都在、大小是否一致 (小于 1MB 的配置文件再核对 sha256)，几毫秒完成；
+  完整的 sha256 校验用命令行 verify --deep
+
+命令行:
+    python src/model_store.py provision              # 下载 ASR + VAD 到 models/ 并生成清单 (已校验通过的跳过)
+    python src/model_store.py provision --force      # 重新下载
+    python src/model_store.py verify --deep          # 完整校验所有文件的 sha256
+    python src/model_store.py manifest models/iic/SenseVoiceSmall   # 给手动拷进来的模型目录生成清单
+"""
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+
+MANIFEST_NAME = "manifest.json"
+# 启动时快速校验: 小文件 (configuration.json / config.yaml / 词表) 顺便核对哈希，大的权重文件只比大小
+QUICK_HASH_MAX_BYTES = 1024 * 1024
+
+# 配置项 -> (ModelScope 模型名, 版本)
+MODELS = {
+    "local_asr_path": ("iic/SenseVoiceSmall", "master"),
+    "local_vad_path": ("iic/speech_fsmn_vad_zh-cn-16k-common-pytorch", "v2.0.4"),
+}
+
+
+class ModelStoreError(RuntimeError):
+    pass
+
+
+# === 路径解析辅助函数 ===
+def get_base_path():
+    # 获取程序运行的基础路径（兼容 源码运行 和 打包运行）
+    if getattr(sys, 'frozen', False):
+        #如果是打包后的 EXE/文件夹，base_path 是可执行文件所在目录
+        return os.path.dirname(sys.executable)
+    # 如果是 Python 源码运行，base_path 是当前文件所在目录的 上一级 (假设 asr_core.py 在 src/ 下)
+    # 你需要根据你的文件结构调整这里，通常指向 main.py 同级或项目根目录
+    return os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def resolve_user_path(config_path_str):
+    """相对路径按程序根目录拼接，不检查是否存在 (用于运行中才会创建/修改的文件)"""
+    if not config_path_str:
+        return None
+    if os.path.isabs(config_path_str):
+        return config_path_str
+    return os.path.normpath(os.path.join(get_base_path(), config_path_str))
+
+def resolve_model_path(config_path_str):
+    """
+    逻辑：
+    1. 如果 config 为空 -> 返回 None (走云端)
+    2. 如果 config 是绝对路径且存在 -> 返回绝对路径
+    3. 如果 config 是相对路径 -> 拼接当前程序所在目录 -> 存在则返回，不存在则返回 None
+    """
+    if not config_path_str:
+        return None
+
+    base_path = get_base_path()
+
+    # 1. 尝试直接当作绝对路径
+    if os.path.isabs(config_path_str) and os.path.exists(config_path_str):
+        # print(f"✅ 发现绝对路径模型: {config_path_str}")
+        return config_path_str
+
+    # 2. 尝试当作相对路径拼接
+    full_path = os.path.join(base_path, config_path_str)
+    # 归一化路径分隔符
+    full_path = os.path.normpath(full_path)
+    
+    if os.path.exists(full_path):
+        # print(f"✅ 发现本地相对路径模型: {full_path}")
+        return full_path
+    
+    print(f"⚠️ Config指定了 '{config_path_str}' 但路径不存在: {full_path}")
+    return None
+
+
+def _sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def write_manifest(model_dir, model_id="", revision=""):
+    """扫描模型目录，写 manifest.json，返回清单"""
+    files = {}
+    for root, dirs, names in os.walk(model_dir):
+        # ModelScope 的下载临时文件 / 锁文件不算
+        dirs[:] = [d for d in dirs if not d.startswith(".")]
+        for name in sorted(names):
+            if name == MANIFEST_NAME or name.startswith("."):
+                continue
+            path = os.path.join(root, name)
+            rel = os.path.relpath(path, model_dir).replace(os.sep, "/")
+            files[rel] = {"size": os.path.getsize(path), "sha256": _sha256(path)}
+    manifest = {
+        "model_id": model_id,
+        "revision": revision,
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "files": files,
+    }
+    tmp = os.path.join(model_dir, MANIFEST_NAME + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, os.path.join(model_dir, MANIFEST_NAME))
+    return manifest
+
+
+def verify(model_dir, deep=False):
+    """返回问题列表 (空列表 = 通过)。deep=False 只比大小 + 小文件哈希"""
+    manifest_path = os.path.join(model_dir, MANIFEST_NAME)
+    if not os.path.isdir(model_dir):
+        return [f"目录不存在: {model_dir}"]
+    if not os.path.exists(manifest_path):
+        return [f"缺少校验清单 {MANIFEST_NAME}"]
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            files = json.load(f)["files"]
+    except (OSError, ValueError, KeyError) as e:
+        return [f"校验清单损坏: {e}"]
+    if not files:
+        return ["校验清单为空"]
+
+    problems = []
+    for rel, info in files.items():
+        path = os.path.join(model_dir, *rel.split("/"))
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            problems.append(f"缺少文件: {rel}")
+            continue
+        if size != info["size"]:
+            problems.append(f"大小不符: {rel} ({size} != {info['size']})")
+        elif (deep or size <= QUICK_HASH_MAX_BYTES) and _sha256(path) != info["sha256"]:
+            problems.append(f"sha256 不符: {rel}")
+    return problems
+
+
+def require_local_model(model_dir, config_key):
+    """
+    offline_mode 下加载模型前调用: 目录必须存在且通过快速校验，否则抛 ModelStoreError
+    (model_dir 是 resolve_model_path 的结果，路径不存在时为 None)
+    """
+    if not model_dir:
+        raise ModelStoreError(f"离线模式: {config_key} 指向的模型目录不存在，"
+                              f"请先运行 python src/model_store.py provision")
+    start = time.perf_counter()
+    problems = verify(model_dir)
+    if problems:
+        raise ModelStoreError(f"离线模式: 模型校验失败 {model_dir}\n  " + "\n  ".join(problems[:10]) +
+                              "\n请重新运行 python src/model_store.py provision --force")
+    print(f"✅ 模型校验通过: {os.path.basename(model_dir)} ({(time.perf_counter() - start) * 1000:.1f} ms)")
+    return model_dir
+
+
+def provision(store_dir, force=False):
+    """下载 MODELS 里的模型到 store_dir/<模型名>，生成清单，返回 {配置项: 本地目录}"""
+    from modelscope.hub.snapshot_download import snapshot_download
+
+    os.makedirs(store_dir, exist_ok=True)
+    paths = {}
+    for config_key, (model_id, revision) in MODELS.items():
+        target = os.path.join(store_dir, *model_id.split("/"))
+        if not force and os.path.isdir(target) and not verify(target):
+            print(f"✅ 已存在且校验通过，跳过: {model_id}")
+            paths[config_key] = target
+            continue
+        print(f"⬇️ 下载 {model_id} ({revision}) ...")
+        local_dir = snapshot_download(model_id, revision=revision, cache_dir=store_dir)
+        print(f"🔐 生成校验清单: {local_dir}")
+        write_manifest(local_dir, model_id, revision)
+        paths[config_key] = local_dir
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地模型仓库: 下载 / 生成清单 / 校验")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("provision", help="下载模型并生成校验清单")
+    p.add_argument("--store", default=None, help="模型目录 (默认 <程序目录>/models)")
+    p.add_argument("--force", action="store_true", help="已存在也重新下载")
+    p = sub.add_parser("verify", help="按清单校验配置里的模型")
+    p.add_argument("--deep", action="store_true", help="所有文件都算 sha256")
+    p = sub.add_parser("manifest", help="给已有的模型目录生成清单")
+    p.add_argument("model_dir")
+    args = parser.parse_args()
+
+    if args.cmd == "provision":
+        store = args.store or os.path.join(get_base_path(), "models")
+        for config_key, path in provision(store, force=args.force).items():
+            print(f"   {config_key}: {path}")
+        print("🏁 完成，可以在 config.yaml 里设置 offline_mode: true")
+    elif args.cmd == "manifest":
+        manifest = write_manifest(args.model_dir)
+        print(f"✅ {len(manifest['files'])} 个文件")
+    elif args.cmd == "verify":
+        import yaml
+        with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "config.yaml"), "r", encoding="utf-8") as f:
+            config = yaml.safe_load(f) or {}
+        failed = False
+        for config_key in MODELS:
+            model_dir = resolve_model_path(config.get(config_key, ""))
+            start = time.perf_counter()
+            problems = verify(model_dir, deep=args.deep) if model_dir else ["路径不存在"]
+            elapsed = (time.perf_counter() - start) * 1000
+            print(f"{'✅' if not problems else '❌'} {config_key}: {model_dir} ({elapsed:.1f} ms)")
+            for problem in problems:
+                print(f"   {problem}")
+            failed = failed or bool(problems)
+        sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
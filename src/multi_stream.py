@@ -0,0 +1,360 @@
+"""
+多路输入共用一个识别模型 (会议室多麦克风，每一路单独出文字):
+
+- 每一路一个 StreamPipeline 线程: 采集 -> 重采样 -> 自己的 VADSegmenter (cache_vad / 断句状态互不影响)
+- 切出来的语音段都交给一个 SharedASREngine 线程识别，模型只加载一份
+- 调度: 每路一个 FIFO 队列，按 "截止时间 = 段产生时间 + 这一路的延迟目标" 最早的先识别 (EDF)，
+  截止时间相同时先照顾累计识别音频最少的那一路，一路说个不停也不会饿死其他路
+- 攒批: 取出第一段后，顺手把其他路已经在排队、语言等参数相同的段一起送进模型 (不额外等待，
+  除非离最早的截止时间还很宽裕，才最多等 batch_wait_ms 凑一凑)
+
+运行示例:
+    python src/multi_stream.py --device 1 --device 3          # 两个麦克风 (PyAudio 设备号)
+    python src/multi_stream.py --wav a.wav --wav b.wav        # 回放录音
+    python src/multi_stream.py --list-devices
+"""
+import os
+import sys
+import time
+import argparse
+import threading
+from collections import deque
+
+import numpy as np
+
+import metrics
+from resampler import PolyphaseResampler, MODEL_SAMPLE_RATE
+from segmenter import VADSegmenter
+
+
+class SharedVAD:
+    """多路共用一个 VAD 模型：每路的流式 cache 由各自的 VADSegmenter 保存，这里只把调用串行化"""
+
+    def __init__(self, model):
+        self._model = model
+        self._lock = threading.Lock()
+
+    def generate(self, **kwargs):
+        with self._lock:
+            return self._model.generate(**kwargs)
+
+
+class ASRRequest:
+    def __init__(self, stream_id, segment, config, deadline):
+        self.stream_id = stream_id
+        self.segment = segment
+        self.config = config
+        self.ready = time.perf_counter()
+        self.deadline = deadline
+
+    @property
+    def batch_key(self):
+        # 同一批只能是同一套识别参数
+        return (self.config.get("language"), self.config.get("use_itn", True), self.config.get("use_emoji", False))
+
+
+class StreamStats:
+    def __init__(self, latency_target, history=500):
+        self.latency_target = latency_target
+        self.latencies = deque(maxlen=history)
+        self.results = 0
+        self.misses = 0
+
+    def record(self, latency):
+        self.latencies.append(latency)
+        self.results += 1
+        if latency > self.latency_target:
+            self.misses += 1
+
+    def summary(self):
+        lat = np.asarray(self.latencies) * 1000 if self.latencies else np.zeros(1)
+        return {
+            "results": self.results,
+            "target_ms": round(self.latency_target * 1000),
+            "p50_ms": round(float(np.percentile(lat, 50)), 1),
+            "p95_ms": round(float(np.percentile(lat, 95)), 1),
+            "max_ms": round(float(lat.max()), 1),
+            "misses": self.misses,
+        }
+
+
+class SharedASREngine:
+    """一个识别线程服务所有输入，transcribe_batch(音频列表, config) -> 文本列表"""
+
+    def __init__(self, transcribe_batch, on_result, max_batch=4, batch_wait_ms=30, max_batch_seconds=30.0):
+        self.transcribe_batch = transcribe_batch
+        self.on_result = on_result
+        self.max_batch = max(1, int(max_batch))
+        self.batch_wait = batch_wait_ms / 1000.0
+        self.max_batch_samples = int(max_batch_seconds * MODEL_SAMPLE_RATE)
+        self.queues = {}            # stream_id -> deque[ASRRequest]
+        self.served = {}            # stream_id -> 已识别的音频样本数 (公平性)
+        self.stats = {}             # stream_id -> StreamStats
+        self.busy = False
+        self.running = False
+        self.cond = threading.Condition()
+        self.thread = None
+
+    def register(self, stream_id, latency_target):
+        with self.cond:
+            self.queues[stream_id] = deque()
+            self.served[stream_id] = 0
+            self.stats[stream_id] = StreamStats(latency_target)
+
+    def submit(self, stream_id, segment, config):
+        with self.cond:
+            target = self.stats[stream_id].latency_target
+            self.queues[stream_id].append(ASRRequest(stream_id, segment, config, time.perf_counter() + target))
+            metrics.set_gauge("multi_stream_queue", self._pending_locked())
+            self.cond.notify()
+
+    def _pending_locked(self):
+        return sum(len(q) for q in self.queues.values())
+
+    def idle(self):
+        with self.cond:
+            return not self.busy and self._pending_locked() == 0
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name="asr-shared-engine", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        with self.cond:
+            self.running = False
+            self.cond.notify_all()
+        if self.thread:
+            self.thread.join()
+
+    # === 调度 ===
+    def _heads_locked(self):
+        return [q[0] for q in self.queues.values() if q]
+
+    def _pick_batch_locked(self):
+        heads = self._heads_locked()
+        first = min(heads, key=lambda r: (r.deadline, self.served[r.stream_id]))
+        batch = [self.queues[first.stream_id].popleft()]
+        total = len(first.segment.audio)
+
+        # 顺手捎上: 先是其他路的队头 (公平)，再是各路后面排着的，都按截止时间排序
+        # (同一路截止时间单调递增，排序后每路仍是 FIFO 顺序)
+        candidates = sorted(
+            (r for q in self.queues.values() for r in q),
+            key=lambda r: (r.stream_id == first.stream_id or self.queues[r.stream_id][0] is not r, r.deadline))
+        for r in candidates:
+            if len(batch) >= self.max_batch:
+                break
+            if r.batch_key != first.batch_key or total + len(r.segment.audio) > self.max_batch_samples:
+                continue
+            if self.queues[r.stream_id] and self.queues[r.stream_id][0] is r:
+                self.queues[r.stream_id].popleft()
+                batch.append(r)
+                total += len(r.segment.audio)
+        for r in batch:
+            self.served[r.stream_id] += len(r.segment.audio)
+        return batch
+
+    def _run(self):
+        while True:
+            with self.cond:
+                while self.running and not self._heads_locked():
+                    self.cond.wait()
+                if not self.running:
+                    return
+                # 排队的不够一批、离最早截止时间又还宽裕，就稍等一下凑批
+                if self._pending_locked() < self.max_batch:
+                    slack = min(r.deadline for r in self._heads_locked()) - time.perf_counter()
+                    if slack > 2 * self.batch_wait:
+                        self.cond.wait(self.batch_wait)
+                        if not self.running:
+                            return
+                batch = self._pick_batch_locked()
+                self.busy = True
+                metrics.set_gauge("multi_stream_queue", self._pending_locked())
+
+            try:
+                texts = self.transcribe_batch([r.segment.audio for r in batch], batch[0].config)
+            except Exception as e:
+                print(f"识别错误: {e}")
+                texts = [""] * len(batch)
+            done = time.perf_counter()
+            metrics.inc("multi_stream_batches")
+            metrics.inc("multi_stream_segments", len(batch))
+
+            for r, text in zip(batch, texts):
+                stats = self.stats[r.stream_id]
+                stats.record(done - r.ready)
+                metrics.set_gauge(f"stream_{r.stream_id}_latency_p95_ms", stats.summary()["p95_ms"])
+                if text and text.strip():
+                    self.on_result(r.stream_id, text, r.segment, done - r.ready)
+            with self.cond:
+                self.busy = False
+
+
+class StreamPipeline(threading.Thread):
+    """一路输入: 采集 / 重采样 / VAD 切分，切好的段交给共享识别引擎"""
+
+    def __init__(self, stream_id, stream, sample_rate, chunk, config, model_vad, engine):
+        super().__init__(name=f"stream-{stream_id}", daemon=True)
+        self.stream_id = stream_id
+        self.stream = stream
+        self.chunk = chunk
+        self.config = config
+        self.engine = engine
+        self.resampler = PolyphaseResampler(sample_rate, MODEL_SAMPLE_RATE)
+        self.segmenter = VADSegmenter(model_vad, config)
+        self.running = True
+        self.finished = False
+
+    def run(self):
+        try:
+            while self.running:
+                try:
+                    data = self.stream.read(self.chunk, exception_on_overflow=False)
+                except Exception as e:
+                    print(f"[{self.stream_id}] 录音读取错误: {e}")
+                    time.sleep(0.1)
+                    continue
+                samples = np.frombuffer(data, dtype=np.int16).astype(np.float32) / 32767.0
+                self._submit(self.segmenter.feed(self.resampler.process(samples)))
+                # 回放的录音放完了
+                if getattr(self.stream, "exhausted", False):
+                    break
+            self._submit(self.segmenter.flush())
+        finally:
+            self.finished = True
+
+    def _submit(self, segments):
+        for segment in segments:
+            self.engine.submit(self.stream_id, segment, self.config)
+
+    def stop(self):
+        self.running = False
+
+
+class MultiStreamScheduler:
+    """
+    用法:
+        scheduler = MultiStreamScheduler(config, on_result=lambda sid, text, seg, latency: ...)
+        scheduler.add_stream("mic1", stream, sample_rate=48000)
+        scheduler.start() ... scheduler.stop()
+
+    transcribe_batch 默认用 asr_core.asr_transcribe_batch；model_vad 默认用 asr_core 的 FSMN-VAD，
+    传 None 就用能量检测断句。
+    """
+
+    _DEFAULT = object()
+
+    def __init__(self, config, on_result=None, transcribe_batch=None, model_vad=_DEFAULT):
+        self.config = dict(config)
+        self.on_result = on_result or self._print_result
+        if transcribe_batch is None or model_vad is self._DEFAULT:
+            import asr_core
+            if transcribe_batch is None:
+                def transcribe_batch(audios, cfg):
+                    return asr_core.asr_transcribe_batch(audios, config_override=cfg)
+            if model_vad is self._DEFAULT:
+                model_vad = asr_core.load_vad_model(self.config)
+        self.model_vad = SharedVAD(model_vad) if model_vad is not None else None
+        self.engine = SharedASREngine(
+            transcribe_batch, self.on_result,
+            max_batch=self.config.get("multi_stream_max_batch", 4),
+            batch_wait_ms=self.config.get("multi_stream_batch_wait_ms", 30))
+        self.pipelines = {}
+
+    @staticmethod
+    def _print_result(stream_id, text, segment, latency):
+        print(f"[{stream_id}] {text}  ({latency * 1000:.0f}ms)")
+
+    def add_stream(self, stream_id, stream, sample_rate, chunk=None, latency_ms=None, config=None):
+        """config 可以覆盖这一路的识别参数 (比如语言)，latency_ms 是这一路的延迟目标"""
+        cfg = dict(self.config)
+        cfg.update(config or {})
+        latency_ms = latency_ms or cfg.get("multi_stream_latency_ms", 1500)
+        chunk = chunk or cfg.get("chunk", 256)
+        self.engine.register(stream_id, latency_ms / 1000.0)
+        self.pipelines[stream_id] = StreamPipeline(stream_id, stream, sample_rate, chunk, cfg,
+                                                   self.model_vad, self.engine)
+
+    def start(self):
+        self.engine.start()
+        for pipeline in self.pipelines.values():
+            pipeline.start()
+
+    def wait(self, poll=0.05):
+        """等所有输入结束 (回放放完) 并且排队的段都识别完"""
+        while not all(p.finished for p in self.pipelines.values()) or not self.engine.idle():
+            time.sleep(poll)
+
+    def stop(self):
+        for pipeline in self.pipelines.values():
+            pipeline.stop()
+        for pipeline in self.pipelines.values():
+            pipeline.join(timeout=2)
+            try:
+                pipeline.stream.stop_stream()
+                pipeline.stream.close()
+            except Exception:
+                pass
+        self.engine.stop()
+
+    def stats(self):
+        return {sid: s.summary() for sid, s in self.engine.stats.items()}
+
+
+def main():
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    parser = argparse.ArgumentParser(description="多路输入共用一个识别模型")
+    parser.add_argument("--device", type=int, action="append", default=[], help="麦克风设备号 (可重复)")
+    parser.add_argument("--wav", action="append", default=[], help="回放录音 (可重复)")
+    parser.add_argument("--rate", type=int, default=16000, help="麦克风采集率")
+    parser.add_argument("--speed", type=float, default=1.0, help="回放倍速")
+    parser.add_argument("--latency-ms", type=int, default=None, help="每路延迟目标")
+    parser.add_argument("--list-devices", action="store_true")
+    args = parser.parse_args()
+
+    if args.list_devices or args.device:
+        import pyaudio
+        pa = pyaudio.PyAudio()
+    if args.list_devices:
+        for i in range(pa.get_device_count()):
+            info = pa.get_device_info_by_index(i)
+            if info.get("maxInputChannels", 0) > 0:
+                print(f"{i}: {info['name']} ({int(info['defaultSampleRate'])} Hz)")
+        return
+
+    import asr_core
+    scheduler = MultiStreamScheduler(asr_core.config)
+    chunk = asr_core.config.get("chunk", 256)
+    for index in args.device:
+        stream = pa.open(format=pyaudio.paInt16, channels=1, rate=args.rate, input=True,
+                         input_device_index=index, frames_per_buffer=chunk)
+        scheduler.add_stream(f"mic{index}", stream, args.rate, chunk, args.latency_ms)
+    for path in args.wav:
+        from audio_io import read_wav, ReplayStream
+        samples, rate = read_wav(path)
+        stream = ReplayStream(samples, chunk, rate=rate, speed=args.speed, loop=False)
+        scheduler.add_stream(os.path.splitext(os.path.basename(path))[0], stream, rate, chunk, args.latency_ms)
+    if not scheduler.pipelines:
+        parser.error("至少指定一个 --device 或 --wav")
+
+    scheduler.start()
+    try:
+        if args.device:
+            while True:
+                time.sleep(1)
+        else:
+            scheduler.wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        scheduler.stop()
+        if args.device:
+            pa.terminate()
+    for sid, s in scheduler.stats().items():
+        print(f"📊 {sid}: {s}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+import time
+import numpy as np
+
+import metrics
+from resampler import MODEL_SAMPLE_RATE
+
+
+class NoiseSuppressor:
+    """
+    流式频谱降噪 (16k float32 单声道)，放在重采样之后、VAD 之前 (配置 noise_suppression: true)。
+
+    风扇、空调、键盘这类稳定噪声会让 FSMN-VAD 误触发，每次误触发都要白跑一次 asr_transcribe。
+    降噪后噪声段能量掉到 noise_threshold 以下，切分器直接丢掉，不再送去识别。
+
+    - STFT: 512 点帧 / 256 点帧移，sqrt-Hann 分析 + 合成窗 (50% 重叠时完全重建)，一块音频的所有帧一次批量 FFT
+    - 噪声谱: 平滑功率谱的连续最小值跟踪 (低于估计立即跟下去，高于估计时按 ~8 秒时间常数缓慢上升)，
+      说话时噪声估计基本不动，换了环境几秒后自动适应
+    - 增益: 决策引导 (decision-directed) 先验信噪比 + Wiener 增益，增益下限 noise_suppression_floor_db 防止音乐噪声
+    - 状态和缓冲区都是预分配的；输出比输入晚 256 个样本 (16ms)
+    - 每帧耗时超过 noise_suppression_budget_ms 时直接透传一段时间 (输出仍然对齐，不会断音)
+    """
+
+    def __init__(self, config, sample_rate=MODEL_SAMPLE_RATE, frame=512, hop=256):
+        self.sample_rate = sample_rate
+        self.frame = frame
+        self.hop = hop
+        self.bins = frame // 2 + 1
+        # 周期 Hann 开方: 分析窗 × 合成窗 = Hann，50% 重叠相加恒为 1
+        self.window = np.sqrt(0.5 - 0.5 * np.cos(2 * np.pi * np.arange(frame) / frame)).astype(np.float32)
+        self._tail_gain = self.window[hop:] ** 2
+
+        self.gain_floor = 10 ** (config.get("noise_suppression_floor_db", -20) / 20.0)
+        self.budget_us = config.get("noise_suppression_budget_ms", 1.0) * 1000.0
+        self.smooth = 0.8                        # 功率谱平滑
+        self.noise_rise = 0.002                  # 噪声估计上升速度 (每帧)
+        self.dd_alpha = 0.98                     # 决策引导的平滑系数
+        self.init_frames = int(0.25 * sample_rate / hop)   # 开头 0.25 秒直接当噪声学习
+        self.bypass_frames = int(5.0 * sample_rate / hop)  # 超预算后透传多少帧再重试
+
+        # === 预分配的流式状态 ===
+        self._work = np.zeros(frame - hop + 4096, dtype=np.float32)
+        self._carry = np.zeros(hop, dtype=np.float32)
+        self.noise = np.zeros(self.bins, dtype=np.float32)
+        self._power = np.zeros(self.bins, dtype=np.float32)
+        self._clean = np.zeros(self.bins, dtype=np.float32)
+        self._gains = np.zeros((0, self.bins), dtype=np.float32)
+        self.frames_seen = 0
+        self.frame_cost_us = 0.0
+        self._bypass_left = 0
+        self.reset()
+
+    def reset(self):
+        """清空重叠相加状态 (流被打断时调用)；噪声谱保留，环境一般没变"""
+        self._work[:self.frame - self.hop] = 0.0
+        self._pending = self.frame - self.hop    # _work 里还没处理完的样本数
+        self._carry[:] = 0.0
+
+    def process(self, samples):
+        samples = np.asarray(samples, dtype=np.float32)
+        total = self._pending + len(samples)
+        if len(self._work) < total:
+            # 只在遇到更大的块时扩容一次，之后复用
+            work = np.zeros(total, dtype=np.float32)
+            work[:self._pending] = self._work[:self._pending]
+            self._work = work
+        work = self._work
+        work[self._pending:total] = samples
+
+        n_frames = (total - self.frame) // self.hop + 1 if total >= self.frame else 0
+        if n_frames <= 0:
+            self._pending = total
+            return np.zeros(0, dtype=np.float32)
+
+        start = time.perf_counter()
+        if self._bypass_left > 0:
+            self._bypass_left = max(0, self._bypass_left - n_frames)
+            out = self._passthrough(work, n_frames)
+        elif self.frames_seen < self.init_frames:
+            # 学噪声的这段也顺便让 FFT 预热，不计入耗时
+            out = self._suppress(work, n_frames)
+        else:
+            out = self._suppress(work, n_frames)
+            cost = (time.perf_counter() - start) * 1e6 / n_frames
+            self.frame_cost_us = cost if self.frame_cost_us == 0 else 0.9 * self.frame_cost_us + 0.1 * cost
+            metrics.set_gauge("noise_suppression_frame_us", round(self.frame_cost_us, 1))
+            if self.frame_cost_us > self.budget_us:
+                print(f"⚠️ 降噪每帧 {self.frame_cost_us:.0f}us 超过预算 {self.budget_us:.0f}us，暂时透传")
+                metrics.inc("noise_suppression_bypasses")
+                self._bypass_left = self.bypass_frames
+                self.frame_cost_us = 0.0
+
+        used = n_frames * self.hop
+        rest = total - used
+        work[:rest] = work[used:total]
+        self._pending = rest
+        return out
+
+    def _passthrough(self, work, n_frames):
+        """透传: 和增益全为 1 时的输出完全一样 (同样的延迟)，前后切换不会有跳变"""
+        used = n_frames * self.hop
+        out = work[:used].copy()
+        out[:self.hop] = self._carry + work[:self.hop] * self.window[:self.hop] ** 2
+        self._carry[:] = work[used:used + self.hop] * self._tail_gain
+        return out
+
+    def _suppress(self, work, n_frames):
+        frames = np.lib.stride_tricks.sliding_window_view(work[:(n_frames - 1) * self.hop + self.frame],
+                                                          self.frame)[::self.hop]
+        spec = np.fft.rfft(frames * self.window, axis=1)
+        power = (spec.real ** 2 + spec.imag ** 2).astype(np.float32)
+
+        if self._gains.shape[0] < n_frames:
+            self._gains = np.zeros((n_frames, self.bins), dtype=np.float32)
+        gains = self._gains[:n_frames]
+        noise, smoothed, clean = self.noise, self._power, self._clean
+        for i in range(n_frames):
+            p = power[i]
+            if self.frames_seen < self.init_frames:
+                # 开头一小段按平均值学噪声谱
+                noise += (p - noise) / (self.frames_seen + 1)
+                smoothed[:] = noise
+                clean[:] = 0.0
+                gains[i] = self.gain_floor
+                self.frames_seen += 1
+                continue
+            self.frames_seen += 1
+            smoothed *= self.smooth
+            smoothed += (1 - self.smooth) * p
+            # 连续最小值跟踪: 低了立刻跟，高了慢慢涨
+            np.minimum(smoothed, noise + self.noise_rise * (smoothed - noise), out=noise)
+            np.maximum(noise, 1e-10, out=noise)
+            post = p / noise
+            prior = self.dd_alpha * clean / noise + (1 - self.dd_alpha) * np.maximum(post - 1.0, 0.0)
+            g = prior / (1.0 + prior)
+            np.maximum(g, self.gain_floor, out=g)
+            gains[i] = g
+            clean[:] = g * g * p
+
+        out_frames = np.fft.irfft(spec * gains, n=self.frame, axis=1).astype(np.float32) * self.window
+        # 重叠相加: 每帧前半和上一帧后半拼成一个帧移的输出
+        out = out_frames[:, :self.hop].copy()
+        out[0] += self._carry
+        out[1:] += out_frames[:-1, self.hop:]
+        self._carry[:] = out_frames[-1, self.hop:]
+        return out.reshape(-1)
@@ -0,0 +1,164 @@
+"""
+参数扫描: 把带标注的音频集按真实切分流程 (VADSegmenter + FSMN-VAD + SenseVoice) 在一组参数网格上逐个回放，
+统计 字错误率 / 说完到上屏的延迟 / 强制切分比例 / 推理代价，输出 Pareto 前沿报告，
+按部署场景 (安静办公室 / 嘈杂会议室 / 慢速 CPU) 从数据里挑参数，而不是凭感觉。
+
+运行示例:
+    python src/param_sweep.py --data dataset/ \
+        --vad-sensitivity 0.2,1.0,1.4 --pause-delay 0.5,0.8,1.2 --buffer 4,6 --noise 0.002,0.005
+
+报告写到 log/sweep_<时间>/: report.md (Pareto 前沿 + 全部结果)、results.csv、results.json
+"""
+import os
+import sys
+import csv
+import json
+import time
+import argparse
+import itertools
+
+# === 扫描的参数 (配置项, 命令行参数, 说明) ===
+GRID = [
+    ("vad_sensitivity_factor", "--vad-sensitivity", "VAD 阈值因子"),
+    ("vad_pause_delay", "--pause-delay", "断句等待秒数"),
+    ("buffer_seconds", "--buffer", "强制切分秒数"),
+    ("noise_threshold", "--noise", "噪声门限"),
+]
+
+# 越小越好的指标；Pareto 判定用前 4 个
+OBJECTIVES = ["cer", "latency_p90_s", "force_cut_rate", "rtf"]
+
+
+def parse_values(text):
+    return [float(v) for v in text.split(",") if v.strip()]
+
+
+def dominates(a, b, keys):
+    return all(a[k] <= b[k] for k in keys) and any(a[k] < b[k] for k in keys)
+
+
+def pareto_front(rows, keys):
+    return [r for r in rows if not any(dominates(o, r, keys) for o in rows if o is not r)]
+
+
+def _fmt(row, key):
+    value = row[key]
+    if key == "cer" or key == "force_cut_rate":
+        return f"{value * 100:.2f}%"
+    if isinstance(value, float):
+        return f"{value:.3f}"
+    return str(value)
+
+
+def write_report(rows, out_dir, meta):
+    os.makedirs(out_dir, exist_ok=True)
+    param_keys = [k for k, _, _ in GRID]
+    columns = param_keys + OBJECTIVES + ["latency_mean_s", "decode_ratio", "segments"]
+
+    with open(os.path.join(out_dir, "results.csv"), "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=columns + ["pareto", "pareto_cer_latency"])
+        writer.writeheader()
+        for r in rows:
+            writer.writerow({k: r[k] for k in writer.fieldnames})
+    with open(os.path.join(out_dir, "results.json"), "w", encoding="utf-8") as f:
+        json.dump({"meta": meta, "results": rows}, f, ensure_ascii=False, indent=2)
+
+    def table(subset):
+        lines = ["| " + " | ".join(columns) + " |", "|" + "---|" * len(columns)]
+        for r in subset:
+            lines.append("| " + " | ".join(_fmt(r, k) for k in columns) + " |")
+        return "\n".join(lines)
+
+    front_2d = sorted((r for r in rows if r["pareto_cer_latency"]), key=lambda r: r["latency_p90_s"])
+    front = sorted((r for r in rows if r["pareto"]), key=lambda r: r["cer"])
+    with open(os.path.join(out_dir, "report.md"), "w", encoding="utf-8") as f:
+        f.write("# 参数扫描报告\n\n")
+        f.write(f"- 标注集: `{meta['data']}` ({meta['files']} 条, {meta['audio_seconds']:.0f} 秒)\n")
+        f.write(f"- 组合数: {len(rows)}，结果缓存: {'开' if meta['cache'] else '关'}"
+                f"{' (rtf 不可信，只看 decode_ratio)' if meta['cache'] else ''}\n")
+        f.write(f"- 当前配置: {meta['current']}\n\n")
+        f.write("## 字错误率 vs 延迟 Pareto 前沿\n\n"
+                "按延迟从低到高；往下走是用延迟换准确率。\n\n")
+        f.write(table(front_2d) + "\n\n")
+        f.write("## 四项指标 (CER / p90 延迟 / 强制切分 / RTF) 都不被支配的组合\n\n")
+        f.write(table(front) + "\n\n")
+        f.write("## 全部结果 (按 CER 排序)\n\n")
+        f.write(table(sorted(rows, key=lambda r: (r["cer"], r["latency_p90_s"]))) + "\n")
+
+
+def main():
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    parser = argparse.ArgumentParser(description="VAD / 断句参数扫描，输出延迟-准确率 Pareto 报告")
+    parser.add_argument("--data", required=True, help="标注集 (目录 / .tsv / .jsonl)")
+    for key, flag, desc in GRID:
+        parser.add_argument(flag, type=parse_values, default=None, help=f"{desc}，逗号分隔 (默认用当前配置)")
+    parser.add_argument("--cache", action="store_true", help="使用结果缓存 (重跑快，但 RTF 不准)")
+    parser.add_argument("--out", default=None, help="报告目录 (默认 log/sweep_<时间>)")
+    args = parser.parse_args()
+
+    import asr_core
+    from audio_io import read_wav_16k
+    from evaluation import load_labeled_set, evaluate
+    from resampler import MODEL_SAMPLE_RATE
+
+    labeled = load_labeled_set(args.data)
+    if not labeled:
+        parser.error(f"标注集为空: {args.data}")
+    items = [(path, ref, read_wav_16k(path)) for path, ref in labeled]
+    audio_seconds = sum(len(a) for _, _, a in items) / MODEL_SAMPLE_RATE
+    print(f"📂 标注集 {len(items)} 条，共 {audio_seconds:.0f} 秒")
+
+    base = dict(asr_core.config)
+    # 自适应断句会边跑边学，扫描时关掉，保证每个组合条件一样
+    base["adaptive_endpointing"] = False
+    model_vad = asr_core.load_vad_model(base)
+
+    grid_values = []
+    for key, flag, _ in GRID:
+        values = getattr(args, flag.lstrip("-").replace("-", "_"))
+        grid_values.append(values or [base.get(key, 0)])
+
+    def transcribe(audio, cfg):
+        return asr_core.asr_transcribe(audio, config_override=cfg, use_cache=args.cache)
+
+    combos = list(itertools.product(*grid_values))
+    rows = []
+    for n, combo in enumerate(combos, 1):
+        cfg = dict(base)
+        cfg.update({key: value for (key, _, _), value in zip(GRID, combo)})
+        result = evaluate(items, cfg, model_vad, transcribe)
+        row = {key: cfg[key] for key, _, _ in GRID}
+        row.update(result)
+        rows.append(row)
+        print(f"[{n}/{len(combos)}] {row_summary(row)}")
+    asr_core.set_vad_sensitivity(model_vad, base.get("vad_sensitivity_factor", 1.0))
+
+    front = pareto_front(rows, OBJECTIVES)
+    front_2d = pareto_front(rows, ["cer", "latency_p90_s"])
+    for r in rows:
+        r["pareto"] = any(r is p for p in front)
+        r["pareto_cer_latency"] = any(r is p for p in front_2d)
+
+    out_dir = args.out or asr_core.resolve_user_path(f"log/sweep_{time.strftime('%Y%m%d_%H%M%S')}")
+    meta = {
+        "data": args.data,
+        "files": len(items),
+        "audio_seconds": audio_seconds,
+        "cache": args.cache,
+        "current": {key: asr_core.config.get(key) for key, _, _ in GRID},
+    }
+    write_report(rows, out_dir, meta)
+    print(f"\n🏁 Pareto 前沿 (CER vs 延迟) {len(front_2d)} 个组合:")
+    for r in sorted(front_2d, key=lambda r: r["latency_p90_s"]):
+        print(f"   {row_summary(r)}")
+    print(f"📄 报告: {os.path.join(out_dir, 'report.md')}")
+
+
+def row_summary(row):
+    params = " ".join(f"{key}={row[key]:g}" for key, _, _ in GRID)
+    return (f"{params} -> CER {row['cer'] * 100:.2f}% | p90 延迟 {row['latency_p90_s']:.2f}s | "
+            f"强制切分 {row['force_cut_rate'] * 100:.1f}% | RTF {row['rtf']:.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+SenseVoice 的 int8 动态量化 (配置 asr_quantization: int8)。
+
+加载完 PyTorch 模型后，把 encoder / decoder (SenseVoice 的解码头是 ctc) 里的 nn.Linear 换成
+torch 的动态量化版本: 权重存 int8，激活在推理时按批动态量化。仍然走 FunASR 的 PyTorch 推理流程，
+只是矩阵乘法变成 int8，CPU 上通常能快不少，准确率损失一般很小 (用 tests/bench_quantization.py 实测)。
+
+- 只在 CPU 上生效 (PyTorch 的动态量化算子只有 CPU 实现)，GPU 上会跳过
+- 量化后的子模块缓存到 quantize_cache_dir，下次启动直接加载，不用每次重新量化；
+  缓存按 模型文件 (名字 / 大小 / 修改时间) + torch 版本 + 量化范围 区分，换了模型会自动重新量化
+"""
+import os
+import time
+import hashlib
+
+QUANT_MODES = ("none", "int8")
+DEFAULT_TARGETS = ("encoder", "decoder", "ctc")
+
+
+def quantization_mode(config):
+    mode = str(config.get("asr_quantization", "none") or "none").lower()
+    if mode not in QUANT_MODES:
+        print(f"⚠️ 不支持的 asr_quantization: {mode}，按 none 处理")
+        return "none"
+    return mode
+
+
+def cache_key(model_dir, targets):
+    import torch
+    h = hashlib.sha256()
+    h.update(f"{torch.__version__}|{','.join(targets)}".encode())
+    if model_dir and os.path.isdir(model_dir):
+        for name in sorted(os.listdir(model_dir)):
+            if name.endswith((".pt", ".pth", ".bin", ".safetensors")):
+                st = os.stat(os.path.join(model_dir, name))
+                h.update(f"|{name}:{st.st_size}:{int(st.st_mtime)}".encode())
+    else:
+        h.update(str(model_dir).encode())
+    return h.hexdigest()[:16]
+
+
+def _linear_count(module):
+    import torch
+    return sum(1 for m in module.modules() if isinstance(m, torch.nn.Linear))
+
+
+def quantize_auto_model(auto_model, device, config, cache_dir=None):
+    """
+    对 FunASR AutoModel 的 .model 原地替换量化后的子模块，返回 auto_model。
+    量化成功时 auto_model.quantization = "int8"；device 不是 CPU 或出错时保持原样 (打印原因)，不设这个属性。
+    """
+    if not str(device).startswith("cpu"):
+        print(f"⚠️ int8 量化只在 CPU 上生效，当前设备 {device}，保持原精度")
+        return auto_model
+    import torch
+
+    module = getattr(auto_model, "model", None)
+    if module is None:
+        print("⚠️ 找不到 PyTorch 模型 (auto_model.model)，跳过量化")
+        return auto_model
+    targets = [t for t in config.get("quantize_targets", DEFAULT_TARGETS) if getattr(module, t, None) is not None]
+    if not targets:
+        print("⚠️ 模型里没有可量化的子模块，跳过量化")
+        return auto_model
+
+    model_dir = (getattr(auto_model, "kwargs", None) or {}).get("model_path")
+    path = None
+    if cache_dir:
+        path = os.path.join(cache_dir, f"sensevoice_int8_{cache_key(model_dir, targets)}.pt")
+
+    start = time.perf_counter()
+    if path and os.path.exists(path):
+        try:
+            # 自己写的缓存，里面是整个子模块 (pickle)，所以不能用 weights_only
+            cached = torch.load(path, map_location="cpu", weights_only=False)
+            for name in targets:
+                setattr(module, name, cached[name])
+            module.eval()
+            auto_model.quantization = "int8"
+            print(f"⚡ 已加载 int8 量化缓存 ({(time.perf_counter() - start) * 1000:.0f} ms): {path}")
+            return auto_model
+        except Exception as e:
+            print(f"⚠️ 量化缓存无法加载，重新量化: {e}")
+
+    linear = 0
+    for name in targets:
+        sub = getattr(module, name)
+        linear += _linear_count(sub)
+        setattr(module, name, torch.ao.quantization.quantize_dynamic(sub, {torch.nn.Linear}, dtype=torch.qint8))
+    module.eval()
+    auto_model.quantization = "int8"
+    print(f"⚡ int8 动态量化完成: {', '.join(targets)} 中 {linear} 个 Linear "
+          f"({(time.perf_counter() - start) * 1000:.0f} ms)")
+
+    if path:
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            tmp = path + ".tmp"
+            torch.save({name: getattr(module, name) for name in targets}, tmp)
+            os.replace(tmp, path)
+        except Exception as e:
+            print(f"⚠️ 量化缓存保存失败: {e}")
+    return auto_model
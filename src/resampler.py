@@ -0,0 +1,95 @@
+import math
+import numpy as np
+
+# SenseVoice / FSMN-VAD 都是按 16k 训练的，送入模型的音频必须是这个采样率
+MODEL_SAMPLE_RATE = 16000
+
+
+class PolyphaseResampler:
+    """
+    流式多相重采样器 (float32, 单声道)。
+
+    - in_rate / out_rate 约分成 up/down (例如 48000->16000 = 1/3, 44100->16000 = 160/441)
+    - 低通滤波器 (Kaiser 窗 sinc) 在初始化时一次性设计好，并拆成 up 个相位的滤波器组
+    - 每个输出点只计算它所在相位的那一行 (taps 次乘加)，整块音频用一次矩阵运算完成
+    - 块与块之间只保留 taps-1 个历史样本，状态是预分配的，不随时长增长
+    """
+
+    def __init__(self, in_rate, out_rate=MODEL_SAMPLE_RATE, zero_crossings=16,
+                 rolloff=0.945, kaiser_beta=8.6):
+        self.in_rate = int(in_rate)
+        self.out_rate = int(out_rate)
+        g = math.gcd(self.in_rate, self.out_rate)
+        self.up = self.out_rate // g
+        self.down = self.in_rate // g
+        self.passthrough = (self.up == self.down)
+        if self.passthrough:
+            return
+
+        # === 设计原型低通滤波器 (在 up 倍上采样后的采样率下) ===
+        factor = max(self.up, self.down)
+        cutoff = rolloff / (2.0 * factor)          # 归一化截止频率 (周期/样本)
+        half_len = int(math.ceil(zero_crossings * factor / self.up)) * self.up
+        n = np.arange(-half_len, half_len, dtype=np.float64)
+        h = 2.0 * cutoff * np.sinc(2.0 * cutoff * n)
+        h *= np.kaiser(len(n), kaiser_beta)
+        h *= self.up / h.sum()                      # 补偿插零带来的增益损失
+
+        # === 拆成多相滤波器组: bank[p, k] = h[p + k*up] ===
+        # 输出第 m 个点: y[m] = sum_k x[j - k] * bank[p, k]，其中 j = (m*down)//up, p = (m*down)%up
+        self.taps = len(h) // self.up
+        self.bank = h.reshape(self.taps, self.up).T[:, ::-1].astype(np.float32).copy()
+        # bank 做了翻转，这样可以直接和按时间正序排列的输入窗口做点积
+        self._offsets = np.arange(self.taps, dtype=np.int64)
+
+        # === 预分配的流式状态 ===
+        self._work = np.zeros(self.taps - 1 + 4096, dtype=np.float32)
+        self.reset()
+
+    def reset(self):
+        """清空历史 (流被打断/暂停恢复时调用)"""
+        if self.passthrough:
+            return
+        self._work[:self.taps - 1] = 0.0
+        self._in_pos = 0    # 已消耗的输入样本数 (取模后)
+        self._out_pos = 0   # 已产生的输出样本数 (取模后)
+
+    def process(self, samples: np.ndarray) -> np.ndarray:
+        samples = np.asarray(samples, dtype=np.float32)
+        if self.passthrough or len(samples) == 0:
+            return samples
+
+        hist = self.taps - 1
+        total = hist + len(samples)
+        if len(self._work) < total:
+            # 只在遇到更大的块时扩容一次，之后复用
+            work = np.zeros(total, dtype=np.float32)
+            work[:hist] = self._work[:hist]
+            self._work = work
+        work = self._work
+        work[hist:total] = samples
+
+        in_end = self._in_pos + len(samples)
+        # 可计算的输出点: (m*down)//up <= in_end - 1
+        out_end = ((in_end - 1) * self.up) // self.down + 1
+        if out_end > self._out_pos:
+            m = np.arange(self._out_pos, out_end, dtype=np.int64)
+            md = m * self.down
+            j = md // self.up
+            phase = md - j * self.up
+            # 窗口起点 (在 work 中): x[j - taps + 1 .. j]
+            start = j - self._in_pos
+            frames = work[start[:, None] + self._offsets[None, :]]
+            out = np.einsum("ij,ij->i", frames, self.bank[phase])
+        else:
+            out = np.zeros(0, dtype=np.float32)
+
+        # === 保留历史，并把计数器取模防止无限增长 ===
+        work[:hist] = work[total - hist:total]
+        self._out_pos = out_end
+        self._in_pos = in_end
+        if self._out_pos >= self.up:
+            k = self._out_pos // self.up
+            self._out_pos -= k * self.up
+            self._in_pos -= k * self.down
+        return out.astype(np.float32, copy=False)
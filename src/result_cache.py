@@ -0,0 +1,111 @@
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+
+
+class ResultCache:
+    """
+    识别结果磁盘缓存 (按内容寻址)。
+
+    key = sha256(音频 PCM + 模型 + 语言 + use_itn)，value 是模型输出的原始富文本
+    (还带着 <|zh|><|NEUTRAL|> 之类的标签，没有做 emoji / 标点清洗)，
+    这样只改后处理时可以直接从缓存重新格式化，不用再跑推理。
+
+    - 每条一个小文件，按 key 前两位分子目录
+    - 总大小超过 max_bytes 时按 LRU 淘汰 (命中时 touch 文件，重启后按 mtime 恢复顺序)
+    """
+
+    def __init__(self, cache_dir, max_bytes=512 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = int(max_bytes)
+        self.hits = 0
+        self.misses = 0
+        self.total_bytes = 0
+        self._index = OrderedDict()   # key -> 文件大小，越靠后越新
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._load_index()
+
+    @staticmethod
+    def make_key(pcm, model_id, language, use_itn):
+        h = hashlib.sha256()
+        h.update(np.ascontiguousarray(pcm, dtype=np.float32).tobytes())
+        h.update(f"|{model_id}|{language}|{int(bool(use_itn))}".encode("utf-8"))
+        return h.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + ".txt")
+
+    def _load_index(self):
+        entries = []
+        for sub in os.scandir(self.cache_dir):
+            if not sub.is_dir():
+                continue
+            for entry in os.scandir(sub.path):
+                if entry.name.endswith(".txt"):
+                    st = entry.stat()
+                    entries.append((st.st_mtime, entry.name[:-4], st.st_size))
+        entries.sort()
+        for _, key, size in entries:
+            self._index[key] = size
+            self.total_bytes += size
+        self._evict()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._index:
+                self.misses += 1
+                return None
+            path = self._path(key)
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    text = f.read()
+                os.utime(path, None)
+            except OSError:
+                # 文件被外部删掉了
+                self.total_bytes -= self._index.pop(key)
+                self.misses += 1
+                return None
+            self._index.move_to_end(key)
+            self.hits += 1
+            return text
+
+    def put(self, key, raw_text):
+        data = raw_text.encode("utf-8")
+        path = self._path(key)
+        with self._lock:
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp = path + ".tmp"
+                with open(tmp, "wb") as f:
+                    f.write(data)
+                os.replace(tmp, path)
+            except OSError as e:
+                print(f"⚠️ 结果缓存写入失败: {e}")
+                return
+            self.total_bytes -= self._index.pop(key, 0)
+            self._index[key] = len(data)
+            self.total_bytes += len(data)
+            self._evict()
+
+    def _evict(self):
+        while self.total_bytes > self.max_bytes and self._index:
+            key, size = self._index.popitem(last=False)
+            self.total_bytes -= size
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._index),
+                "bytes": self.total_bytes,
+            }
@@ -0,0 +1,318 @@
+"""
+语音段归档: 反馈音频 / 线上采集的训练数据，不再一段一个 WAV 小文件。
+
+目录结构 (都是只追加写):
+    segments.pcm   所有段的 16bit PCM 首尾相接
+    texts.bin      识别文本 (UTF-8) 首尾相接
+    index.bin      定长索引记录 (INDEX_DTYPE)，一段一条
+    meta.json      采样率 / 版本
+
+写入顺序是 PCM -> 文本 -> 索引，索引记录写完才算这一段存进去了；
+程序中途崩溃留下的半截 PCM / 文本，下次打开时按索引截掉。
+读取用 np.memmap，按下标随机访问不需要把整个文件读进内存。
+
+命令行:
+    python src/segment_archive.py stats   feedback_archive
+    python src/segment_archive.py export  feedback_archive out_dir     # WAV + manifest.jsonl
+    python src/segment_archive.py compact feedback_archive --days 30 --max-mb 2048
+"""
+import os
+import json
+import time
+import wave
+import argparse
+import threading
+
+import numpy as np
+
+from resampler import MODEL_SAMPLE_RATE
+
+ARCHIVE_VERSION = 1
+
+INDEX_DTYPE = np.dtype([
+    ("offset", "<i8"),        # 在 segments.pcm 里的起始位置 (样本数)
+    ("length", "<i4"),        # 样本数
+    ("timestamp", "<f8"),     # 写入时间 (unix 秒)
+    ("audio_id", "<i8"),      # Worker 的 audio_id (毫秒时间戳)，没有就是 -1
+    ("text_offset", "<i8"),   # 在 texts.bin 里的起始字节
+    ("text_length", "<i4"),
+    ("language", "S8"),
+])
+
+
+class SegmentArchive:
+    def __init__(self, path, sample_rate=MODEL_SAMPLE_RATE):
+        self.path = path
+        self.sample_rate = sample_rate
+        self._lock = threading.Lock()
+        self._pcm_map = None
+        self._index_map = None
+        os.makedirs(path, exist_ok=True)
+        self._load_meta()
+        self._recover()
+
+    # === 文件路径 ===
+    @property
+    def pcm_path(self):
+        return os.path.join(self.path, "segments.pcm")
+
+    @property
+    def text_path(self):
+        return os.path.join(self.path, "texts.bin")
+
+    @property
+    def index_path(self):
+        return os.path.join(self.path, "index.bin")
+
+    def _load_meta(self):
+        meta_path = os.path.join(self.path, "meta.json")
+        if os.path.exists(meta_path):
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            self.sample_rate = meta.get("sample_rate", self.sample_rate)
+        else:
+            with open(meta_path, "w", encoding="utf-8") as f:
+                json.dump({"version": ARCHIVE_VERSION, "sample_rate": self.sample_rate}, f)
+
+    @property
+    def _compact_marker(self):
+        return os.path.join(self.path, "compact.pending")
+
+    def _finish_compaction(self):
+        """压缩替换文件到一半崩溃: 标记还在就把剩下的替换做完，没有标记说明新文件没写完，丢掉"""
+        files = (self.pcm_path, self.text_path, self.index_path)
+        if os.path.exists(self._compact_marker):
+            for p in files:
+                if os.path.exists(p + ".tmp"):
+                    os.replace(p + ".tmp", p)
+            os.remove(self._compact_marker)
+        for p in files:
+            if os.path.exists(p + ".tmp"):
+                os.remove(p + ".tmp")
+
+    def _recover(self):
+        """截掉最后一条完整索引之后的残留数据 (上次写到一半崩溃)"""
+        self._finish_compaction()
+        for p in (self.pcm_path, self.text_path, self.index_path):
+            if not os.path.exists(p):
+                open(p, "wb").close()
+        index_bytes = os.path.getsize(self.index_path)
+        whole = index_bytes - index_bytes % INDEX_DTYPE.itemsize
+        if whole != index_bytes:
+            os.truncate(self.index_path, whole)
+        index = self._read_index()
+        pcm_end = text_end = 0
+        if len(index):
+            last = index[-1]
+            pcm_end = int(last["offset"] + last["length"]) * 2
+            text_end = int(last["text_offset"] + last["text_length"])
+        if os.path.getsize(self.pcm_path) > pcm_end:
+            os.truncate(self.pcm_path, pcm_end)
+        if os.path.getsize(self.text_path) > text_end:
+            os.truncate(self.text_path, text_end)
+
+    def _read_index(self):
+        return np.fromfile(self.index_path, dtype=INDEX_DTYPE)
+
+    def _release_maps(self):
+        # Windows 上被映射的文件不能截断 / 替换，压缩前先放掉
+        self._pcm_map = None
+        self._index_map = None
+
+    # === 写入 ===
+    def append(self, audio, text="", language="", audio_id=None, timestamp=None):
+        """audio: float32 [-1, 1] 或 int16，返回这一段的下标"""
+        if audio.dtype != np.int16:
+            audio = (np.clip(audio, -1.0, 1.0) * 32767).astype(np.int16)
+        text_bytes = (text or "").encode("utf-8")
+        with self._lock:
+            offset = os.path.getsize(self.pcm_path) // 2
+            text_offset = os.path.getsize(self.text_path)
+            with open(self.pcm_path, "ab") as f:
+                f.write(audio.tobytes())
+            with open(self.text_path, "ab") as f:
+                f.write(text_bytes)
+            record = np.zeros(1, dtype=INDEX_DTYPE)
+            record["offset"] = offset
+            record["length"] = len(audio)
+            record["timestamp"] = time.time() if timestamp is None else timestamp
+            record["audio_id"] = -1 if audio_id is None else int(audio_id)
+            record["text_offset"] = text_offset
+            record["text_length"] = len(text_bytes)
+            record["language"] = (language or "").encode("ascii", "ignore")[:8]
+            with open(self.index_path, "ab") as f:
+                f.write(record.tobytes())
+            self._index_map = None
+            return os.path.getsize(self.index_path) // INDEX_DTYPE.itemsize - 1
+
+    # === 读取 ===
+    @property
+    def index(self):
+        """全部索引记录 (memmap，只读)"""
+        if self._index_map is None or len(self._index_map) * INDEX_DTYPE.itemsize != os.path.getsize(self.index_path):
+            if os.path.getsize(self.index_path) == 0:
+                return np.zeros(0, dtype=INDEX_DTYPE)
+            self._index_map = np.memmap(self.index_path, dtype=INDEX_DTYPE, mode="r")
+        return self._index_map
+
+    def __len__(self):
+        return os.path.getsize(self.index_path) // INDEX_DTYPE.itemsize
+
+    def _pcm(self):
+        size = os.path.getsize(self.pcm_path) // 2
+        if self._pcm_map is None or len(self._pcm_map) != size:
+            self._pcm_map = np.memmap(self.pcm_path, dtype=np.int16, mode="r") if size else np.zeros(0, np.int16)
+        return self._pcm_map
+
+    def audio(self, i):
+        """第 i 段的 int16 PCM (memmap 视图，不复制)"""
+        rec = self.index[i]
+        start = int(rec["offset"])
+        return self._pcm()[start:start + int(rec["length"])]
+
+    def text(self, i):
+        rec = self.index[i]
+        with open(self.text_path, "rb") as f:
+            f.seek(int(rec["text_offset"]))
+            return f.read(int(rec["text_length"])).decode("utf-8", errors="replace")
+
+    def find(self, audio_id):
+        """按 audio_id 找下标，找不到返回 None"""
+        hits = np.nonzero(self.index["audio_id"] == int(audio_id))[0] if len(self) else []
+        return int(hits[-1]) if len(hits) else None
+
+    def iter_records(self):
+        """顺序读全部段 (texts.bin 一次读进来，PCM 走 memmap)，产出 (下标, 记录, int16 音频, 文本)"""
+        index = self.index
+        with open(self.text_path, "rb") as f:
+            texts = f.read()
+        pcm = self._pcm()
+        for i, rec in enumerate(index):
+            start = int(rec["offset"])
+            t0 = int(rec["text_offset"])
+            yield (i, rec, pcm[start:start + int(rec["length"])],
+                   texts[t0:t0 + int(rec["text_length"])].decode("utf-8", errors="replace"))
+
+    def stats(self):
+        index = self.index
+        return {
+            "segments": len(index),
+            "audio_hours": round(float(index["length"].sum()) / self.sample_rate / 3600, 3) if len(index) else 0.0,
+            "pcm_mb": round(os.path.getsize(self.pcm_path) / 1024 / 1024, 2),
+            "oldest": time.strftime("%Y-%m-%d %H:%M", time.localtime(index["timestamp"].min())) if len(index) else None,
+            "newest": time.strftime("%Y-%m-%d %H:%M", time.localtime(index["timestamp"].max())) if len(index) else None,
+        }
+
+    # === 导出 ===
+    def export_wav(self, i, filename):
+        _write_wav(filename, self.audio(i), self.sample_rate)
+
+    def export(self, out_dir):
+        """导出成 一段一个 WAV + manifest.jsonl (给训练脚本用)，返回导出条数"""
+        os.makedirs(out_dir, exist_ok=True)
+        count = 0
+        with open(os.path.join(out_dir, "manifest.jsonl"), "w", encoding="utf-8") as manifest:
+            for i, rec, pcm, text in self.iter_records():
+                name = f"{int(rec['audio_id']) if rec['audio_id'] >= 0 else i}.wav"
+                _write_wav(os.path.join(out_dir, name), pcm, self.sample_rate)
+                manifest.write(json.dumps({
+                    "audio": name,
+                    "text": text,
+                    "language": rec["language"].decode("ascii", "ignore"),
+                    "duration": round(int(rec["length"]) / self.sample_rate, 3),
+                    "timestamp": float(rec["timestamp"]),
+                }, ensure_ascii=False) + "\n")
+                count += 1
+        return count
+
+    # === 压缩 / 保留策略 ===
+    def compact(self, max_age_days=None, max_bytes=None):
+        """
+        按保留策略删掉旧段并回收空间: 超过 max_age_days 天的删掉；PCM 总大小超过 max_bytes 时从最旧的开始删。
+        重写成新文件再整体替换，返回删掉的段数。
+        """
+        with self._lock:
+            index = self._read_index()
+            keep = np.ones(len(index), dtype=bool)
+            if max_age_days is not None:
+                keep &= index["timestamp"] >= time.time() - max_age_days * 86400
+            if max_bytes is not None and len(index):
+                # 从最新往回累加，超出上限的 (更旧的) 都不要
+                order = np.argsort(index["timestamp"])[::-1]
+                sizes = np.cumsum(index["length"][order].astype(np.int64) * 2)
+                keep[order[sizes > max_bytes]] = False
+            removed = int((~keep).sum())
+            if removed == 0:
+                return 0
+
+            self._release_maps()
+            pcm = np.memmap(self.pcm_path, dtype=np.int16, mode="r") if os.path.getsize(self.pcm_path) else None
+            with open(self.text_path, "rb") as f:
+                texts = f.read()
+            new_index = index[keep].copy()
+            tmp = {p: p + ".tmp" for p in (self.pcm_path, self.text_path, self.index_path)}
+            with open(tmp[self.pcm_path], "wb") as fp, open(tmp[self.text_path], "wb") as ft:
+                pcm_pos = text_pos = 0
+                for rec in new_index:
+                    start, length = int(rec["offset"]), int(rec["length"])
+                    fp.write(pcm[start:start + length].tobytes())
+                    t0, tl = int(rec["text_offset"]), int(rec["text_length"])
+                    ft.write(texts[t0:t0 + tl])
+                    rec["offset"], rec["text_offset"] = pcm_pos, text_pos
+                    pcm_pos += length
+                    text_pos += tl
+            new_index.tofile(tmp[self.index_path])
+            del pcm
+            # 新文件都写完了才放标记，之后三个文件逐个替换；中途崩溃下次打开时由 _finish_compaction 接着做完
+            open(self._compact_marker, "wb").close()
+            self._finish_compaction()
+            return removed
+
+
+def _write_wav(filename, pcm, rate):
+    with wave.open(filename, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(rate)
+        wf.writeframes(np.ascontiguousarray(pcm, dtype=np.int16).tobytes())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="语音段归档工具")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("stats", help="统计")
+    p.add_argument("archive")
+    p = sub.add_parser("export", help="导出为 WAV + manifest.jsonl")
+    p.add_argument("archive")
+    p.add_argument("out_dir")
+    p = sub.add_parser("compact", help="按保留策略删除旧段并回收空间")
+    p.add_argument("archive")
+    p.add_argument("--days", type=float, default=None, help="只保留最近多少天")
+    p.add_argument("--max-mb", type=float, default=None, help="PCM 总大小上限")
+    p = sub.add_parser("show", help="列出最近的段")
+    p.add_argument("archive")
+    p.add_argument("-n", type=int, default=20)
+    args = parser.parse_args()
+
+    archive = SegmentArchive(args.archive)
+    if args.cmd == "stats":
+        print(json.dumps(archive.stats(), ensure_ascii=False, indent=2))
+    elif args.cmd == "export":
+        start = time.time()
+        count = archive.export(args.out_dir)
+        print(f"✅ 导出 {count} 段到 {args.out_dir} ({time.time() - start:.1f}s)")
+    elif args.cmd == "compact":
+        max_bytes = int(args.max_mb * 1024 * 1024) if args.max_mb else None
+        removed = archive.compact(args.days, max_bytes)
+        print(f"🧹 删除 {removed} 段，剩余 {archive.stats()}")
+    elif args.cmd == "show":
+        index = archive.index
+        for i in range(max(0, len(index) - args.n), len(index)):
+            rec = index[i]
+            when = time.strftime("%m-%d %H:%M:%S", time.localtime(rec["timestamp"]))
+            print(f"{i:6d} {when} {int(rec['length']) / archive.sample_rate:5.1f}s "
+                  f"[{rec['language'].decode('ascii', 'ignore')}] {archive.text(i)}")
+
+
+if __name__ == "__main__":
+    main()
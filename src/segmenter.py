@@ -0,0 +1,239 @@
+import time
+import numpy as np
+from resampler import MODEL_SAMPLE_RATE
+import tracing
+
+
+class Segment:
+    """
+    一段待识别的语音 (start/end 是在整条 16k 音频流中的样本位置)。
+
+    final=False 表示投机段: 刚出现第一个静音窗口，还没确认断句，可以提前开始识别。
+    spec_key 用来把最终段和之前的投机段对上 (中间静音没有被打断才会相同)。
+    trace_id: 这句话的追踪 ID (tracing 没抽中时为 None)。
+    """
+
+    def __init__(self, audio, start, end, forced=False, final=True, spec_key=None, trace_id=None):
+        self.audio = audio
+        self.start = start
+        self.end = end
+        self.forced = forced
+        self.final = final
+        self.spec_key = spec_key
+        self.trace_id = trace_id
+
+    @property
+    def duration(self):
+        return (self.end - self.start) / MODEL_SAMPLE_RATE
+
+
+class VADSegmenter:
+    """
+    把连续的 16k 音频切成语音段，实时麦克风 (Worker) 和文件转写共用同一套逻辑:
+
+    - 每攒够一个 VAD 窗口 (256ms) 就送一次 FSMN-VAD (流式 cache 连续)
+    - [逻辑 A] VAD 判定说话结束后又静音了 required_silence_count 个窗口 -> 自然切分
+    - [逻辑 B] 缓冲超过 force_cut_limit 秒 -> 强制切分，保留最后 1 秒重叠到下一段
+    - 能量低于 noise_threshold 的段直接丢弃 (防止幻觉)
+    - speculative=True 时，第一个静音窗口就额外产出一个投机段 (final=False)
+    - 传入 endpointer (AdaptiveEndpointer) 时断句阈值由它动态决定，并把观察到的停顿反馈给它
+    """
+
+    def __init__(self, model_vad, config, chunk_ms=256, stage_hook=None, speculative=False,
+                 endpointer=None):
+        self.model_vad = model_vad
+        self.sample_rate = MODEL_SAMPLE_RATE
+        self.chunk_ms = chunk_ms
+        self.chunk_samples = int(self.sample_rate * chunk_ms / 1000)
+        self.noise_threshold = config.get("noise_threshold", 0.002)
+        # VAD 模型加载失败时的兜底：按能量判断有没有人说话
+        self.energy_vad_threshold = config.get("energy_vad_threshold", 0.01)
+        if model_vad is None:
+            print("⚠️ 没有可用的 VAD 模型，改用能量检测断句")
+        # stage_hook("vad") 在每次调用 VAD 模型前执行 (线程亲和性切换)
+        self.stage_hook = stage_hook
+        self.speculative = speculative
+        self.endpointer = endpointer
+
+        pause_delay = config.get("vad_pause_delay", 0.8)
+        chunk_sec = chunk_ms / 1000.0
+        # 自动计算需要几个块 (至少 1 个)
+        self.required_silence_count = max(1, int(pause_delay / chunk_sec))
+
+        # === [关键修正 1] 强制设定最小安全缓冲时间 ===
+        # 无论配置文件写 2秒 还是 3秒，这里强制至少 4秒 才会触发硬切
+        # 这是为了防止 "死循环"（切分->识别卡顿->积压录音->瞬间又满->切分）
+        cfg_buffer = config.get("buffer_seconds", 6)
+        self.force_cut_limit = max(float(cfg_buffer), 4.0)
+        self.overlap_samples = int(1.0 * self.sample_rate)
+
+        self.position = 0   # 已经喂进来的总样本数
+        self.buffer = np.array([], dtype=np.float32)
+        self.buffer_start = 0
+        self._hops_since_cut = None   # 自然断句后过了几个窗口才再开口 (自适应断句用)
+        self.trace_id = None          # 当前这句话的追踪 ID
+        self.reset()
+
+    def reset(self):
+        """丢弃缓冲区和 VAD 状态 (暂停恢复 / 音频流不连续时调用)"""
+        self.buffer = np.array([], dtype=np.float32)
+        self.buffer_start = self.position
+        self.pending = 0            # 缓冲区末尾还没送进 VAD 的样本数
+        self._hops_since_cut = None
+        tracing.end(self.trace_id, outcome="reset")
+        self.trace_id = None
+        self._reset_vad()
+
+    @property
+    def current_required_silence(self):
+        if self.endpointer is not None:
+            return self.endpointer.required_silence_count
+        return self.required_silence_count
+
+    def _reset_vad(self):
+        self._energy_speech = False
+        self._energy_ms = 0
+        self.cache_vad = {}
+        self.last_vad_beg = -1
+        self.last_vad_end = -1
+        self.silence_counter = 0
+        self._spec_end = None       # 投机段的结束位置 (静音被打断就作废)
+
+    def feed(self, samples):
+        """喂入一块 16k float32 音频，返回这块音频触发的所有 Segment"""
+        segments = []
+        if len(samples):
+            self.buffer = np.concatenate((self.buffer, samples))
+            self.position += len(samples)
+            self.pending += len(samples)
+
+        while self.pending >= self.chunk_samples:
+            hop_start = len(self.buffer) - self.pending
+            hop = self.buffer[hop_start:hop_start + self.chunk_samples]
+            self.pending -= self.chunk_samples
+            cut = hop_start + self.chunk_samples
+
+            endpoint = self._process_hop(hop)
+            if self.trace_id is None and self.last_vad_beg > -1 and tracing.enabled():
+                # 检测到开口: 这句话的起点按实时流估算为这个窗口第一个样本到达的时间
+                self.trace_id = tracing.begin(
+                    start=time.perf_counter() - (len(self.buffer) - hop_start) / self.sample_rate)
+                tracing.instant(self.trace_id, "vad_speech_start")
+            if endpoint:
+                # === [逻辑 A] VAD 自然切分 ===
+                self._emit(segments, cut, forced=False)
+                continue
+            if self.silence_counter == 1 and self.speculative:
+                # 第一个静音窗口：提前把当前内容拿去识别，断句确认后直接用结果
+                self._emit_speculative(segments, cut)
+            if cut / self.sample_rate >= self.force_cut_limit:
+                # === [逻辑 B] 强制切分保护 (防止死锁) ===
+                self._emit(segments, cut, forced=True)
+        return segments
+
+    def flush(self):
+        """音频结束：把缓冲区剩下的内容作为最后一段"""
+        segments = []
+        if len(self.buffer):
+            self._emit(segments, len(self.buffer), forced=False)
+        return segments
+
+    def _process_hop(self, hop):
+        if self.stage_hook:
+            self.stage_hook("vad")
+        vad_start = time.perf_counter()
+        if self.model_vad is None:
+            res = self._energy_vad(hop)
+        else:
+            try:
+                res = self.model_vad.generate(
+                    input=hop,
+                    cache=self.cache_vad,
+                    is_final=False,
+                    chunk_size=self.chunk_ms
+                )
+            except Exception:
+                res = []
+        tracing.add_span(self.trace_id, "vad", vad_start)
+        was_speaking = self.last_vad_beg > -1 and self.last_vad_end == -1
+
+        if res and "value" in res[0]:
+            for segment in res[0]["value"]:
+                if segment[0] > -1:
+                    self.last_vad_beg = segment[0]
+                    if segment[1] == -1:
+                        # 新的一段语音开始了，之前的静音不算数
+                        self.last_vad_end = -1
+                if segment[1] > -1:
+                    self.last_vad_end = segment[1]
+
+        if self.endpointer is not None and self._hops_since_cut is not None:
+            self._hops_since_cut += 1
+            if self.last_vad_beg > -1:
+                # 断句之后很快又开口了
+                self.endpointer.observe_restart(self._hops_since_cut)
+                self._hops_since_cut = None
+
+        # 说话开始过、也结束了 -> 每个窗口累计一次静音
+        if self.last_vad_beg > -1 and self.last_vad_end > -1:
+            if was_speaking:
+                tracing.instant(self.trace_id, "vad_speech_end")
+            self.silence_counter += 1
+        else:
+            if self.silence_counter > 0 and self.endpointer is not None:
+                # 停顿后又继续说了：一次句内停顿
+                self.endpointer.observe_pause(self.silence_counter)
+            self.silence_counter = 0
+            self._spec_end = None
+        return self.silence_counter >= self.current_required_silence
+
+    def _energy_vad(self, hop):
+        """输出格式和 FSMN-VAD 流式结果一致: [[开始ms, -1]] / [[-1, 结束ms]]"""
+        now = self._energy_ms
+        self._energy_ms += self.chunk_ms
+        speech = np.sqrt(np.mean(hop ** 2)) > self.energy_vad_threshold
+        if speech and not self._energy_speech:
+            self._energy_speech = True
+            return [{"value": [[now, -1]]}]
+        if not speech and self._energy_speech:
+            self._energy_speech = False
+            return [{"value": [[-1, now]]}]
+        return [{"value": []}]
+
+    def _is_voiced(self, audio):
+        # 识别前先看能量，太小的直接丢弃
+        return len(audio) and np.sqrt(np.mean(audio ** 2)) > self.noise_threshold
+
+    def _emit_speculative(self, segments, cut):
+        audio = self.buffer[:cut]
+        if self._is_voiced(audio):
+            self._spec_end = self.buffer_start + cut
+            segments.append(Segment(audio, self.buffer_start, self._spec_end, final=False,
+                                    spec_key=(self.buffer_start, self._spec_end), trace_id=self.trace_id))
+            tracing.instant(self.trace_id, "speculative_cut")
+
+    def _emit(self, segments, cut, forced):
+        audio = self.buffer[:cut]
+        trace_id, self.trace_id = self.trace_id, None
+        tracing.instant(trace_id, "force_cut" if forced else "endpoint",
+                        audio_s=round(cut / self.sample_rate, 2), silence_hops=self.silence_counter)
+        if self._is_voiced(audio):
+            spec_key = None
+            if not forced and self._spec_end is not None:
+                spec_key = (self.buffer_start, self._spec_end)
+            segments.append(Segment(audio, self.buffer_start, self.buffer_start + cut, forced,
+                                    spec_key=spec_key, trace_id=trace_id))
+        else:
+            tracing.end(trace_id, outcome="noise")
+
+        if forced and cut > self.overlap_samples:
+            # 重叠回填：保留最后 1 秒作为下一段的开头
+            keep_from = cut - self.overlap_samples
+        else:
+            keep_from = cut
+        self.buffer = self.buffer[keep_from:]
+        self.buffer_start += keep_from
+        # 音频流被切断了，旧的 VAD 状态不再匹配
+        self._reset_vad()
+        # 只有自然断句才统计 "断句后多久又开口"
+        self._hops_since_cut = None if forced else 0
@@ -0,0 +1,86 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class SpeculativeDecoder:
+    """
+    投机识别：VAD 刚出现静音就在后台开始识别，等断句确认 (vad_pause_delay) 时结果往往已经出来了，
+    识别时间和断句等待时间重叠，而不是串行相加。
+
+    key = (这句话的起点, 投机段终点)，按句子 (key[0]) 管理：最终识别在识别线程里排队，
+    它还没轮到时下一句的投机识别可能已经开始了，两句的投机识别互不影响。
+
+    - start(key, audio): 提交投机识别，同一句之前的投机识别作废 (说话又继续了)；
+      同时在跑的投机识别数达到 max_inflight 就不再提交
+    - commit(key): 断句确认，拿对应的结果 (还没跑完就等它跑完)，这句和更早的句子剩下的投机识别作废；
+      没有对应的投机识别、识别出错或结果为空都返回 None，调用方照常做一次完整识别
+    - discard(upto): 起点不晚于 upto 的句子的投机识别作废 (这句话最终识别不用投机结果)；不给 upto 就全部作废
+    - 作废的: 还没开始的取消；已经提交的标记为作废，
+      transcribe_fn(audio, is_stale) 拿到推理位置时检查 is_stale()，作废了就不推理 (模型正在 generate 的那次只能让它跑完)
+    """
+
+    def __init__(self, transcribe_fn, max_inflight=1, thread_init=None):
+        self.transcribe_fn = transcribe_fn
+        self.max_inflight = max(1, int(max_inflight))
+        # thread_init: 投机识别线程启动时调用 (第一次识别之前绑核)
+        self.executor = ThreadPoolExecutor(max_workers=self.max_inflight,
+                                           thread_name_prefix="asr-speculative",
+                                           initializer=thread_init)
+        self._futures = {}          # key -> (Future, 作废标记) (只保留当前有效的，可能跨几句话)
+        self._inflight = set()      # 还没跑完的 Future (包括已经作废的)
+        # 可重入: 在锁里 cancel() 还没开始的 Future 会当场调用 _on_done
+        self._lock = threading.RLock()
+        self.stats = {"started": 0, "committed": 0, "missed": 0, "discarded": 0, "skipped": 0}
+
+    def _on_done(self, future):
+        with self._lock:
+            self._inflight.discard(future)
+
+    def start(self, key, audio):
+        with self._lock:
+            # 同一句话又出现新的投机段，说明之前的作废了 (说话继续了)
+            self._discard_locked(lambda k: k[0] == key[0])
+            if len(self._inflight) >= self.max_inflight:
+                self.stats["skipped"] += 1
+                return False
+            stale = threading.Event()
+            future = self.executor.submit(self.transcribe_fn, audio, stale.is_set)
+            self._inflight.add(future)
+            self._futures[key] = (future, stale)
+            self.stats["started"] += 1
+        future.add_done_callback(self._on_done)
+        return True
+
+    def commit(self, key):
+        with self._lock:
+            entry = self._futures.pop(key, None)
+            self._discard_locked(lambda k: k[0] <= key[0])
+        if entry is None:
+            return None
+        future, stale = entry
+        try:
+            text = future.result()
+        except Exception as e:
+            print(f"投机识别错误: {e}")
+            text = None
+        if not text or stale.is_set():
+            # 出错 / 被作废跳过 / 空结果: 不能当成这句话的最终结果
+            self.stats["missed"] += 1
+            return None
+        self.stats["committed"] += 1
+        return text
+
+    def discard(self, upto=None):
+        with self._lock:
+            self._discard_locked(None if upto is None else (lambda k: k[0] <= upto))
+
+    def _discard_locked(self, match=None):
+        for key in [k for k in self._futures if match is None or match(k)]:
+            future, stale = self._futures.pop(key)
+            stale.set()
+            future.cancel()
+            self.stats["discarded"] += 1
+
+    def shutdown(self):
+        self.discard()
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,371 @@
+"""
+CPU 线程数 / 亲和性调优。
+
+- apply_torch_threads: 进程级 PyTorch intra-op / inter-op 线程数 (必须在第一次推理前调用)
+- StageTuner: 进入 采集 / VAD / 识别 各阶段时按配置切换当前线程的 CPU 亲和性 (VAD 和识别不并发时还切换 intra-op 线程数)
+  真正做识别计算的是 PyTorch 的 intra-op (OpenMP) 线程，不是调用 generate 的那个 Python 线程。
+  OpenMP 线程池按调用线程各建一份、在它第一次推理时创建，Linux 上新线程继承创建者的亲和性，
+  所以识别线程 / 投机识别线程一启动 (第一次推理之前) 就绑到 affinity_asr，它们的线程池也就在这些核心上。
+  Windows 上新线程不继承线程亲和性，affinity_* 只对这些 Python 线程本身生效。
+  engine_process 子进程里 VAD 和识别在同一个线程里轮流跑，整个线程绑到 affinity_vad ∪ affinity_asr (pin_engine_process)。
+- 命令行自动调优:
+    python src/thread_tuning.py --clip 录音.wav
+  用一段录音扫一遍组合 (VAD 和识别像实时听写一样在两个线程里同时跑)，把本机最快的配置写回 config.yaml
+"""
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import threading
+import subprocess
+
+STAGES = ("capture", "vad", "asr")
+
+_torch_threads_applied = False
+
+
+def apply_torch_threads(config):
+    """按配置设置 PyTorch 线程数，只有第一次调用生效 (inter-op 线程池创建后就不能再改)"""
+    global _torch_threads_applied
+    if _torch_threads_applied:
+        return
+    _torch_threads_applied = True
+    intra = int(config.get("torch_intra_threads", 0) or 0)
+    inter = int(config.get("torch_inter_threads", 0) or 0)
+    if intra <= 0 and inter <= 0:
+        return
+    import torch
+    if intra > 0:
+        torch.set_num_threads(intra)
+    if inter > 0:
+        try:
+            torch.set_num_interop_threads(inter)
+        except RuntimeError as e:
+            print(f"⚠️ inter-op 线程数设置失败 (线程池已启动): {e}")
+    print(f"🧵 PyTorch 线程: intra={torch.get_num_threads()} inter={torch.get_num_interop_threads()}")
+
+
+def set_thread_affinity(cores):
+    """把 *当前线程* 绑定到指定 CPU 核心，返回是否成功 (Linux 上之后由它创建的线程也继承这个设置)"""
+    cores = [int(c) for c in cores]
+    if not cores:
+        return False
+    try:
+        if sys.platform == "win32":
+            import ctypes
+            kernel32 = ctypes.windll.kernel32
+            kernel32.GetCurrentThread.restype = ctypes.c_void_p
+            kernel32.SetThreadAffinityMask.restype = ctypes.c_size_t
+            kernel32.SetThreadAffinityMask.argtypes = [ctypes.c_void_p, ctypes.c_size_t]
+            mask = 0
+            for c in cores:
+                mask |= 1 << c
+            return kernel32.SetThreadAffinityMask(kernel32.GetCurrentThread(), mask) != 0
+        if hasattr(os, "sched_setaffinity"):
+            # Linux 上传线程 id 就是设置单个线程
+            os.sched_setaffinity(threading.get_native_id(), cores)
+            return True
+    except Exception as e:
+        print(f"⚠️ 设置 CPU 亲和性失败 {cores}: {e}")
+    return False
+
+
+def run_pinned(cores, fn, *args):
+    """在一个新线程里先绑核再执行 fn，返回 fn 的结果 (fn 里第一次推理创建的线程池继承这个绑核)"""
+    result = {}
+
+    def target():
+        if cores:
+            set_thread_affinity(cores)
+        try:
+            result["value"] = fn(*args)
+        except Exception as e:
+            result["error"] = e
+
+    thread = threading.Thread(target=target, name="tune-pinned")
+    thread.start()
+    thread.join()
+    if "error" in result:
+        raise result["error"]
+    return result["value"]
+
+
+def pin_engine_process(config):
+    """
+    engine_process 子进程里 VAD 和识别在同一个线程里轮流跑、共用一份 OpenMP 线程池，
+    没法按阶段分核：在第一次推理之前把这个线程绑到两个阶段核心的并集 (任一阶段不限制就不绑)
+    """
+    vad = config.get("affinity_vad") or []
+    asr = config.get("affinity_asr") or []
+    if not vad or not asr:
+        return False
+    cores = sorted({int(c) for c in vad} | {int(c) for c in asr})
+    if set_thread_affinity(cores):
+        print(f"🧵 推理进程绑定 CPU 核心: {cores}")
+        return True
+    return False
+
+
+class StageTuner:
+    """
+    Worker 线程做 采集 -> VAD，识别线程 (backpressure.DecodeQueue) 做识别，进入每个阶段时调用 enter(stage)；
+    识别线程 / 投机识别线程在线程启动时 (第一次推理之前) 就 enter("asr")，见模块说明。
+    核心绑定按线程记录；只有和当前设置不同才会真正调用系统接口，未配置时 enter 是空操作。
+
+    配置项:
+        affinity_capture / affinity_vad / affinity_asr: 核心编号列表，空 = 不限制
+        vad_intra_threads: VAD 阶段的 intra-op 线程数 (0 = 沿用 torch_intra_threads)
+        torch_intra_threads: 识别阶段的 intra-op 线程数
+
+    torch.set_num_threads 是进程级的：concurrent=True (识别线程和 VAD 同时在跑) 时不按阶段切换，
+    否则 Worker 进入 VAD 会在识别进行到一半时改掉它的线程数。这时线程数只由 apply_torch_threads 设置一次。
+    """
+
+    def __init__(self, config, concurrent=False):
+        all_cores = list(range(os.cpu_count() or 1))
+        self.affinity = {}
+        for stage in STAGES:
+            cores = config.get(f"affinity_{stage}") or []
+            self.affinity[stage] = tuple(sorted(int(c) for c in cores)) or tuple(all_cores)
+        self.intra = {
+            "vad": int(config.get("vad_intra_threads", 0) or 0),
+            "asr": int(config.get("torch_intra_threads", 0) or 0),
+        }
+        self.pin_enabled = any(config.get(f"affinity_{stage}") for stage in STAGES)
+        self.threads_enabled = (not concurrent and self.intra["vad"] > 0
+                                and self.intra["vad"] != self.intra["asr"])
+        if concurrent and self.intra["vad"] > 0 and self.intra["vad"] != self.intra["asr"]:
+            print("⚠️ VAD 和识别在不同线程并发，vad_intra_threads 不生效 (统一用 torch_intra_threads)")
+        self._all_cores = tuple(all_cores)
+        self._current_affinity = {}
+        self._current_threads = None
+        self._default_threads = None
+
+    def enter(self, stage):
+        if self.pin_enabled:
+            tid = threading.get_ident()
+            cores = self.affinity[stage]
+            if self._current_affinity.get(tid) != cores:
+                set_thread_affinity(cores)
+                self._current_affinity[tid] = cores
+        if self.threads_enabled and stage in self.intra:
+            import torch
+            if self._default_threads is None:
+                self._default_threads = torch.get_num_threads()
+            n = self.intra[stage] or self._default_threads
+            if n != self._current_threads:
+                torch.set_num_threads(n)
+                self._current_threads = n
+
+    def reset(self):
+        """恢复当前线程为不限制核心"""
+        if self.pin_enabled:
+            set_thread_affinity(self._all_cores)
+            self._current_affinity.pop(threading.get_ident(), None)
+
+
+# === 配置文件写回 (逐行替换，保留注释) ===
+def _yaml_value(value):
+    if isinstance(value, (list, tuple)):
+        return "[" + ", ".join(str(v) for v in value) + "]"
+    return str(value)
+
+
+def update_config_file(path, values, header="# === Thread Tuning (auto-tune) ==="):
+    with open(path, "r", encoding="utf-8") as f:
+        content = f.read()
+    appended = []
+    for key, value in values.items():
+        line = f"{key}: {_yaml_value(value)}"
+        pattern = re.compile(rf"^{re.escape(key)}\s*:.*$", re.M)
+        if pattern.search(content):
+            content = pattern.sub(lambda m: line, content, count=1)
+        else:
+            appended.append(line)
+    if appended:
+        if not content.endswith("\n"):
+            content += "\n"
+        content += "\n" + header + "\n" + "\n".join(appended) + "\n"
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(content)
+
+
+# === 自动调优 ===
+def _candidate_threads(n_cpu):
+    return sorted({c for c in (1, 2, 4, n_cpu // 2, n_cpu) if 1 <= c <= n_cpu})
+
+
+def _candidate_layouts(n_cpu):
+    layouts = {"none": {"affinity_capture": [], "affinity_vad": [], "affinity_asr": []}}
+    if n_cpu >= 3:
+        # 采集和 VAD 独占 0 号核心，识别用剩下的核心，避免推理把采集回调挤掉
+        layouts["split"] = {
+            "affinity_capture": [0],
+            "affinity_vad": [0],
+            "affinity_asr": list(range(1, n_cpu)),
+        }
+    return layouts
+
+
+def _measure(clip, inter, repeat):
+    """
+    子进程内执行: inter-op 线程数只能设置一次，所以每个 inter 值单独开一个进程。
+    和实时听写一样，VAD 和识别各在一个绑好核的线程里同时跑 (intra-op 线程数是进程级的，两边共用)：
+    VAD 线程循环喂录音直到识别线程跑完，两边的 RTF 都是在对方同时占用 CPU 的情况下测的。
+    """
+    n_cpu = os.cpu_count() or 1
+    intra_list = _candidate_threads(n_cpu)
+    apply_torch_threads({"torch_inter_threads": inter, "torch_intra_threads": intra_list[-1]})
+
+    import torch
+    import asr_core
+    from audio_io import read_wav_16k
+    from resampler import MODEL_SAMPLE_RATE
+
+    model_vad = asr_core.load_vad_model()
+    if model_vad is None:
+        raise RuntimeError("VAD 模型加载失败")
+    audio = read_wav_16k(clip)
+    duration = len(audio) / MODEL_SAMPLE_RATE
+    hop = int(MODEL_SAMPLE_RATE * 0.256)
+    seg = int(MODEL_SAMPLE_RATE * 6)
+    if len(audio) < seg:
+        raise RuntimeError(f"录音太短 ({duration:.1f}s)，至少要 6 秒")
+
+    # 预热一次，排除首次推理的初始化开销
+    asr_core.transcribe_raw(audio[:seg])
+
+    def run_vad(started, asr_done):
+        """返回 (耗时, 处理的音频秒数)"""
+        cache = {}
+        model_vad.generate(input=audio[:hop], cache={}, is_final=False, chunk_size=256)
+        started.wait()
+        start = time.perf_counter()
+        processed = 0
+        while processed == 0 or not asr_done.is_set():
+            for i in range(0, len(audio) - hop + 1, hop):
+                model_vad.generate(input=audio[i:i + hop], cache=cache, is_final=False, chunk_size=256)
+                processed += hop
+                if asr_done.is_set():
+                    break
+        return time.perf_counter() - start, processed / MODEL_SAMPLE_RATE
+
+    def run_asr(started, asr_done):
+        asr_core.transcribe_raw(audio[:hop])
+        started.wait()
+        start = time.perf_counter()
+        try:
+            for i in range(0, len(audio), seg):
+                asr_core.transcribe_raw(audio[i:i + seg])
+        finally:
+            asr_done.set()
+        return time.perf_counter() - start
+
+    def run_concurrent(layout):
+        # 两个线程一开始 (第一次推理之前) 就绑核，预热完一起开始计时
+        started = threading.Barrier(2)
+        asr_done = threading.Event()
+        result = {}
+
+        def job(name, fn):
+            try:
+                result[name] = fn(started, asr_done)
+            except Exception as e:
+                # 另一边别一直等在 barrier / VAD 循环里
+                result.setdefault("error", e)
+                started.abort()
+                asr_done.set()
+
+        def vad_job():
+            job("vad", run_vad)
+
+        def asr_job():
+            job("asr", run_asr)
+
+        threads = [threading.Thread(target=run_pinned, args=(layout["affinity_vad"], vad_job), name="tune-vad"),
+                   threading.Thread(target=run_pinned, args=(layout["affinity_asr"], asr_job), name="tune-asr")]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        if "error" in result:
+            raise result["error"]
+        vad_time, vad_audio = result["vad"]
+        return vad_time / max(vad_audio, 1e-9), result["asr"] / duration
+
+    results = []
+    for layout_name, layout in _candidate_layouts(n_cpu).items():
+        for intra in intra_list:
+            cand = dict(layout, torch_intra_threads=intra, torch_inter_threads=inter)
+            # 实时听写里 VAD 和识别并发，intra-op 线程数不按阶段切换 (见 StageTuner)
+            torch.set_num_threads(intra)
+            best_vad = best_asr = float("inf")
+            for _ in range(repeat):
+                vad_rtf, asr_rtf = run_concurrent(layout)
+                best_vad = min(best_vad, vad_rtf)
+                best_asr = min(best_asr, asr_rtf)
+            cand["layout"] = layout_name
+            cand["vad_rtf"] = best_vad
+            cand["asr_rtf"] = best_asr
+            # 两个阶段同时跑，慢的那个决定能不能跟上实时
+            cand["rtf"] = max(best_vad, best_asr)
+            print(f"   {layout_name:5s} intra={intra} inter={inter} "
+                  f"-> RTF {cand['rtf']:.4f} (VAD {cand['vad_rtf']:.4f}, ASR {cand['asr_rtf']:.4f})",
+                  file=sys.stderr)
+            results.append(cand)
+    print("RESULT " + json.dumps(results))
+
+
+def autotune(clip, config_path, repeat=2, dry_run=False):
+    results = []
+    for inter in (1, 2):
+        print(f"🔧 测量 inter-op 线程数 = {inter} ...")
+        proc = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--measure", "--clip", clip,
+             "--inter", str(inter), "--repeat", str(repeat)],
+            stdout=subprocess.PIPE, text=True, encoding="utf-8",
+        )
+        lines = [l for l in proc.stdout.splitlines() if l.startswith("RESULT ")]
+        if proc.returncode != 0 or not lines:
+            print(f"❌ 测量失败 (inter={inter}, 退出码 {proc.returncode})")
+            continue
+        results.extend(json.loads(lines[-1][len("RESULT "):]))
+
+    if not results:
+        print("❌ 没有可用的测量结果")
+        return None
+
+    best = min(results, key=lambda r: r["rtf"])
+    print(f"🏆 最佳组合: layout={best['layout']} intra={best['torch_intra_threads']} "
+          f"inter={best['torch_inter_threads']} RTF={best['rtf']:.4f}")
+    # vad_intra_threads 不写：VAD 和识别并发时它不生效 (StageTuner concurrent)
+    values = {k: best[k] for k in ("torch_intra_threads", "torch_inter_threads",
+                                   "affinity_capture", "affinity_vad", "affinity_asr")}
+    if dry_run:
+        print(json.dumps(values, ensure_ascii=False))
+    else:
+        update_config_file(config_path, values)
+        print(f"✅ 已写入 {config_path}")
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CPU 线程数 / 亲和性自动调优")
+    parser.add_argument("--clip", required=True, help="用于测量的录音 (WAV)")
+    parser.add_argument("--config", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "config.yaml"))
+    parser.add_argument("--repeat", type=int, default=2, help="每个组合重复次数 (取最快)")
+    parser.add_argument("--dry-run", action="store_true", help="只打印结果，不写配置")
+    parser.add_argument("--measure", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--inter", type=int, default=1, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        _measure(args.clip, args.inter, args.repeat)
+    else:
+        autotune(args.clip, args.config, args.repeat, args.dry_run)
+
+
+if __name__ == "__main__":
+    main()
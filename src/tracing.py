@@ -0,0 +1,255 @@
+"""
+逐句追踪: 每句话一个 trace_id，从第一帧录音到上屏记录各阶段的时间段，导出成 Chrome trace-event JSON
+(chrome://tracing 或 https://ui.perfetto.dev 打开)，用来查 "这一句为什么 3 秒才出来"。
+
+- 按 trace_sample_rate 抽样，没被抽中的句子 begin() 返回 None，之后所有调用直接返回，几乎没有开销
+- 阶段: 切分器 (VAD 判定 / 断句 / 强制切分) -> Worker (识别) -> asr_core (推理 / 后处理)
+  -> 界面 (on_new_recognition / 自动上屏等待 / 输入到当前窗口)
+- 同一线程里用 activate(trace_id) 设置当前句子，asr_core 这类不认识 trace_id 的代码直接 span("名字")
+- 跨线程 (Worker -> 界面) 用 audio_id 关联: bind(audio_id, trace_id) / lookup(audio_id)
+- 每句话在 trace 里是一条单独的异步轨道 (开头到结束)，各阶段按所在线程显示
+- engine_process 模式下 VAD / 识别在子进程里，这些阶段不记录
+- 一直没结束的句子 (说到一半停止 / 重启识别服务，手动上屏模式一直没发送) 最多留 trace_max_utterances 句，
+  超出时最老的一句按 outcome=abandoned 结束，移到已完成列表
+
+    python src/tracing.py log/trace_xxx.json      # 打印每句话的阶段耗时
+"""
+import os
+import sys
+import json
+import time
+import random
+import itertools
+import threading
+from collections import deque, OrderedDict
+
+_lock = threading.Lock()
+_local = threading.local()
+_ids = itertools.count(1)
+_sample_rate = 0.0
+_max_traces = 200
+_active = OrderedDict()     # trace_id -> [事件]，按开始顺序
+_finished = deque(maxlen=_max_traces)
+_aliases = OrderedDict()    # audio_id -> trace_id
+_threads = {}               # tid -> 线程名
+_pid = os.getpid()
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL = _NullSpan()
+
+
+def configure(config):
+    """trace_sample_rate: 0 关闭 / 0.1 抽 10% 的句子 / 1 全部；trace_max_utterances: 内存里保留多少句"""
+    global _sample_rate, _max_traces, _finished
+    with _lock:
+        _sample_rate = float(config.get("trace_sample_rate", 0.0) or 0.0)
+        _max_traces = int(config.get("trace_max_utterances", 200))
+        _finished = deque(_finished, maxlen=_max_traces)
+
+
+def enabled():
+    return _sample_rate > 0
+
+
+def _us(t):
+    return round(t * 1e6, 1)
+
+
+def _record(trace_id, event):
+    tid = threading.get_ident()
+    event["pid"] = _pid
+    event["tid"] = tid
+    with _lock:
+        events = _active.get(trace_id)
+        if events is None:
+            return
+        events.append(event)
+        if tid not in _threads:
+            _threads[tid] = threading.current_thread().name
+
+
+# === 句子 ===
+def begin(start=None, **args):
+    """开始一句 (按抽样率)，返回 trace_id 或 None。start: 这句第一帧录音的 perf_counter 时间 (估算)"""
+    if _sample_rate <= 0 or (_sample_rate < 1 and random.random() >= _sample_rate):
+        return None
+    trace_id = next(_ids)
+    start = time.perf_counter() if start is None else start
+    with _lock:
+        while _active and len(_active) >= _max_traces:
+            old_id, old_events = _active.popitem(last=False)
+            old_events.append(_end_event(old_id, "abandoned", {}))
+            _finished.append(old_events)
+        _active[trace_id] = []
+    _record(trace_id, {"name": f"utterance {trace_id}", "cat": "utterance", "ph": "b", "id": trace_id,
+                       "ts": _us(start), "args": dict(args, trace_id=trace_id)})
+    return trace_id
+
+
+def end(trace_id, outcome="inserted", **args):
+    """结束一句 (outcome: inserted / noise / duplicate / reset ...)，移到已完成列表"""
+    if trace_id is None:
+        return
+    _record(trace_id, _end_event(trace_id, outcome, args))
+    with _lock:
+        events = _active.pop(trace_id, None)
+        if events is not None:
+            _finished.append(events)
+
+
+def _end_event(trace_id, outcome, args):
+    return {"name": f"utterance {trace_id}", "cat": "utterance", "ph": "e", "id": trace_id,
+            "ts": _us(time.perf_counter()), "args": dict(args, outcome=outcome),
+            "pid": _pid, "tid": threading.get_ident()}
+
+
+def add_span(trace_id, name, start, end_time=None, **args):
+    """记录一段已经结束的阶段 (start / end_time 是 perf_counter 时间)"""
+    if trace_id is None:
+        return
+    end_time = time.perf_counter() if end_time is None else end_time
+    _record(trace_id, {"name": name, "cat": "stage", "ph": "X", "ts": _us(start),
+                       "dur": _us(max(0.0, end_time - start)), "args": dict(args, trace_id=trace_id)})
+
+
+def instant(trace_id, name, **args):
+    if trace_id is None:
+        return
+    _record(trace_id, {"name": name, "cat": "event", "ph": "i", "s": "t", "ts": _us(time.perf_counter()),
+                       "args": dict(args, trace_id=trace_id)})
+
+
+class _Span:
+    def __init__(self, trace_id, name, args):
+        self.trace_id = trace_id
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.args["error"] = repr(exc)
+        add_span(self.trace_id, self.name, self.start, **self.args)
+        return False
+
+
+def span(name, trace_id=None, **args):
+    """with span("asr"): ...  不给 trace_id 就用当前线程 activate 的句子"""
+    if trace_id is None:
+        trace_id = getattr(_local, "trace_id", None)
+        if trace_id is None:
+            return _NULL
+    return _Span(trace_id, name, args)
+
+
+class _Activate:
+    def __init__(self, trace_id):
+        self.trace_id = trace_id
+
+    def __enter__(self):
+        self.previous = getattr(_local, "trace_id", None)
+        _local.trace_id = self.trace_id
+        return self
+
+    def __exit__(self, *exc):
+        _local.trace_id = self.previous
+        return False
+
+
+def activate(trace_id):
+    """在这个 with 块里把 trace_id 设为当前线程的当前句子"""
+    if trace_id is None and getattr(_local, "trace_id", None) is None:
+        return _NULL
+    return _Activate(trace_id)
+
+
+def current():
+    return getattr(_local, "trace_id", None)
+
+
+# === 跨线程关联 ===
+def bind(audio_id, trace_id):
+    if trace_id is None:
+        return
+    with _lock:
+        _aliases[audio_id] = trace_id
+        while len(_aliases) > 1000:
+            _aliases.popitem(last=False)
+
+
+def lookup(audio_id):
+    if not _aliases:
+        return None
+    with _lock:
+        return _aliases.pop(audio_id, None)
+
+
+# === 导出 ===
+def export(path, include_active=True):
+    """写 Chrome trace-event JSON，返回导出的句子数"""
+    with _lock:
+        traces = [list(events) for events in _finished]
+        if include_active:
+            traces += [list(events) for events in _active.values()]
+        threads = dict(_threads)
+    events = [{"name": "thread_name", "ph": "M", "pid": _pid, "tid": tid, "args": {"name": name}}
+              for tid, name in threads.items()]
+    events.append({"name": "process_name", "ph": "M", "pid": _pid, "tid": 0, "args": {"name": "ASRInput"}})
+    for trace in traces:
+        events.extend(trace)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f, ensure_ascii=False)
+    return len(traces)
+
+
+def count():
+    with _lock:
+        return len(_finished) + len(_active)
+
+
+def summarize(path):
+    """读导出的 JSON，返回 [(trace_id, 总耗时ms, outcome, {阶段: 耗时ms})]"""
+    with open(path, "r", encoding="utf-8") as f:
+        events = json.load(f)["traceEvents"]
+    bounds, stages = {}, {}
+    for e in events:
+        trace_id = e.get("id") if e.get("cat") == "utterance" else e.get("args", {}).get("trace_id")
+        if trace_id is None:
+            continue
+        if e["ph"] in ("b", "e"):
+            bounds.setdefault(trace_id, {})[e["ph"]] = e
+        elif e["ph"] == "X":
+            per = stages.setdefault(trace_id, {})
+            per[e["name"]] = per.get(e["name"], 0.0) + e["dur"] / 1000.0
+    rows = []
+    for trace_id, b in sorted(bounds.items()):
+        if "b" not in b or "e" not in b:
+            continue
+        rows.append((trace_id, (b["e"]["ts"] - b["b"]["ts"]) / 1000.0, b["e"]["args"].get("outcome"),
+                     stages.get(trace_id, {})))
+    return rows
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("用法: python src/tracing.py trace.json")
+        sys.exit(1)
+    for trace_id, total, outcome, per in summarize(sys.argv[1]):
+        parts = " | ".join(f"{name} {ms:.0f}ms" for name, ms in sorted(per.items(), key=lambda kv: -kv[1]))
+        print(f"#{trace_id:<5} {total:7.0f} ms  {outcome:<9}  {parts}")
+
+
+if __name__ == "__main__":
+    main()
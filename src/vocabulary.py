@@ -0,0 +1,192 @@
+import os
+import time
+import threading
+
+
+def _is_word_char(ch):
+    # 只对 ASCII 字母数字做词边界判断，中文没有空格分词，不需要边界
+    return ch.isascii() and (ch.isalnum() or ch == "_")
+
+
+class AhoCorasick:
+    """
+    多模式替换自动机。
+
+    构建: O(所有词条总长度)，每个结果只扫一遍:
+    - 扫描时通过输出链接收集命中，按起点记录最长匹配
+    - 再从左往右走一遍，遇到匹配就整段替换并跳过 (最左最长、不重叠)
+    单次替换的耗时只和文本长度、命中数有关，和词典大小无关。
+    """
+
+    def __init__(self, mapping):
+        # 状态 0 是根
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [None]       # 该状态本身对应的词条 (模式长度, 替换文本, 是否需要词边界)
+        self._dict_link = [0]    # 沿 fail 链最近的一个有输出的状态
+        for pattern, replacement in mapping.items():
+            if pattern:
+                self._add(pattern, replacement)
+        self._build()
+        self.size = len(mapping)
+
+    def _add(self, pattern, replacement):
+        node = 0
+        for ch in pattern:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(None)
+                self._dict_link.append(0)
+            node = nxt
+        bounded = (_is_word_char(pattern[0]), _is_word_char(pattern[-1]))
+        self._out[node] = (len(pattern), replacement, bounded)
+
+    def _build(self):
+        # BFS 计算 fail 指针和输出链接
+        queue = list(self._goto[0].values())
+        head = 0
+        while head < len(queue):
+            node = queue[head]
+            head += 1
+            for ch, child in self._goto[node].items():
+                queue.append(child)
+                f = self._fail[node]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                fc = self._goto[f].get(ch, 0)
+                self._fail[child] = fc if fc != child else 0
+                fail = self._fail[child]
+                self._dict_link[child] = fail if self._out[fail] is not None else self._dict_link[fail]
+
+    def replace(self, text):
+        if not text or not self.size:
+            return text
+        goto, fail, out, dict_link = self._goto, self._fail, self._out, self._dict_link
+        n = len(text)
+        best = {}  # 起点 -> (长度, 替换文本)
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            hit = node if out[node] is not None else dict_link[node]
+            while hit:
+                length, replacement, (bound_l, bound_r) = out[hit]
+                start = i - length + 1
+                if ((not bound_l or start == 0 or not _is_word_char(text[start - 1])) and
+                        (not bound_r or i + 1 == n or not _is_word_char(text[i + 1]))):
+                    prev = best.get(start)
+                    if prev is None or prev[0] < length:
+                        best[start] = (length, replacement)
+                hit = dict_link[hit]
+
+        if not best:
+            return text
+        parts = []
+        i = 0
+        last = 0
+        for start in sorted(best):
+            if start < i:
+                continue
+            length, replacement = best[start]
+            parts.append(text[last:start])
+            parts.append(replacement)
+            i = last = start + length
+        parts.append(text[last:])
+        return "".join(parts)
+
+
+def load_vocabulary_file(path):
+    """
+    读取用户纠错词典，每行一条:
+        错词 => 正确词
+        错词<TAB>正确词
+    空行和 # 开头的行忽略。
+    """
+    mapping = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.rstrip("\r\n")
+            if not line.strip() or line.lstrip().startswith("#"):
+                continue
+            if "=>" in line:
+                src, dst = line.split("=>", 1)
+            elif "\t" in line:
+                src, dst = line.split("\t", 1)
+            else:
+                continue
+            src = src.strip()
+            if src:
+                mapping[src] = dst.strip()
+    return mapping
+
+
+class VocabularyCorrector:
+    """
+    用户词典纠错：词典文件修改后自动热加载 (最多每 check_interval 秒检查一次 mtime)。
+    识别结果路径上只做 mtime 检查；重新编译在后台线程里做 (5 万条约 0.5 秒)，
+    编译好之后整体替换自动机引用，期间继续用旧词典，读者不会看到半成品。
+    """
+
+    def __init__(self, path, check_interval=2.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._automaton = AhoCorasick({})
+        self._mtime = None
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+        self._rebuilding = False
+        self._reload()
+
+    def _reload(self):
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            if self._mtime is not None:
+                print(f"⚠️ 词典文件不存在: {self.path}")
+                self._automaton = AhoCorasick({})
+                self._mtime = None
+            return
+        if mtime == self._mtime:
+            return
+        try:
+            start = time.perf_counter()
+            automaton = AhoCorasick(load_vocabulary_file(self.path))
+            self._automaton = automaton
+            self._mtime = mtime
+            cost_ms = (time.perf_counter() - start) * 1000
+            print(f"📖 已加载用户词典: {automaton.size} 条 ({cost_ms:.0f} ms)")
+        except Exception as e:
+            print(f"❌ 用户词典加载失败: {e}")
+
+    def maybe_reload(self):
+        now = time.monotonic()
+        if now - self._last_check < self.check_interval:
+            return
+        with self._lock:
+            if now - self._last_check < self.check_interval or self._rebuilding:
+                return
+            self._last_check = now
+            try:
+                mtime = os.path.getmtime(self.path)
+            except OSError:
+                mtime = None
+            if mtime == self._mtime:
+                return
+            self._rebuilding = True
+        threading.Thread(target=self._reload_in_background, name="vocabulary-reload", daemon=True).start()
+
+    def _reload_in_background(self):
+        try:
+            self._reload()
+        finally:
+            with self._lock:
+                self._rebuilding = False
+
+    def apply(self, text):
+        self.maybe_reload()
+        return self._automaton.replace(text)
@@ -1,14 +1,20 @@
 import os
 import time
 import re
+import threading
 from PyQt6.QtWidgets import (
     QMainWindow, QWidget, QHBoxLayout, QLineEdit, QPushButton,
-    QApplication, QSystemTrayIcon, QMenu, QSizePolicy
+    QApplication, QSystemTrayIcon, QMenu, QSizePolicy,
+    QDialog, QVBoxLayout, QListWidget, QListWidgetItem, QLabel, QFileDialog
 )
-from PyQt6.QtCore import Qt, QTimer, QSize, QEvent
+from PyQt6.QtCore import Qt, QTimer, QSize, QEvent, pyqtSignal
 from PyQt6.QtGui import QMouseEvent, QGuiApplication, QIcon, QAction, QFocusEvent, QPixmap, QColor, QActionGroup
 import keyboard
-from asr_core import emo_set
+from asr_core import emo_set, resolve_user_path
+from history import HistoryStore, format_row
+from flight_recorder import FlightRecorder
+from profiler import SamplingProfiler
+import tracing
 
 # === 图标配置 ===
 ICON_APP = "assets/voice-chat_11401399.png"
@@ -37,7 +43,81 @@ def tint_icon_white(icon, size):
                 image.setPixelColor(x, y, QColor(255, 255, 255, color.alpha()))
     return QIcon(QPixmap.fromImage(image))
 
+class HistorySearchDialog(QDialog):
+    """搜索识别历史，双击 / 回车把选中的那条重新输入到当前窗口"""
+    def __init__(self, store, parent=None):
+        super().__init__(parent)
+        self.store = store
+        self.setWindowTitle("搜索历史")
+        self.setWindowFlags(self.windowFlags() | Qt.WindowType.WindowStaysOnTopHint)
+        self.resize(560, 420)
+
+        layout = QVBoxLayout(self)
+        self.search_edit = QLineEdit()
+        self.search_edit.setPlaceholderText("输入关键词，空格分隔多个词...")
+        self.search_edit.textChanged.connect(lambda _: self.search_timer.start(150))
+        self.search_edit.returnPressed.connect(self.insert_selected)
+        layout.addWidget(self.search_edit)
+
+        self.result_list = QListWidget()
+        self.result_list.itemActivated.connect(lambda _: self.insert_selected())
+        layout.addWidget(self.result_list, stretch=1)
+
+        bottom = QHBoxLayout()
+        self.status_label = QLabel()
+        bottom.addWidget(self.status_label, stretch=1)
+        copy_button = QPushButton("复制")
+        copy_button.clicked.connect(self.copy_selected)
+        bottom.addWidget(copy_button)
+        insert_button = QPushButton("输入")
+        insert_button.clicked.connect(self.insert_selected)
+        bottom.addWidget(insert_button)
+        layout.addLayout(bottom)
+
+        # 打字时不是每个键都查一次，停顿 150ms 再查
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.timeout.connect(self.run_search)
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.search_edit.setFocus()
+        self.search_edit.selectAll()
+        self.run_search()
+
+    def run_search(self):
+        start = time.perf_counter()
+        rows = self.store.search(self.search_edit.text(), limit=200)
+        elapsed = (time.perf_counter() - start) * 1000
+        self.result_list.clear()
+        for row in rows:
+            item = QListWidgetItem(format_row(row))
+            item.setData(Qt.ItemDataRole.UserRole, row[2])
+            self.result_list.addItem(item)
+        if rows:
+            self.result_list.setCurrentRow(0)
+        self.status_label.setText(f"{len(rows)} 条 ({elapsed:.0f} ms)")
+
+    def selected_text(self):
+        item = self.result_list.currentItem()
+        return item.data(Qt.ItemDataRole.UserRole) if item else ""
+
+    def copy_selected(self):
+        text = self.selected_text()
+        if text:
+            QGuiApplication.clipboard().setText(text)
+
+    def insert_selected(self):
+        text = self.selected_text()
+        if text:
+            # 先把对话框藏起来，焦点回到原来的窗口再输入
+            self.hide()
+            QTimer.singleShot(200, lambda: insert_text_into_active_window(text))
+
 class ModernUIWindow(QMainWindow):
+    # 信号：性能采样结束 (结果文件路径，失败为空)，采样线程里发出
+    profile_finished = pyqtSignal(str)
+
     def __init__(self, config_dict):
         super().__init__()
         self.config = config_dict
@@ -47,6 +127,21 @@ class ModernUIWindow(QMainWindow):
         self.exiting = False
         self.service_running = False  # 服务总开关状态
         self.mini_mode = False        # 极简模式状态
+        self.degraded_mode = False    # 识别跟不上，过载降级中
+        self.file_job = None          # 后台文件转写线程 (batch 优先级，给实时听写让路)
+        self.profiler = None          # 托盘 "性能采样" 正在跑的采样器
+        self.stream_factory = None    # 替换麦克风 (tests/soak_harness.py 用录音回放驱动整个窗口)
+        self.profile_finished.connect(self.on_profile_finished)
+
+        # 逐句追踪 (trace_sample_rate > 0 时)：还没上屏的句子 [(trace_id, 进入输入框的时间)]
+        tracing.configure(self.config)
+        self.pending_traces = []
+
+        # 飞行记录仪 (flight_recorder_minutes > 0)：跨 Worker 重启保留，热键 / 托盘菜单保存
+        self.flight_recorder = None
+        if self.config.get("flight_recorder_minutes", 0) > 0:
+            self.flight_recorder = FlightRecorder(self.config.get("sample_rate", 16000),
+                                                  self.config["flight_recorder_minutes"])
 
         # 默认配置兜底
         if "auto_send_delay" not in self.config:
@@ -107,11 +202,23 @@ class ModernUIWindow(QMainWindow):
         os.makedirs("log", exist_ok=True)
         self.log_file_path = f"log/recognition_{time.strftime('%Y%m%d_%H%M%S')}.log"
         self.log_file = open(self.log_file_path, "a", encoding="utf-8")
+
+        # 识别历史 (SQLite 全文索引，托盘菜单里搜索)
+        self.history = None
+        self.history_dialog = None
+        if self.config.get("history_enabled", True):
+            try:
+                self.history = HistoryStore(resolve_user_path(self.config.get("history_db_path", "log/history.db")))
+            except Exception as e:
+                print(f"⚠️ 历史记录数据库打开失败: {e}")
         
         # 热键
         try:
             keyboard.add_hotkey('ctrl+shift+h', lambda: QTimer.singleShot(0, self.toggle_window_visibility))
             keyboard.add_hotkey('esc', lambda: QTimer.singleShot(100, self.on_esc_pressed))
+            if self.flight_recorder is not None:
+                keyboard.add_hotkey(self.config.get("flight_recorder_hotkey", "ctrl+shift+f12"),
+                                    lambda: QTimer.singleShot(0, self.dump_flight_recorder))
         except:
             print("热键注册失败")
         
@@ -152,12 +259,14 @@ class ModernUIWindow(QMainWindow):
         else:
             self.toggle_button.setText("🎤")
         
+        # 降级模式下激活色换成橙色 #E8A33D，提示识别跟不上
+        active_color = "#E8A33D" if self.degraded_mode else "#A4C2E9"
         if self.mini_mode:
             # 极简模式：激活色 #A4C2E9，50x30, 边框保持
-            self.setup_round_button(self.toggle_button, 50, 30, "#A4C2E9", extra_border="border: 2px solid #556070;")
+            self.setup_round_button(self.toggle_button, 50, 30, active_color, extra_border="border: 2px solid #556070;")
         else:
             # 完整模式：激活色 #A4C2E9
-            self.setup_round_button(self.toggle_button, 30, 20, "#A4C2E9")
+            self.setup_round_button(self.toggle_button, 30, 20, active_color)
 
     def set_disabled_state(self):
         if os.path.exists(ICON_INACTIVE):
@@ -205,6 +314,31 @@ class ModernUIWindow(QMainWindow):
         self.action_ui_mode = QAction("🔄 切换模式", self)
         self.action_ui_mode.triggered.connect(self.toggle_ui_mode)
         self.tray_menu.addAction(self.action_ui_mode)
+
+        if self.flight_recorder is not None:
+            action_flight = QAction("🛩️ 保存飞行记录 (问题复现)", self)
+            action_flight.triggered.connect(self.dump_flight_recorder)
+            self.tray_menu.addAction(action_flight)
+
+        if tracing.enabled():
+            action_trace = QAction("📈 导出逐句追踪", self)
+            action_trace.triggered.connect(self.export_trace)
+            self.tray_menu.addAction(action_trace)
+
+        if not self.config.get("engine_process", False):
+            # 独立推理进程模式下模型不在本进程，调度器管不到，不提供后台转写
+            action_file = QAction("🎞 后台转写音频文件...", self)
+            action_file.triggered.connect(self.transcribe_file_in_background)
+            self.tray_menu.addAction(action_file)
+            # 识别错了就把上一句的录音存下来 (有归档写归档，否则存 WAV)；推理进程模式下录音不回传，没有这一项
+            action_feedback = QAction("💾 保存上一句录音 (反馈)", self)
+            action_feedback.triggered.connect(self.save_last_feedback)
+            self.tray_menu.addAction(action_feedback)
+
+        if self.history is not None:
+            action_history = QAction("🔍 搜索历史", self)
+            action_history.triggered.connect(self.show_history_dialog)
+            self.tray_menu.addAction(action_history)
         
         self.tray_menu.addSeparator()
 
@@ -300,6 +434,19 @@ class ModernUIWindow(QMainWindow):
                 delay_menu.addAction(act)
                 self.action_group_delay.append(act)
 
+        # === 性能采样 (所有线程的调用栈，结果写到 log/ 的火焰图格式) ===
+        profile_menu = self.tray_menu.addMenu("🔬 性能采样")
+        if profile_menu is not None:
+            for sec in [10, 30, 60]:
+                act = QAction(f"采样 {sec} 秒", self)
+                act.triggered.connect(lambda checked, s=sec: self.start_profiling(s))
+                profile_menu.addAction(act)
+            profile_menu.addSeparator()
+            self.action_stop_profile = QAction("⏹ 立即停止并保存", self)
+            self.action_stop_profile.setEnabled(False)
+            self.action_stop_profile.triggered.connect(self.stop_profiling)
+            profile_menu.addAction(self.action_stop_profile)
+
         self.tray_menu.addSeparator()
         
         action_quit = QAction("❌ 退出程序", self)
@@ -439,21 +586,25 @@ class ModernUIWindow(QMainWindow):
         from worker_thread import ASRWorkerThread
 
         # === [修正] 从配置读取采样率和设备 ===
-        # 注意：SenseVoiceSmall 官方训练是 16000。
-        # 如果你改成 44100，录音流会变，但模型可能会识别率下降或报错，
-        # 但既然你要求生效，这里必须读配置。
+        # sample_rate 是麦克风采集率，可以填设备原生的 44100/48000 (避免驱动层重采样毛刺)。
+        # Worker 内部会流式重采样到 16000 再送给 SenseVoice / FSMN-VAD。
         cfg_sample_rate = self.config.get("sample_rate", 16000)
-        cfg_device = self.config.get("device", "cuda")
+        cfg_device = self.config.get("device", "auto")
 
         self.worker = ASRWorkerThread(
             sample_rate=cfg_sample_rate,
             chunk=self.config.get("chunk", 256),
             buffer_seconds=self.config.get("buffer_seconds", 4),
             device=cfg_device,
-            config=self.config
+            config=self.config,
+            recorder=self.flight_recorder,
+            stream_factory=self.stream_factory
         )
         self.worker.result_ready.connect(self.on_new_recognition)
         self.worker.initialized.connect(self.on_worker_initialized)
+        self.worker.overload_changed.connect(self.on_overload_changed)
+        self.worker.loading_progress.connect(self.on_loading_progress)
+        self.worker.engine_failed.connect(self.on_engine_failed)
         self.worker.start()
         self.service_running = True
         print("识别服务启动中...")
@@ -474,6 +625,30 @@ class ModernUIWindow(QMainWindow):
         self.set_active_state()
         print("识别服务已就绪")
 
+    def on_loading_progress(self, text, done):
+        # 模型在后台加载，录音已经开始缓冲：占位符和托盘提示显示进度，加载完恢复
+        self.recognition_edit.setPlaceholderText(text or "等待识别...")
+        if not self.degraded_mode:
+            self.tray_icon.setToolTip(text or "ASRInput")
+        if done and not text:
+            print("识别模型已就绪")
+
+    def on_engine_failed(self, reason):
+        # 推理进程放弃重启了：Worker 只剩采集，停掉服务让用户看得到 (托盘 "启用服务" 可以重试)
+        print(f"❌ 识别服务已停止: {reason}")
+        self.stop_worker_service()
+        self.action_toggle_service.setChecked(False)
+        self.recognition_edit.setPlaceholderText("推理进程崩溃，服务已停止")
+        self.tray_icon.showMessage("ASRInput", f"❌ {reason}，识别服务已停止。可在托盘菜单重新启用服务")
+
+    def on_overload_changed(self, degraded, reason):
+        self.degraded_mode = degraded
+        tip = f"⚠️ 识别跟不上，已降级: {reason}" if degraded else ""
+        self.toggle_button.setToolTip(tip)
+        self.tray_icon.setToolTip(tip or "ASRInput")
+        if self.worker and not self.worker.paused:
+            self.set_active_state()
+
     def toggle_recognition(self):
         if self.worker is None:
             self.start_worker_service()
@@ -509,48 +684,153 @@ class ModernUIWindow(QMainWindow):
         super().focusOutEvent(event)
 
     def on_new_recognition(self, recognized_text, audio_id):
+        trace_id = tracing.lookup(audio_id)
+        with tracing.span("on_new_recognition", trace_id):
+            self._handle_recognition(recognized_text, audio_id, trace_id)
+
+    def _handle_recognition(self, recognized_text, audio_id, trace_id):
         processed = recognized_text.strip()
         self.last_recognized_text = processed
         self.last_audio_id = audio_id
         
         self.log_file.write(f"{time.strftime('%H:%M:%S')} - {processed}\n")
         self.log_file.flush()
+        if self.history is not None:
+            self.history.add(processed, self.config.get("language", ""), audio_id)
         
         # === [关键修改] 极简模式逻辑 ===
         if self.mini_mode:
             # 极简模式：没有输入框缓冲，没有延迟，直接上屏
-            insert_text_into_active_window(processed)
+            self.insert_text_traced(processed, [(trace_id, time.perf_counter())])
         else:
             # 完整模式：原有的带缓冲区的逻辑
             if not self.recognition_edit.hasFocus():
                 current = self.recognition_edit.text()
                 new_text = current + " " + processed if current else processed
                 self.recognition_edit.setText(new_text)
+                if trace_id is not None:
+                    self.pending_traces.append((trace_id, time.perf_counter()))
                 
                 delay_sec = self.config.get("auto_send_delay", 3)
                 if delay_sec < 900:
                     self.auto_send_timer.start(delay_sec * 1000)
+                    tracing.instant(trace_id, "auto_send_scheduled", delay_s=delay_sec)
                     print(f"收到内容，{delay_sec}秒后自动上屏...")
+            else:
+                tracing.end(trace_id, outcome="edit_focused")
+
+    def take_pending_traces(self):
+        traces, self.pending_traces = self.pending_traces, []
+        return traces
+
+    def insert_text_traced(self, text, traces):
+        """上屏，并给这段文字里包含的每句话记上 等待上屏 / 输入 两个阶段"""
+        start = time.perf_counter()
+        insert_text_into_active_window(text)
+        for trace_id, queued_at in traces:
+            tracing.add_span(trace_id, "wait_for_send", queued_at, start)
+            tracing.add_span(trace_id, "insert_text", start, chars=len(text))
+            tracing.end(trace_id)
+
+    def dump_flight_recorder(self):
+        if self.flight_recorder is None:
+            return
+        out_dir = resolve_user_path(f"log/flight_{time.strftime('%Y%m%d_%H%M%S')}")
+        try:
+            self.flight_recorder.dump(out_dir, reason="user")
+            self.tray_icon.showMessage("ASRInput", f"已保存最近 {self.config['flight_recorder_minutes']} 分钟的录音和事件: {out_dir}")
+        except Exception as e:
+            print(f"❌ 飞行记录保存失败: {e}")
+
+    def start_profiling(self, seconds):
+        if self.profiler is not None and self.profiler.running:
+            self.tray_icon.showMessage("ASRInput", "性能采样已经在进行中")
+            return
+        out_path = resolve_user_path(f"log/profile_{time.strftime('%Y%m%d_%H%M%S')}.folded")
+        self.profiler = SamplingProfiler(interval_ms=self.config.get("profiler_interval_ms", 10))
+        self.profiler.start(duration=seconds, out_path=out_path, on_done=lambda path: self.profile_finished.emit(path or ""))
+        self.action_stop_profile.setEnabled(True)
+        self.tray_icon.showMessage("ASRInput", f"🔬 开始性能采样 {seconds} 秒")
+
+    def stop_profiling(self):
+        if self.profiler is not None:
+            self.profiler.stop()
+
+    def on_profile_finished(self, path):
+        self.action_stop_profile.setEnabled(False)
+        if path:
+            self.tray_icon.showMessage("ASRInput", f"性能采样完成 (开销 {self.profiler.overhead:.1%}): {path}")
+        else:
+            self.tray_icon.showMessage("ASRInput", "性能采样结果保存失败")
+
+    def save_last_feedback(self):
+        if self.worker is None or not self.last_audio_id:
+            self.tray_icon.showMessage("ASRInput", "还没有可以保存的识别结果")
+            return
+        saved = self.worker.save_feedback_audio(self.last_audio_id)
+        if saved:
+            self.tray_icon.showMessage("ASRInput", f"💾 已保存上一句录音: {saved}")
+        else:
+            self.tray_icon.showMessage("ASRInput", "❌ 上一句录音保存失败 (已经保存过或已不在缓存里)")
+
+    def export_trace(self):
+        path = resolve_user_path(f"log/trace_{time.strftime('%Y%m%d_%H%M%S')}.json")
+        n = tracing.export(path)
+        print(f"📈 已导出 {n} 句的追踪: {path} (chrome://tracing 或 ui.perfetto.dev 打开)")
 
     def auto_send(self):
         if self.recognition_edit.hasFocus(): return
         current_text = self.recognition_edit.text().strip()
+        traces = self.take_pending_traces()
         if current_text and current_text != self.last_sent_text:
-            insert_text_into_active_window(current_text)
+            self.insert_text_traced(current_text, traces)
             self.last_sent_text = current_text
             self.recognition_edit.clear()
+        else:
+            for trace_id, _ in traces:
+                tracing.end(trace_id, outcome="not_sent")
 
     def on_manual_send(self):
         self.auto_send_timer.stop()
         current_text = self.recognition_edit.text().strip()
         if current_text:
             self.hide()
-            QTimer.singleShot(100, lambda: (insert_text_into_active_window(current_text), self.show()))
+            traces = self.take_pending_traces()
+            QTimer.singleShot(100, lambda: (self.insert_text_traced(current_text, traces), self.show()))
             self.last_sent_text = current_text
             self.recognition_edit.clear()
         else:
             self.resume_recognition_state()
 
+    def transcribe_file_in_background(self):
+        if self.file_job is not None and self.file_job.is_alive():
+            self.tray_icon.showMessage("ASRInput", "已有一个后台转写任务在运行")
+            return
+        path, _ = QFileDialog.getOpenFileName(self, "选择要转写的音频", "", "音频 (*.wav *.flac *.mp3);;所有文件 (*)")
+        if not path:
+            return
+        out_path = os.path.splitext(path)[0] + ".srt"
+        config = dict(self.config)
+
+        def job():
+            from file_transcribe import transcribe_file
+            try:
+                count = transcribe_file(path, out_path, "srt", config, priority="batch", shared_vad=False)
+                print(f"✅ 后台转写完成: {count} 条字幕 -> {out_path}")
+            except Exception as e:
+                print(f"❌ 后台转写失败: {e}")
+
+        self.file_job = threading.Thread(target=job, name="file-transcribe", daemon=True)
+        self.file_job.start()
+        self.tray_icon.showMessage("ASRInput", f"后台转写中 (实时听写优先): {os.path.basename(path)}")
+
+    def show_history_dialog(self):
+        if self.history_dialog is None:
+            self.history_dialog = HistorySearchDialog(self.history)
+        self.history_dialog.show()
+        self.history_dialog.raise_()
+        self.history_dialog.activateWindow()
+
     # === 窗口行为 ===
     def toggle_window_visibility(self):
         if self.isVisible():
@@ -596,7 +876,13 @@ class ModernUIWindow(QMainWindow):
     def closeEvent(self, event):
         if self.exiting:
             if self.worker: self.worker.stop()
+            if self.profiler is not None and self.profiler.running:
+                self.profiler.stop()
             self.log_file.close()
+            if self.history is not None:
+                self.history.close()
+            if tracing.count():
+                self.export_trace()
             event.accept()
         else:
             if self.worker and not self.worker.paused:
@@ -3,15 +3,31 @@ import os
 os.environ["FUNASR_DISABLE_UPDATE"] = "1"
 
 import time as _time
+import threading
+from collections import deque, OrderedDict
 import numpy as np
 from PyQt6.QtCore import QThread, pyqtSignal
 import pyaudio
 import wave
 import logging
-from funasr import AutoModel
 
 # 导入核心识别函数
-from asr_core import asr_transcribe
+from asr_core import asr_transcribe, load_vad_model, resolve_user_path, set_vad_sensitivity
+from asr_core import scheduler as inference_scheduler
+from resampler import PolyphaseResampler, MODEL_SAMPLE_RATE
+from thread_tuning import StageTuner
+from segmenter import VADSegmenter
+from speculative import SpeculativeDecoder
+from endpointing import AdaptiveEndpointer
+from engine_process import EngineProcess
+from segment_archive import SegmentArchive
+from capture import CallbackStream
+from backpressure import DecodeQueue
+from model_loader import ModelLoader
+from noise_suppressor import NoiseSuppressor
+from flight_recorder import FlightRecorder
+import metrics
+import tracing
 
 # 屏蔽 ModelScope 的繁琐日志
 logging.getLogger("modelscope").setLevel(logging.ERROR)
@@ -21,29 +37,68 @@ class ASRWorkerThread(QThread):
     result_ready = pyqtSignal(str, str)
     # 信号：初始化完成 (通知 UI 启用按钮)
     initialized = pyqtSignal()
+    # 信号：识别跟不上进入 / 退出降级模式 (是否降级, 原因)
+    overload_changed = pyqtSignal(bool, str)
+    # 信号：后台加载模型的进度 (状态文字, 是否结束)，结束且成功时文字为空
+    loading_progress = pyqtSignal(str, bool)
+    # 信号：推理进程反复崩溃、已放弃重启 (原因)，这之后不会再有识别结果
+    engine_failed = pyqtSignal(str)
 
     def __init__(self, sample_rate=16000, chunk=2048, buffer_seconds=8,
-                 device="cuda", config=None, parent=None):
+                 device="auto", config=None, stream_factory=None, recorder=None, parent=None):
         super().__init__(parent)
+        # sample_rate 是麦克风的采集采样率 (可以是设备原生的 44100/48000)
+        # 送进 VAD/ASR 之前统一重采样到 model_rate (16k)
         self.sample_rate = sample_rate
+        self.model_rate = MODEL_SAMPLE_RATE
+        self.resampler = PolyphaseResampler(self.sample_rate, self.model_rate)
         self.chunk = chunk
         self.buffer_seconds = buffer_seconds
         self.device = device
         self.config = config if config else {}
+        tracing.configure(self.config)
         self.running = True
         self.paused = False
+        # 暂停时 Worker 线程停掉录音流并阻塞在这里，resume / stop 时唤醒
+        self._wake = threading.Event()
+        self._wake.set()
 
         # === 缓存与参数设置 ===
-        self.recognized_audio = {}
+        # audio_id -> (音频, 文本)，只留最近 max_cache_count 条，给 "保存反馈音频" 用
+        self.recognized_audio = OrderedDict()
         self.max_cache_count = self.config.get("max_cache_count", 20)
         self.cache_clear_interval = self.config.get("cache_clear_interval", 10)
         self.last_cache_clear_time = _time.time()
         
-        # VAD 参数：窗口大小 256ms
+        # VAD 参数：窗口大小 256ms (按模型采样率计算)
         self.vad_chunk_ms = 256
-        self.vad_chunk_samples = int(self.sample_rate * self.vad_chunk_ms / 1000)
+        self.vad_chunk_samples = int(self.model_rate * self.vad_chunk_ms / 1000)
         # 静音阈值 (防止幻觉)
         self.noise_threshold = self.config.get("noise_threshold", 0.002)
+        # FSMN-VAD 阈值 = 模型默认值 × vad_sensitivity_factor (托盘 "VAD灵敏度" 菜单改的就是它)
+        self.vad_factor = self.config.get("vad_sensitivity_factor", 1.0)
+        # 可选的频谱降噪 (重采样之后、VAD 之前)：稳定噪声不再触发 VAD、白跑识别
+        self.denoiser = NoiseSuppressor(self.config) if self.config.get("noise_suppression", False) else None
+
+        # === 飞行记录仪：最近几分钟的原始录音 + 决策事件 (界面传进来的跨 Worker 重启保留) ===
+        self.recorder = recorder
+        if self.recorder is None and self.config.get("flight_recorder_minutes", 0) > 0:
+            self.recorder = FlightRecorder(self.sample_rate, self.config["flight_recorder_minutes"])
+        if self.recorder is not None:
+            self.recorder.config = dict(self.config)
+            self.recorder.event("worker_start", sample_rate=self.sample_rate,
+                                language=self.config.get("language", ""))
+        self._vad_state = None
+        # 正在说一句话 (VAD 开口到切出这一段)：期间后台批量任务不开始新的推理片
+        self._in_utterance = False
+
+        # === 反馈 / 训练数据归档 (可选)：一个追加写的大文件代替成堆的小 WAV ===
+        self.archive = None
+        archive_path = resolve_user_path(self.config.get("feedback_archive_path", ""))
+        if archive_path:
+            self.archive = SegmentArchive(archive_path, sample_rate=self.model_rate)
+        # archive_all_segments: 每一段识别结果都存进归档 (线上采集训练数据)，否则只存手动反馈的
+        self.archive_all = self.archive is not None and self.config.get("archive_all_segments", False)
 
         # 创建反馈音频保存目录
         model_cache_path = self.config.get("model_cache_path")
@@ -51,214 +106,491 @@ class ASRWorkerThread(QThread):
             os.makedirs(model_cache_path, exist_ok=True)
 
         # === 初始化录音流 ===
-        self.pa = pyaudio.PyAudio()
-        self.stream = self.pa.open(format=pyaudio.paInt16,
-                                   channels=1,
-                                   rate=self.sample_rate,
-                                   input=True,
-                                   frames_per_buffer=self.chunk)
+        # stream_factory(rate, chunk, stream_callback=None) 可以替换麦克风 (回放测试 / 压力测试用)
+        self.pa = None if stream_factory is not None else pyaudio.PyAudio()
+        self.stream = None
+        # 回调模式一次取一个 VAD 窗口 (按采集率换算)，阻塞模式一次读一个 chunk
+        self.read_frames = self.chunk
+        if self.config.get("capture_mode", "callback") == "callback":
+            try:
+                self.stream = CallbackStream(lambda callback: self._open_stream(stream_factory, callback),
+                                             self.sample_rate,
+                                             capacity_seconds=self.config.get("capture_buffer_seconds", 10))
+                self.read_frames = int(self.sample_rate * self.vad_chunk_ms / 1000)
+            except Exception as e:
+                print(f"⚠️ 回调录音打开失败，改用阻塞读取: {e}")
+        if self.stream is None:
+            self.stream = self._open_stream(stream_factory)
         
+        # === 推理放到子进程 (engine_process)：VAD / 断句 / 识别都在子进程里，这里只采集和重采样 ===
+        self.engine = None
+        self._engine_failure_reported = False
+        if self.config.get("engine_process", False):
+            self.engine = EngineProcess(self.config, chunk_ms=self.vad_chunk_ms)
+
         # === 加载 VAD 模型 (支持本地路径) ===
-        local_vad_path = self.config.get("local_vad_path", "")
-        if local_vad_path and os.path.exists(local_vad_path):
-             print(f"✅ Worker 锁定本地 VAD 模型: {local_vad_path}")
-             vad_model_id = local_vad_path
-             local_files_only = True
-        else:
-             print(f"⚠️ 未找到本地 VAD 路径，尝试使用云端: speech_fsmn_vad_zh-cn-16k-common-pytorch")
-             vad_model_id = "iic/speech_fsmn_vad_zh-cn-16k-common-pytorch"
-             local_files_only = False
+        # background_model_loading: SenseVoice 和 VAD 在后台线程并行加载 (run 里开始)，
+        # 加载期间录音先攒在 loading_backlog 里，模型就绪后补识别
+        self.model_vad = None
+        self.loader = None
+        if self.engine is None:
+            if self.config.get("background_model_loading", True):
+                self.loader = ModelLoader(self.config, on_progress=self.loading_progress.emit)
+            else:
+                self.model_vad = load_vad_model(self.config)
+        self.segmenter = None
+        self.loading_backlog = deque()
+        self._backlog_samples = 0
+        self.backlog_limit = int(self.config.get("model_loading_buffer_seconds", 30) * self.model_rate)
+        self._reset_pending = False
 
-        try:
-            self.model_vad = AutoModel(
-                model=vad_model_id,
-                model_revision="v2.0.4",
-                trust_remote_code=True,
-                disable_pbar=True,
-                max_end_silence_time=1000,
-                disable_update=True,
-                device=self.device,
-                local_files_only=local_files_only
-            )
-        except Exception as e:
-            print(f"❌ VAD 模型加载失败: {e}")
-            # 这里可以做个兜底，但通常加载失败就无法运行了
-        
-        self.cache_vad = {}
+        # === 各阶段 (采集/VAD/识别) 的 CPU 亲和性与线程数 ===
+        # 识别在 DecodeQueue 的线程里和 VAD 并发 (engine_process 时两者都在子进程)，不按阶段切换 intra-op 线程数
+        self.tuner = StageTuner(self.config, concurrent=self.engine is None)
+
+        # === 自适应断句：学习说话人的停顿长度 (学到的值跨会话保存) ===
+        self.endpointer = None
+        if self.engine is None and self.config.get("adaptive_endpointing", False):
+            self.endpointer = AdaptiveEndpointer(
+                self.config, chunk_ms=self.vad_chunk_ms,
+                state_path=resolve_user_path(self.config.get("endpoint_state_path", "log/endpoint_state.json")))
+
+        # === 投机识别：第一个静音窗口就开始识别，和断句等待时间重叠 ===
+        self.speculative = None
+        if self.engine is None and self.config.get("speculative_decoding", False):
+            self.speculative = SpeculativeDecoder(
+                self._speculative_transcribe,
+                max_inflight=self.config.get("speculative_max_inflight", 1),
+                thread_init=lambda: self.tuner.enter("asr"))
+
+        # === 识别放到单独的线程，Worker 只管采集和切分；识别跟不上时按过载策略降级 ===
+        self.decode_queue = None
+        self.degraded = False
+        self.use_fast_model = False
+        # raise_vad 的目标倍数 (识别线程里设置) / 切分器上已经生效的倍数 (只在 Worker 线程里改)
+        self._vad_boost = 1.0
+        self._applied_vad_boost = 1.0
+        if self.engine is None:
+            self.decode_queue = DecodeQueue(self.transcribe_segment, self.config, on_state=self._on_overload,
+                                            on_thread_start=lambda: self.tuner.enter("asr"))
 
-    # === 软暂停：不关闭流，只丢弃数据，防止闪退 ===
+        # === 语音唤醒待机：长时间没声音就只跑能量检测，不做重采样 / VAD ===
+        self.wake_on_voice = self.config.get("wake_on_voice", False)
+        self.wake_idle_samples = int(self.config.get("wake_idle_seconds", 15) * self.sample_rate)
+        # 唤醒门限不能高于 noise_threshold：以前能识别出来的小声说话在待机时也必须能唤醒
+        wake_threshold = self.config.get("wake_energy_threshold", 0) or self.noise_threshold
+        self.wake_threshold = min(wake_threshold, self.noise_threshold)
+        # 待机时一次读 4 倍的块，循环唤醒次数降到 1/4 (回调模式本来就一个 VAD 窗口才醒一次)
+        self.standby_chunk = max(self.chunk * 4, self.read_frames)
+        preroll_chunks = int(np.ceil(self.config.get("wake_preroll_seconds", 0.5) * self.sample_rate / self.standby_chunk))
+        # 待机时保留最近一小段录音，唤醒后先喂给 VAD，开头的字不会被吃掉
+        self.preroll = deque(maxlen=max(1, preroll_chunks))
+        self.standby = False
+        self._quiet_samples = 0
+
+    def _open_stream(self, stream_factory, callback=None):
+        if stream_factory is not None:
+            if callback is None:
+                return stream_factory(self.sample_rate, self.chunk)
+            return stream_factory(self.sample_rate, self.chunk, stream_callback=callback)
+        return self.pa.open(format=pyaudio.paInt16,
+                            channels=1,
+                            rate=self.sample_rate,
+                            input=True,
+                            frames_per_buffer=self.chunk,
+                            stream_callback=callback)
+
+    # === 暂停：只设标志，录音流由 Worker 线程自己停 (不在 UI 线程里动流，防止闪退) ===
     def pause(self):
         self.paused = True
-    
+        self._wake.clear()
+        self._record("pause")
+
     def resume(self):
+        self._record("resume")
         self.paused = False
-        self.cache_vad = {} # 重置 VAD 状态
+        self._reset_pending = True # 重置 VAD 状态
+        self._wake.set()
+
+    def _park(self):
+        """暂停期间停掉录音流，阻塞等待 resume / stop，不占 CPU"""
+        metrics.set_gauge("worker_state", "paused")
+        self._set_in_utterance(False)
+        try:
+            self.stream.stop_stream()
+        except Exception:
+            pass
+        metrics.inc("worker_parks")
+        while self.paused and self.running:
+            # 推理子进程还可能在识别暂停前的最后一句话：定期取结果、检查它是否崩溃
+            self._wake.wait(0.2 if self.engine is not None else None)
+            if self.engine is not None:
+                self._poll_engine()
+            if self.paused and self.running:
+                # pause 之后 resume 之前被唤醒 (比如 resume 紧跟着又 pause)，继续等
+                self._wake.clear()
+        if not self.running:
+            return
+        started = _time.perf_counter()
+        try:
+            self.stream.start_stream()
+        except Exception as e:
+            print(f"录音流恢复失败: {e}")
+        metrics.set_gauge("resume_latency_ms", round((_time.perf_counter() - started) * 1000, 1))
 
     def run(self):
+        # QThread 不在 threading 的线程表里，起个名字方便采样分析 / 日志里认出来
+        threading.current_thread().name = "asr-worker"
         # 发送初始化完成信号
         self.initialized.emit()
 
-        # === 核心变量初始化 ===
-        # 使用单一的 numpy array 替代 list，避免复杂的拼接逻辑错误
-        vad_buffer = np.array([], dtype=np.float32)
-        
-        offset = 0
-        last_vad_beg = -1
-        last_vad_end = -1
-        last_text = ""
-        silence_counter = 0
-
-        pause_delay = self.config.get("vad_pause_delay", 0.8)
-        chunk_sec = self.vad_chunk_ms / 1000.0
-        
-        # 自动计算需要几个块 (至少 1 个)
-        required_silence_count = max(1, int(pause_delay / chunk_sec))
-        
-        # === [关键修正 1] 强制设定最小安全缓冲时间 ==I=
-        # 无论配置文件写 2秒 还是 3秒，这里强制至少 6秒 才会触发硬切
-        # 这是为了防止 "死循环"（切分->识别卡顿->积压录音->瞬间又满->切分）
-        cfg_buffer = self.config.get("buffer_seconds", 6)
-        FORCE_CUT_LIMIT = max(float(cfg_buffer), 4.0)
-        print(f"✅ 安全缓冲策略: 阈值已修正为 {FORCE_CUT_LIMIT}秒 (配置值: {cfg_buffer}s)")
+        self.last_text = ""
+        if self.engine is not None:
+            self.engine.start()
+        elif self.loader is not None:
+            # 不等模型：录音马上开始，切分器等模型就绪后再建
+            self.loader.start()
+        else:
+            self._build_segmenter()
 
+        cpu_mark = _time.thread_time()
         while self.running:
             # === 暂停状态处理 ===
             if self.paused:
-                try:
-                    self.stream.read(self.chunk, exception_on_overflow=False)
-                except:
-                    pass
-                _time.sleep(0.02)
+                self._park()
+                cpu_mark = _time.thread_time()
                 continue
 
-            # === 录音读取 ===
+            if self._reset_pending:
+                # 恢复后重置 VAD 状态 (在 Worker 线程里做，避免和切分逻辑抢状态)
+                self._reset_pending = False
+                self._reset_pipeline()
+                self._set_standby(False)
+
+            # === 录音读取 (阻塞到有数据 / 回调模式等录音回调唤醒，不需要额外 sleep) ===
+            self.tuner.enter("capture")
             try:
-                # 这一步可能会因为上次识别卡顿而一次性读出大量数据
-                data = self.stream.read(self.chunk, exception_on_overflow=False)
+                frames = self.standby_chunk if self.standby else self.read_frames
+                data = self.stream.read(frames, exception_on_overflow=False)
             except Exception as e:
                 print(f"录音读取错误: {e}")
+                _time.sleep(0.1)
                 continue
+            if not data:
+                # 被 stop 叫醒，或者回调一直没来 (设备断开)
+                continue
+            metrics.inc("worker_wakeups")
+            if self.recorder is not None:
+                self.recorder.write(data)
 
-            # 转为 float32
-            samples = np.frombuffer(data, dtype=np.int16).astype(np.float32) / 32767.0
-            
-            # 直接拼接，逻辑更简单
-            vad_buffer = np.concatenate((vad_buffer, samples))
+            if self.wake_on_voice:
+                voiced = self._chunk_rms(data) > self.wake_threshold
+                if self.standby:
+                    self.preroll.append(data)
+                    if voiced:
+                        # 有声音了：先把预录的一小段喂进去，再正常处理
+                        self._set_standby(False)
+                        for buffered in self.preroll:
+                            self._process_chunk(buffered)
+                        self.preroll.clear()
+                    elif self.engine is not None:
+                        self._poll_engine()
+                    self._account_cpu(cpu_mark, "standby")
+                    cpu_mark = _time.thread_time()
+                    continue
+                self._quiet_samples = 0 if voiced else self._quiet_samples + len(data) // 2
+                if self._quiet_samples >= self.wake_idle_samples:
+                    self._set_standby(True)
 
-            # === VAD 处理 (处理最新的部分) ===
-            # 我们只需要对新进来的数据或者缓冲区末尾进行 VAD 检查
-            # 为了性能，我们只把未处理的末尾拿去给 VAD 模型看
-            # 但 FunASR VAD 需要连续性，所以这里简化：只在缓冲区积累了一定长度后检测
-            
-            # 只有当缓冲区足够长时才进行复杂的 VAD 运算，节省 CPU
-            if len(vad_buffer) > self.vad_chunk_samples:
-                # 为了不重复计算，这里其实应该维护一个指针，但为了逻辑最简，我们只取最后一段
-                # 注意：这里仅用于检测静音，不用于切分音频流，切分逻辑在下面
-                current_chunk = vad_buffer[-self.vad_chunk_samples:]
-                
-                try:
-                    res = self.model_vad.generate(
-                        input=current_chunk, 
-                        cache=self.cache_vad, 
-                        is_final=False, 
-                        chunk_size=self.vad_chunk_ms
-                    )
-                except Exception as e:
-                    res = []
-
-                if res and "value" in res[0] and len(res[0]["value"]) > 0:
-                    vad_segments = res[0]["value"]
-                    for segment in vad_segments:
-                        if segment[0] > -1: last_vad_beg = segment[0]
-                        if segment[1] > -1: last_vad_end = segment[1]
-                    
-                    if last_vad_beg > -1 and last_vad_end > -1:
-                        silence_counter += 1
-                    else:
-                        silence_counter = 0
-
-                    # === [逻辑 A] VAD 自然切分 ===
-                    if silence_counter >= required_silence_count:
-                        # VAD 认为说话结束了
-                        
-                        # 识别整个缓冲区
-                        rms = np.sqrt(np.mean(vad_buffer**2))
-                        if rms > self.noise_threshold:
-                            try:
-                                text = asr_transcribe(vad_buffer, config_override=self.config)
-                                if text and text.strip() and text != last_text:
-                                    last_text = text
-                                    audio_id = str(int(_time.time() * 1000))
-                                    self.result_ready.emit(text, audio_id)
-                            except Exception as e:
-                                print(f"识别错误: {e}")
-                        
-                        # VAD 自然结束，清空缓冲区，干干净净
-                        vad_buffer = np.array([], dtype=np.float32)
-                        self.cache_vad = {} # VAD 缓存也重置
-                        last_vad_beg = -1
-                        last_vad_end = -1
-                        silence_counter = 0
-
-            # === [逻辑 B] 强制切分保护 (防止死锁) ===
-            current_duration = len(vad_buffer) / self.sample_rate
-            
-            if current_duration >= FORCE_CUT_LIMIT:
-                print(f"⚠️ 触发强制切分 ({current_duration:.1f}s > {FORCE_CUT_LIMIT}s)")
-                
-                # 1. 识别当前所有内容
-                rms = np.sqrt(np.mean(vad_buffer**2))
-                if rms > self.noise_threshold:
-                    try:
-                        text = asr_transcribe(vad_buffer)
-                        if text and text.strip() and text != last_text:
-                            last_text = text
-                            audio_id = str(int(_time.time() * 1000))
-                            self.result_ready.emit(text, audio_id)
-                    except Exception as e:
-                         print(f"强制切分识别错误: {e}")
-
-                # 2. [关键修正] 重叠回填逻辑
-                # 保留最后 1.0 秒作为下一段的开头
-                OVERLAP_SAMPLES = int(1.0 * self.sample_rate)
-                
-                if len(vad_buffer) > OVERLAP_SAMPLES:
-                    # 切片：取最后 1秒
-                    vad_buffer = vad_buffer[-OVERLAP_SAMPLES:]
-                    # !!! 重要 !!! 重置 VAD 缓存，因为音频流被打断了，旧的 VAD 状态可能不匹配
-                    self.cache_vad = {} 
-                else:
-                    # 如果总长度都不够重叠（理论不该发生），清空
-                    vad_buffer = np.array([], dtype=np.float32)
-
-                # 重置计数器
-                last_vad_beg = -1
-                last_vad_end = -1
-                silence_counter = 0
-            
-            # 极短休眠，让出 CPU
-            _time.sleep(0.005)
+            self._process_chunk(data)
+            self._account_cpu(cpu_mark, "active")
+            cpu_mark = _time.thread_time()
+
+    def _process_chunk(self, data):
+        # 转为 float32，并重采样到模型采样率
+        samples = np.frombuffer(data, dtype=np.int16).astype(np.float32) / 32767.0
+        samples = self.resampler.process(samples)
+        if self.denoiser is not None:
+            samples = self.denoiser.process(samples)
+
+        if self.engine is not None:
+            # 音频写进共享内存，顺便取回子进程已经识别出来的结果
+            self.engine.write(samples)
+            self._poll_engine()
+            return
+
+        if self.segmenter is None:
+            if not self.loader.done():
+                self._buffer_while_loading(samples)
+                return
+            self.model_vad = self.loader.vad_model
+            self._build_segmenter()
+            # 加载期间攒下的录音先过一遍切分 (比实时快得多)，积压的段交给识别线程排队
+            backlog = self.loading_backlog
+            self.loading_backlog = deque()
+            self._backlog_samples = 0
+            if backlog:
+                print(f"🎙️ 补识别模型加载期间的录音 {sum(len(b) for b in backlog) / self.model_rate:.1f}s")
+                self._record("models_ready", backlog_s=round(sum(len(b) for b in backlog) / self.model_rate, 2))
+                self._feed_segmenter(np.concatenate(backlog), replay=True)
+        self._feed_segmenter(samples)
+
+    def _poll_engine(self):
+        for text, start, end, forced in self.engine.poll():
+            self._record("segment", start=start, end=end, forced=forced, final=True)
+            if forced:
+                print(f"⚠️ 触发强制切分 ({(end - start) / self.model_rate:.1f}s)")
+            self._emit_text(text)
+        if self.engine.failed and not self._engine_failure_reported:
+            self._engine_failure_reported = True
+            self._record("engine_failed", reason=self.engine.failure)
+            self.engine_failed.emit(self.engine.failure)
+
+    def _build_segmenter(self):
+        # === 切分器：VAD 自然断句 + 超长强制切分 (和文件转写共用) ===
+        self.segmenter = VADSegmenter(self.model_vad, self.config,
+                                      chunk_ms=self.vad_chunk_ms,
+                                      stage_hook=self.tuner.enter,
+                                      speculative=self.speculative is not None,
+                                      endpointer=self.endpointer)
+        # 共享的 VAD 模型可能还带着上一个 Worker 的灵敏度 / 降级时抬高的阈值
+        set_vad_sensitivity(self.model_vad, self.vad_factor)
+        self._applied_vad_boost = 1.0
+        print(f"✅ 安全缓冲策略: 阈值已修正为 {self.segmenter.force_cut_limit}秒 "
+              f"(配置值: {self.config.get('buffer_seconds', 6)}s)")
+
+    def _buffer_while_loading(self, samples):
+        """模型还没加载好：录音先攒着，超过 model_loading_buffer_seconds 丢最老的"""
+        self.loading_backlog.append(samples)
+        self._backlog_samples += len(samples)
+        while self._backlog_samples > self.backlog_limit and len(self.loading_backlog) > 1:
+            self._backlog_samples -= len(self.loading_backlog.popleft())
+            metrics.inc("model_loading_dropped_chunks")
+        metrics.set_gauge("model_loading_backlog_s", round(self._backlog_samples / self.model_rate, 2))
+
+    def _feed_segmenter(self, samples, replay=False):
+        boost = self._vad_boost
+        if boost != self._applied_vad_boost:
+            # raise_vad 在这里生效: VAD 阈值 / 噪声门限只在 Worker 线程 (切分器所在线程) 里改
+            set_vad_sensitivity(self.model_vad, self.vad_factor * boost)
+            self.segmenter.noise_threshold = self.noise_threshold * boost
+            self._applied_vad_boost = boost
+        segments = self.segmenter.feed(samples)
+        self._set_in_utterance(self.segmenter.last_vad_beg > -1)
+        if self.recorder is not None:
+            # VAD 状态 (在不在说话、静音计了几个窗口) 变了才记
+            state = (self.segmenter.last_vad_beg > -1 and self.segmenter.last_vad_end == -1,
+                     self.segmenter.silence_counter)
+            if state != self._vad_state:
+                self._vad_state = state
+                self._record("vad", speaking=state[0], silence=state[1],
+                             required=self.segmenter.current_required_silence)
+        for segment in segments:
+            self._record("segment", start=segment.start, end=segment.end, forced=segment.forced,
+                         final=segment.final)
+            if segment.forced:
+                print(f"⚠️ 触发强制切分 ({segment.duration:.1f}s >= {self.segmenter.force_cut_limit}s)")
+            if segment.final:
+                self.decode_queue.put(segment, replay=replay)
+            else:
+                # 投机段只是提交给后台，不用排队
+                self.transcribe_segment(segment)
+
+    def _set_in_utterance(self, active):
+        if active == self._in_utterance:
+            return
+        self._in_utterance = active
+        if active:
+            inference_scheduler.speech_started()
+        else:
+            inference_scheduler.speech_ended()
+
+    def _on_overload(self, degraded, reason):
+        """
+        DecodeQueue 状态变化 (Worker 线程或识别线程里调用)：切换 cheap_model，暂停投机识别，通知界面；
+        raise_vad 只记下目标倍数，由 Worker 线程在下次切分前应用 (不在切分进行中改 VAD 参数)
+        """
+        self.degraded = degraded
+        strategies = self.decode_queue.strategies
+        if "raise_vad" in strategies:
+            self._vad_boost = self.config.get("overload_vad_boost", 1.5) if degraded else 1.0
+        if "cheap_model" in strategies:
+            self.use_fast_model = degraded
+        self._record("overload", degraded=degraded, reason=reason)
+        self.overload_changed.emit(degraded, reason)
+
+    def _record(self, kind, **data):
+        if self.recorder is not None:
+            self.recorder.event(kind, **data)
+
+    def _reset_pipeline(self):
+        self._record("reset")
+        self._set_in_utterance(False)
+        if self.engine is not None:
+            # 只丢录音；暂停 / 待机前那句话的识别结果还要
+            self.engine.flush()
+        elif self.segmenter is not None:
+            self.segmenter.reset()
+        else:
+            # 模型还在加载，暂停 / 待机前攒的录音不要了
+            self.loading_backlog.clear()
+            self._backlog_samples = 0
+        self.resampler.reset()
+        if self.denoiser is not None:
+            self.denoiser.reset()
+        if self.speculative:
+            self.speculative.discard()
+
+    def _set_standby(self, standby):
+        if standby and not self.standby:
+            # 安静了很久，缓冲区里只剩静音，直接丢掉
+            self._reset_pipeline()
+            self.preroll.clear()
+            metrics.inc("standby_entries")
+        elif not standby and self.standby:
+            self._reset_pipeline()
+            metrics.inc("standby_wakes")
+        if standby != self.standby:
+            self._record("standby", on=standby)
+        self.standby = standby
+        self._quiet_samples = 0
+        metrics.set_gauge("worker_state", "standby" if standby else "active")
+
+    @staticmethod
+    def _chunk_rms(data):
+        pcm = np.frombuffer(data, dtype=np.int16).astype(np.float32)
+        return float(np.sqrt(np.mean(pcm * pcm))) / 32767.0 if len(pcm) else 0.0
+
+    @staticmethod
+    def _account_cpu(mark, state):
+        metrics.inc(f"worker_cpu_{state}_s", _time.thread_time() - mark)
+
+    def _speculative_transcribe(self, audio, is_stale):
+        # 和最终识别一样走调度器的 interactive 位置 (不会和它同时跑)；排到时已经作废就跳过
+        return asr_transcribe(audio, config_override=self.config, abort=is_stale)
+
+    def transcribe_segment(self, segment):
+        if not segment.final:
+            if self.degraded:
+                # 降级时不做投机识别 (白白多占一份算力)
+                return
+            # 投机段：只提交后台识别，不出结果
+            tracing.instant(segment.trace_id, "speculative_start")
+            self.speculative.start(segment.spec_key, segment.audio)
+            return
+
+        with tracing.activate(segment.trace_id):
+            text = None
+            if self.speculative and segment.spec_key is not None:
+                # 断句确认：静音期间没有新语音，投机识别的结果可以直接用
+                with tracing.span("speculative_commit"):
+                    text = self.speculative.commit(segment.spec_key)
+            elif self.speculative:
+                # 这句话的最终识别开始了，它 (和更早的句子) 还在排队的投机识别都用不上了；后面句子的留着
+                self.speculative.discard(upto=segment.start)
+
+            try:
+                if text is None:
+                    with tracing.span("asr_transcribe", audio_s=round(segment.duration, 2),
+                                      forced=segment.forced):
+                        text = asr_transcribe(segment.audio, config_override=self.config,
+                                              fast=self.use_fast_model)
+                self._emit_text(text, segment.audio, segment.trace_id)
+            except Exception as e:
+                print(f"识别错误: {e}")
+                tracing.end(segment.trace_id, outcome="error")
+
+    def _emit_text(self, text, audio=None, trace_id=None):
+        if text and text.strip() and text != self.last_text:
+            self.last_text = text
+            audio_id = str(int(_time.time() * 1000))
+            if audio is not None:
+                self._remember_audio(audio_id, audio, text)
+            # 界面线程按 audio_id 找回这句话的 trace
+            tracing.bind(audio_id, trace_id)
+            tracing.instant(trace_id, "result_emitted")
+            self._record("result", text=text, audio_id=audio_id)
+            self.result_ready.emit(text, audio_id)
+        else:
+            outcome = "empty" if not (text and text.strip()) else "duplicate"
+            self._record("result_dropped", outcome=outcome, text=text or "")
+            tracing.end(trace_id, outcome=outcome)
+
+    def _remember_audio(self, audio_id, audio, text):
+        self.recognized_audio[audio_id] = (audio, text)
+        while len(self.recognized_audio) > self.max_cache_count:
+            self.recognized_audio.popitem(last=False)
+        if self.archive_all:
+            try:
+                self.archive.append(audio, text, self.config.get("language", ""), audio_id=audio_id)
+            except Exception as e:
+                print(f"归档失败: {e}")
 
     def stop(self):
+        # 先叫醒 Worker 线程 (暂停等待 / 回调模式等数据) 让它自己退出循环，再关流和各个组件，
+        # 不在它还可能读流的时候关流
         self.running = False
+        self._wake.set()
+        if hasattr(self.stream, "interrupt"):
+            self.stream.interrupt()
+        finished = self.wait(3000)
+        if not finished:
+            # 还卡在 read / _process_chunk 里：继续叫醒它、等它，不能在它底下关流
+            print("⚠️ 识别线程退出超时，继续等待")
+            for _ in range(10):
+                if hasattr(self.stream, "interrupt"):
+                    self.stream.interrupt()
+                if self.wait(1000):
+                    finished = True
+                    break
+        self._set_in_utterance(False)
+        if self.decode_queue is not None:
+            self.decode_queue.clear()
+            self.decode_queue.stop()
+        if self.speculative:
+            self.speculative.shutdown()
+        if self.endpointer:
+            self.endpointer.save()
+        if not finished:
+            # 录音流 / PyAudio / 推理进程的共享内存还可能正被它用着，宁可不释放也不在它底下关掉
+            print("⚠️ 识别线程仍未退出，录音流和推理进程不关闭")
+            return
+        if self.engine is not None:
+            self.engine.stop()
         try:
-            self.stream.stop_stream()
+            if self.stream.is_active():
+                self.stream.stop_stream()
             self.stream.close()
-            self.pa.terminate()
+            if self.pa is not None:
+                self.pa.terminate()
         except:
             pass
-        self.quit()
-        self.wait()
 
     def save_feedback_audio(self, audio_id):
-        """保存反馈音频文件"""
+        """
+        保存反馈音频 (托盘 "保存上一句录音" 调用)：配置了归档就写进归档，返回 "归档路径#下标"；
+        否则存成单独的 WAV，返回文件路径。录音已经不在缓存里或保存失败返回 ""
+        """
         if audio_id not in self.recognized_audio:
             return ""
-        if not os.path.exists("feedback_audio"):
-            os.makedirs("feedback_audio")
-            
-        filename = os.path.join("feedback_audio", f"{audio_id}.wav")
-        audio_data = self.recognized_audio[audio_id]
+        audio_data, text = self.recognized_audio[audio_id]
+
+        if self.archive is not None:
+            try:
+                # archive_all 时识别完已经存过了；那次归档失败的话这里补存
+                index = self.archive.find(audio_id) if self.archive_all else None
+                if index is None:
+                    index = self.archive.append(audio_data, text, self.config.get("language", ""),
+                                                audio_id=audio_id)
+                self.recognized_audio.pop(audio_id, None)
+                return f"{self.archive.path}#{index}"
+            except Exception as e:
+                print(f"保存音频失败: {e}")
+                return ""
+
+        feedback_dir = resolve_user_path("feedback_audio")
+        os.makedirs(feedback_dir, exist_ok=True)
+        filename = os.path.join(feedback_dir, f"{audio_id}.wav")
         
         # float32 -> int16
         audio_int16 = (audio_data * 32767).astype(np.int16)
@@ -267,7 +599,7 @@ class ASRWorkerThread(QThread):
             with wave.open(filename, "wb") as wf:
                 wf.setnchannels(1)
                 wf.setsampwidth(2)
-                wf.setframerate(self.sample_rate)
+                wf.setframerate(self.model_rate)
                 wf.writeframes(audio_int16.tobytes())
             
             # 保存后移除缓存
@@ -0,0 +1,149 @@
+"""
+降噪前端基准：把干净语音混上稳定噪声 (风扇 / 工频嗡声 / 键盘敲击)，中间插入长段纯噪声，
+按实时麦克风的切法 (VADSegmenter，256ms 窗口) 各跑一遍 关闭 / 开启 noise_suppression，
+统计送去识别的次数 (= asr_transcribe 调用次数)、送去识别的音频时长和降噪每帧耗时。
+
+运行:
+    python tests/bench_noise_suppression.py --wav a.wav b.wav
+    python tests/bench_noise_suppression.py --data 标注集目录 --noise 风扇录音.wav --snr 5 --asr
+不给 --noise 时用合成噪声；--asr 会真的跑识别，额外统计空结果数 (以及有标注时的 CER)。
+"""
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from resampler import MODEL_SAMPLE_RATE
+
+BLOCK = int(MODEL_SAMPLE_RATE * 0.256)
+
+
+def synthetic_noise(seconds, seed=0):
+    """风扇 (低通的布朗噪声) + 50Hz 工频及谐波 + 随机键盘敲击"""
+    rng = np.random.default_rng(seed)
+    n = int(seconds * MODEL_SAMPLE_RATE)
+    t = np.arange(n) / MODEL_SAMPLE_RATE
+    fan = np.cumsum(rng.standard_normal(n))
+    fan -= np.convolve(fan, np.ones(400) / 400, mode="same")   # 去掉漂移，只留低频轰鸣
+    fan /= np.abs(fan).max() + 1e-9
+    hum = 0.3 * np.sin(2 * np.pi * 50 * t) + 0.15 * np.sin(2 * np.pi * 100 * t)
+    clicks = np.zeros(n)
+    for pos in rng.integers(0, n - 400, size=int(seconds * 3)):
+        clicks[pos:pos + 400] += rng.standard_normal(400) * np.exp(-np.arange(400) / 60.0)
+    return (fan + hum + 0.5 * clicks + 0.1 * rng.standard_normal(n)).astype(np.float32)
+
+
+def build_corpus(speech, noise, snr_db, gap_seconds):
+    """语音之间插入 gap_seconds 的空白，整条混上噪声 (按语音部分的能量算信噪比)"""
+    gap = np.zeros(int(gap_seconds * MODEL_SAMPLE_RATE), dtype=np.float32)
+    parts = [gap]
+    for audio in speech:
+        parts += [audio, gap]
+    clean = np.concatenate(parts)
+    noise = np.resize(noise, len(clean))
+    speech_rms = np.sqrt(np.mean(np.concatenate(speech) ** 2))
+    noise_rms = np.sqrt(np.mean(noise ** 2)) + 1e-12
+    noise = noise * (speech_rms / noise_rms) * 10 ** (-snr_db / 20.0)
+    return np.clip(clean + noise, -1.0, 1.0).astype(np.float32)
+
+
+def run(audio, config, model_vad, denoise, transcribe=None):
+    from segmenter import VADSegmenter
+    from noise_suppressor import NoiseSuppressor
+
+    segmenter = VADSegmenter(model_vad, config)
+    suppressor = NoiseSuppressor(config) if denoise else None
+    calls = empty = 0
+    decoded = denoise_time = 0.0
+    texts = []
+
+    def handle(segments):
+        nonlocal calls, empty, decoded
+        for seg in segments:
+            calls += 1
+            decoded += seg.duration
+            if transcribe is not None:
+                text = transcribe(seg.audio)
+                if text and text.strip():
+                    texts.append(text)
+                else:
+                    empty += 1
+
+    for i in range(0, len(audio), BLOCK):
+        block = audio[i:i + BLOCK]
+        if suppressor is not None:
+            start = time.perf_counter()
+            block = suppressor.process(block)
+            denoise_time += time.perf_counter() - start
+        handle(segmenter.feed(block))
+    handle(segmenter.flush())
+    return {
+        "calls": calls,
+        "decoded_s": decoded,
+        "empty": empty,
+        "text": "".join(texts),
+        "denoise_rtf": denoise_time / (len(audio) / MODEL_SAMPLE_RATE),
+        "frame_us": suppressor.frame_cost_us if suppressor else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="noise_suppression 开 / 关时的识别调用次数对比")
+    parser.add_argument("--data", default=None, help="标注集 (目录 / .tsv / .jsonl)")
+    parser.add_argument("--wav", nargs="*", default=[], help="干净语音录音")
+    parser.add_argument("--noise", default=None, help="噪声录音 (默认合成风扇 + 工频 + 键盘声)")
+    parser.add_argument("--snr", type=float, default=20.0, help="信噪比 dB")
+    parser.add_argument("--gap", type=float, default=15.0, help="语音之间插入的纯噪声秒数")
+    parser.add_argument("--asr", action="store_true", help="真的跑识别 (统计空结果 / CER)")
+    args = parser.parse_args()
+    if not args.data and not args.wav:
+        parser.error("需要 --data 或 --wav")
+
+    import asr_core
+    from audio_io import read_wav_16k
+    from evaluation import load_labeled_set, cer
+
+    if args.data:
+        labeled = load_labeled_set(args.data)
+    else:
+        labeled = [(path, None) for path in args.wav]
+    speech = [read_wav_16k(path) for path, _ in labeled]
+    if not speech:
+        parser.error("没有可用的录音")
+    seconds = sum(len(a) for a in speech) / MODEL_SAMPLE_RATE + args.gap * (len(speech) + 1)
+    noise = read_wav_16k(args.noise) if args.noise else synthetic_noise(seconds)
+    audio = build_corpus(speech, noise, args.snr, args.gap)
+
+    config = dict(asr_core.config)
+    config["adaptive_endpointing"] = False
+    model_vad = asr_core.load_vad_model(config)
+    transcribe = None
+    if args.asr:
+        transcribe = lambda a: asr_core.asr_transcribe(a, config_override=config)
+
+    print(f"📂 {len(speech)} 段语音，带噪录音共 {len(audio) / MODEL_SAMPLE_RATE:.0f} 秒 "
+          f"(SNR {args.snr:g} dB，{'噪声文件' if args.noise else '合成噪声'})")
+    results = {}
+    for name, denoise in (("关闭", False), ("开启", True)):
+        results[name] = r = run(audio, config, model_vad, denoise, transcribe)
+        line = f"降噪{name}: 识别调用 {r['calls']:4d} 次，送识别音频 {r['decoded_s']:6.1f}s"
+        if args.asr:
+            line += f"，空结果 {r['empty']} 次"
+            if args.data:
+                edits, chars = cer("".join(ref for _, ref in labeled), r["text"])
+                line += f"，CER {edits / max(chars, 1):.2%}"
+        if denoise:
+            line += f"，降噪每帧 {r['frame_us']:.0f}us (RTF {r['denoise_rtf']:.4f})"
+        print(line)
+
+    off, on = results["关闭"], results["开启"]
+    saved = off["calls"] - on["calls"]
+    print(f"\n降噪省掉 {saved} 次识别调用 ({saved / max(off['calls'], 1):.0%})，"
+          f"少送 {off['decoded_s'] - on['decoded_s']:.1f}s 音频给模型")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+int8 动态量化基准：同一批录音分别用 fp32 和 int8 (asr_quantization: int8) 的 SenseVoice 识别，
+对比 加载 / 量化耗时、RTF、CER，以及两者输出不一致的条数。
+
+运行:
+    python tests/bench_quantization.py --data 标注集目录      (目录 / .tsv / .jsonl，和 param_sweep 一样)
+    python tests/bench_quantization.py --wav a.wav b.wav     (没有标注时以 fp32 的输出作为参考文本)
+"""
+import os
+import sys
+import copy
+import time
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+
+def transcribe(model, audio, language):
+    import asr_core
+    res = model.generate(input=audio, cache={}, language=language, use_itn=True, batch_size=64)
+    return asr_core.format_text(res[0]["text"])
+
+
+def run(model, items, language, repeat):
+    """返回 (每条的识别结果, RTF)；重复 repeat 次取最快"""
+    from resampler import MODEL_SAMPLE_RATE
+    total = sum(len(audio) for _, _, audio in items) / MODEL_SAMPLE_RATE
+    # 预热一次，排除首次推理的初始化开销
+    transcribe(model, items[0][2][:MODEL_SAMPLE_RATE * 3], language)
+    best = float("inf")
+    hyps = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        hyps = [transcribe(model, audio, language) for _, _, audio in items]
+        best = min(best, time.perf_counter() - start)
+    return hyps, best / total
+
+
+def score(refs, hyps):
+    from evaluation import cer
+    edits = chars = 0
+    for ref, hyp in zip(refs, hyps):
+        e, n = cer(ref, hyp)
+        edits += e
+        chars += n
+    return edits / max(chars, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="fp32 / int8 SenseVoice 准确率与速度对比")
+    parser.add_argument("--data", default=None, help="标注集 (目录 / .tsv / .jsonl)")
+    parser.add_argument("--wav", nargs="*", default=[], help="没有标注的录音，以 fp32 输出为参考")
+    parser.add_argument("--repeat", type=int, default=2, help="每个模型重复次数 (取最快)")
+    parser.add_argument("--threads", type=int, default=0, help="PyTorch intra-op 线程数 (0 = 按配置)")
+    args = parser.parse_args()
+    if not args.data and not args.wav:
+        parser.error("需要 --data 或 --wav")
+
+    import torch
+    import asr_core
+    from audio_io import read_wav_16k
+    from evaluation import load_labeled_set
+    from quantization import quantize_auto_model
+
+    if args.threads > 0:
+        torch.set_num_threads(args.threads)
+    if args.data:
+        labeled = load_labeled_set(args.data)
+        items = [(path, ref, read_wav_16k(path)) for path, ref in labeled]
+    else:
+        items = [(path, None, read_wav_16k(path)) for path in args.wav]
+    if not items:
+        parser.error("没有可用的录音")
+    language = asr_core.target_lang
+
+    # 直接在 CPU 上加载 fp32 模型 (不管配置里的 asr_quantization)
+    asr_core.quantize_mode = "none"
+    start = time.perf_counter()
+    fp32 = asr_core._load_asr_model("cpu", False)
+    load_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    int8 = quantize_auto_model(copy.deepcopy(fp32), "cpu", asr_core.config, cache_dir=None)
+    quantize_s = time.perf_counter() - start
+    # 再走一遍带缓存的路径: 第一次写缓存，第二次量的是启动时真正的额外开销
+    quantize_auto_model(copy.deepcopy(fp32), "cpu", asr_core.config, cache_dir=asr_core.quantize_cache_dir)
+    start = time.perf_counter()
+    quantize_auto_model(copy.deepcopy(fp32), "cpu", asr_core.config, cache_dir=asr_core.quantize_cache_dir)
+    cached_s = time.perf_counter() - start
+
+    print(f"📂 {len(items)} 条录音，torch 线程 {torch.get_num_threads()}")
+    fp32_hyps, fp32_rtf = run(fp32, items, language, args.repeat)
+    int8_hyps, int8_rtf = run(int8, items, language, args.repeat)
+
+    if args.data:
+        refs = [ref for _, ref, _ in items]
+        ref_name = "标注"
+    else:
+        refs = fp32_hyps
+        ref_name = "fp32 输出"
+    fp32_cer = score(refs, fp32_hyps)
+    int8_cer = score(refs, int8_hyps)
+    differ = sum(a != b for a, b in zip(fp32_hyps, int8_hyps))
+
+    print(f"\n加载 fp32 {load_s:.1f}s，量化 {quantize_s * 1000:.0f} ms，从缓存加载量化层 {cached_s * 1000:.0f} ms")
+    print(f"{'模型':>6} {'RTF':>8} {'CER':>8}   (CER 参考: {ref_name})")
+    print(f"{'fp32':>6} {fp32_rtf:>8.4f} {fp32_cer:>8.2%}")
+    print(f"{'int8':>6} {int8_rtf:>8.4f} {int8_cer:>8.2%}")
+    print(f"int8 提速 {fp32_rtf / max(int8_rtf, 1e-9):.2f}x，CER 变化 {(int8_cer - fp32_cer) * 100:+.2f} 个百分点，"
+          f"{differ}/{len(items)} 条输出与 fp32 不同")
+    for (path, _, _), a, b in zip(items, fp32_hyps, int8_hyps):
+        if a != b:
+            print(f"  {os.path.basename(path)}\n    fp32: {a}\n    int8: {b}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+设备回退检查：用模拟故障验证 GPU -> CPU 回退，不需要真的有 GPU 出错。
+
+    python tests/device_fallback_check.py --audio sample.wav --mode oom:2
+    python tests/device_fallback_check.py --audio sample.wav --mode load
+
+依次识别几遍同一段录音，检查每次都有结果、回退后设备变成 cpu。
+"""
+import os
+import sys
+import argparse
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+sys.path.insert(0, SRC_DIR)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="GPU -> CPU 回退检查")
+    parser.add_argument("--audio", required=True, help="用来识别的录音 (WAV)")
+    parser.add_argument("--mode", default="oom:2", help="probe / load / oom:N")
+    parser.add_argument("--runs", type=int, default=4)
+    args = parser.parse_args()
+
+    # 必须在 import asr_core 之前设置，模型加载时就会读取
+    os.environ["ASRINPUT_SIMULATE_FAILURE"] = args.mode
+
+    import metrics
+    from audio_io import read_wav_16k
+    from asr_core import asr_transcribe, get_device_manager
+
+    device_manager = get_device_manager()
+    audio = read_wav_16k(args.audio)
+    failed = False
+    for i in range(args.runs):
+        text = asr_transcribe(audio)
+        ok = bool(text)
+        failed = failed or not ok
+        print(f"{'✅' if ok else '❌'} 第 {i + 1} 次 [{device_manager.device}]: {text}")
+
+    fallbacks = metrics.get("device_fallbacks", 0)
+    if args.mode != "probe" and fallbacks < 1 and device_manager.device != "cpu":
+        print("❌ 没有触发回退")
+        failed = True
+    print(f"回退次数: {fallbacks} | 当前设备: {metrics.get('device')}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
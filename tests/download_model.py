@@ -1,23 +1,28 @@
 # download_model.py
+# 下载 ASR / VAD 模型到 models/ 并生成校验清单 (等同于 python src/model_store.py provision)，
+# 已经下载且校验通过的模型直接跳过。
 import os
-from funasr import AutoModel
+import sys
 
-MODEL_NAME = "iic/SenseVoiceSmall"
-MODEL_CACHE_PATH = "models"
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+sys.path.insert(0, SRC_DIR)
 
-def download_model():
-    os.makedirs(MODEL_CACHE_PATH, exist_ok=True)
-    # 简单判断 models 目录是否为空，若非空则认为已下载（根据实际情况可进一步检查）
-    if os.listdir(MODEL_CACHE_PATH):
-        print("检测到模型缓存目录不为空，跳过下载。")
-        return
-    os.environ["TRANSFORMERS_CACHE"] = MODEL_CACHE_PATH
-    print("开始下载模型...")
-    model = AutoModel(
-         model=MODEL_NAME,
-         trust_remote_code=True,
-    )
-    print("模型下载完成。")
+from model_store import provision, verify, get_base_path
+
+MODEL_CACHE_PATH = os.path.join(get_base_path(), "models")
+
+def download_model(force=False):
+    paths = provision(MODEL_CACHE_PATH, force=force)
+    failed = False
+    for config_key, model_dir in paths.items():
+        problems = verify(model_dir, deep=True)
+        print(f"{'✅' if not problems else '❌'} {config_key}: {model_dir}")
+        for problem in problems:
+            print(f"   {problem}")
+        failed = failed or bool(problems)
+    if failed:
+        sys.exit(1)
+    print("模型已就绪，可以在 config.yaml 里设置 offline_mode: true")
 
 if __name__ == '__main__':
-    download_model()
+    download_model(force="--force" in sys.argv)
@@ -0,0 +1,100 @@
+"""
+空闲功耗检查：分别测 工作 / 静音待机 / 暂停 三种状态下 Worker 的 CPU 时间和循环唤醒次数。
+
+    python tests/idle_power_check.py --seconds 20
+    python tests/idle_power_check.py --seconds 20 --audio sample.wav
+    python tests/idle_power_check.py --seconds 20 --capture-mode blocking   # 和旧的阻塞读取对比
+
+回放流按真实速度输出 (和麦克风一样阻塞)，先放 --audio 的录音 (不给就放一段噪声当作说话)，
+再放静音让 Worker 进入待机，最后暂停。
+"""
+import os
+import sys
+import time
+import argparse
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+sys.path.insert(0, SRC_DIR)
+
+import yaml
+import numpy as np
+from PyQt6.QtCore import QCoreApplication
+
+
+def run_phase(app, seconds):
+    import metrics
+    before = metrics.snapshot()
+    cpu = time.process_time()
+    deadline = time.time() + seconds
+    while time.time() < deadline:
+        app.processEvents()
+        time.sleep(0.05)
+    after = metrics.snapshot()
+    return {
+        "process_cpu_s": time.process_time() - cpu,
+        "wakeups": after.get("worker_wakeups", 0) - before.get("worker_wakeups", 0),
+        "state": after.get("worker_state"),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ASRInput 空闲功耗检查")
+    parser.add_argument("--audio", default=None, help="工作阶段回放的录音 (WAV)")
+    parser.add_argument("--seconds", type=float, default=20.0, help="每个阶段测多少秒")
+    parser.add_argument("--config", default=os.path.join(SRC_DIR, "config.yaml"))
+    parser.add_argument("--capture-mode", choices=["callback", "blocking"], default=None,
+                        help="录音方式 (默认用配置文件里的)")
+    args = parser.parse_args()
+
+    with open(args.config, "r", encoding="utf-8") as f:
+        config = yaml.safe_load(f) or {}
+    if args.capture_mode:
+        config["capture_mode"] = args.capture_mode
+    config["wake_on_voice"] = True
+    config["wake_idle_seconds"] = min(config.get("wake_idle_seconds", 15), args.seconds / 4)
+
+    from audio_io import read_wav, replay_stream_factory
+    from worker_thread import ASRWorkerThread
+
+    rate = config.get("sample_rate", 16000)
+    if args.audio:
+        speech, speech_rate = read_wav(args.audio)
+        if speech_rate != rate:
+            from resampler import PolyphaseResampler
+            speech = PolyphaseResampler(speech_rate, rate).process(speech)
+    else:
+        speech = (np.random.default_rng(0).standard_normal(int(rate * args.seconds)) * 0.05).astype(np.float32)
+    speech = np.resize(speech, int(rate * args.seconds))
+    silence = np.zeros(int(rate * args.seconds * 2), dtype=np.float32)
+    samples = np.concatenate([speech, silence])
+
+    app = QCoreApplication(sys.argv)
+    worker = ASRWorkerThread(
+        sample_rate=rate,
+        chunk=config.get("chunk", 256),
+        buffer_seconds=config.get("buffer_seconds", 4),
+        config=config,
+        stream_factory=replay_stream_factory(samples, rate, speed=1.0, loop=False),
+    )
+    worker.start()
+
+    results = {}
+    try:
+        results["工作"] = run_phase(app, args.seconds)
+        results["静音待机"] = run_phase(app, args.seconds)
+        worker.pause()
+        results["暂停"] = run_phase(app, args.seconds)
+    finally:
+        worker.stop()
+
+    import metrics
+    print(f"\n=== 空闲功耗 (录音: {config.get('capture_mode', 'callback')}) ===")
+    for name, r in results.items():
+        print(f"{name:6s} | CPU {r['process_cpu_s']:.2f}s ({r['process_cpu_s'] / args.seconds * 100:.1f}%) | "
+              f"唤醒 {r['wakeups']} 次 ({r['wakeups'] / args.seconds:.1f}/s) | 状态 {r['state']}")
+    if metrics.get("capture_wake_latency_ms") is not None:
+        print(f"回调到唤醒延迟 (最后一次): {metrics.get('capture_wake_latency_ms')} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+多路回放测试：同时回放几段录音给 MultiStreamScheduler，检查每一路的识别延迟。
+
+    python tests/multi_stream_replay.py --audio a.wav --audio b.wav --audio c.wav
+    python tests/multi_stream_replay.py --audio a.wav --streams 4 --latency-ms 1500
+
+--fake-asr MS 不加载模型，用 "每批固定 MS 毫秒 + 每段 MS/4 毫秒" 的假识别测调度本身 (VAD 用能量检测)。
+任何一路 p95 延迟超过目标，或有一路没有结果，以非 0 退出码失败。
+"""
+import os
+import sys
+import time
+import argparse
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+sys.path.insert(0, SRC_DIR)
+
+import yaml
+
+
+def main():
+    parser = argparse.ArgumentParser(description="多路回放延迟测试")
+    parser.add_argument("--audio", action="append", required=True, help="回放录音 (可重复)")
+    parser.add_argument("--streams", type=int, default=0, help="总路数 (录音不够就循环使用)，默认每个录音一路")
+    parser.add_argument("--speed", type=float, default=1.0, help="回放倍速")
+    parser.add_argument("--latency-ms", type=int, default=1500, help="每路 p95 延迟目标")
+    parser.add_argument("--fake-asr", type=float, default=None, metavar="MS", help="不加载模型，用假识别")
+    parser.add_argument("--config", default=os.path.join(SRC_DIR, "config.yaml"))
+    args = parser.parse_args()
+
+    with open(args.config, "r", encoding="utf-8") as f:
+        config = yaml.safe_load(f) or {}
+
+    from audio_io import read_wav, ReplayStream
+    from multi_stream import MultiStreamScheduler
+    import metrics
+
+    kwargs = {}
+    if args.fake_asr is not None:
+        def fake_batch(audios, cfg):
+            time.sleep((args.fake_asr + args.fake_asr / 4 * len(audios)) / 1000.0)
+            return [f"{len(a) / 16000:.2f}s" for a in audios]
+        kwargs = {"transcribe_batch": fake_batch, "model_vad": None}
+
+    results = {}
+
+    def on_result(stream_id, text, segment, latency):
+        results[stream_id] = results.get(stream_id, 0) + 1
+        print(f"[{stream_id}] {latency * 1000:6.0f}ms  {text}")
+
+    scheduler = MultiStreamScheduler(config, on_result=on_result, **kwargs)
+    count = args.streams or len(args.audio)
+    chunk = config.get("chunk", 256)
+    for i in range(count):
+        samples, rate = read_wav(args.audio[i % len(args.audio)])
+        stream = ReplayStream(samples, chunk, rate=rate, speed=args.speed, loop=False)
+        scheduler.add_stream(f"s{i}", stream, rate, chunk, latency_ms=args.latency_ms)
+
+    start = time.time()
+    scheduler.start()
+    try:
+        scheduler.wait()
+    finally:
+        scheduler.stop()
+
+    print(f"\n=== 多路回放结果 ({count} 路, {time.time() - start:.1f}s) ===")
+    print(f"批次 {metrics.get('multi_stream_batches', 0)} | 段数 {metrics.get('multi_stream_segments', 0)}")
+    failed = False
+    for sid, s in scheduler.stats().items():
+        ok = s["results"] > 0 and s["p95_ms"] <= s["target_ms"]
+        failed = failed or not ok
+        print(f"{'✅' if ok else '❌'} {sid}: {s}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
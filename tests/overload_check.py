@@ -0,0 +1,91 @@
+"""
+过载检查：用一个比实时还慢的假识别 (--rtf 1.5 = 识别 1 秒音频要 1.5 秒) 回放录音，
+看 Worker 能不能按过载策略降级，而不是延迟一路涨上去。
+
+    python tests/overload_check.py --audio sample.wav --rtf 1.5 --seconds 60
+    python tests/overload_check.py --audio sample.wav --rtf 1.5 --strategies merge
+
+每秒打印一次 队列深度 / 估算延迟 / 状态，最后汇总 出结果的段数、合并 / 丢弃的段数、最大延迟。
+"""
+import os
+import sys
+import time
+import argparse
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+sys.path.insert(0, SRC_DIR)
+
+import yaml
+from PyQt6.QtCore import QCoreApplication
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ASRInput 过载降级检查")
+    parser.add_argument("--audio", required=True, help="回放的录音 (WAV，循环播放)")
+    parser.add_argument("--rtf", type=float, default=1.5, help="假识别的实时率 (>1 = 比实时慢)")
+    parser.add_argument("--seconds", type=float, default=60.0, help="回放多少秒")
+    parser.add_argument("--strategies", default=None, help="逗号分隔，覆盖 overload_strategies")
+    parser.add_argument("--config", default=os.path.join(SRC_DIR, "config.yaml"))
+    args = parser.parse_args()
+
+    with open(args.config, "r", encoding="utf-8") as f:
+        config = yaml.safe_load(f) or {}
+    if args.strategies is not None:
+        config["overload_strategies"] = [s for s in args.strategies.split(",") if s]
+    config["engine_process"] = False
+    config["speculative_decoding"] = False
+
+    import metrics
+    import worker_thread
+    from audio_io import read_wav, replay_stream_factory
+
+    def fake_transcribe(audio, config_override=None, use_cache=False, fast=False):
+        time.sleep(len(audio) / 16000 * args.rtf * (0.5 if fast else 1.0))
+        return f"[{len(audio) / 16000:.1f}s]"
+
+    worker_thread.asr_transcribe = fake_transcribe
+
+    samples, rate = read_wav(args.audio)
+    app = QCoreApplication(sys.argv)
+    worker = worker_thread.ASRWorkerThread(
+        sample_rate=config.get("sample_rate", 16000),
+        chunk=config.get("chunk", 256),
+        buffer_seconds=config.get("buffer_seconds", 6),
+        config=config,
+        stream_factory=replay_stream_factory(samples, rate, speed=1.0, loop=True),
+    )
+    results = []
+    transitions = []
+    worker.result_ready.connect(lambda text, audio_id: results.append(text))
+    worker.overload_changed.connect(lambda degraded, reason: transitions.append((degraded, reason)))
+    worker.start()
+
+    max_lag = 0.0
+    deadline = time.time() + args.seconds
+    next_print = time.time() + 1
+    try:
+        while time.time() < deadline:
+            app.processEvents()
+            time.sleep(0.05)
+            lag = metrics.get("overload_lag_s", 0.0)
+            max_lag = max(max_lag, lag)
+            if time.time() >= next_print:
+                next_print += 1
+                print(f"队列 {metrics.get('overload_queue_depth', 0):2d} 段 | 延迟 {lag:5.1f}s | "
+                      f"RTF {metrics.get('overload_rtf', 0):.2f} | {metrics.get('overload_state', 'normal')}")
+    finally:
+        worker.stop()
+        app.processEvents()
+
+    print("\n=== 过载检查 ===")
+    print(f"策略: {config.get('overload_strategies')}  假识别 RTF {args.rtf}")
+    print(f"出结果 {len(results)} 段 | 合并 {metrics.get('overload_merged_segments', 0)} 段 | "
+          f"丢弃 {metrics.get('overload_dropped_segments', 0)} 段 ({metrics.get('overload_dropped_seconds', 0):.1f}s)")
+    print(f"最大估算延迟 {max_lag:.1f}s | 进入降级 {metrics.get('overload_entries', 0)} 次 | "
+          f"录音丢帧 {metrics.get('capture_dropped_frames', 0)}")
+    for degraded, reason in transitions:
+        print(f"  {'降级' if degraded else '恢复'}: {reason}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,307 @@
+"""
+长时间压力测试 (soak test)：创建真正的 ModernUIWindow (离屏)，把录音循环回放给它的 Worker，模拟托盘程序挂一整天。
+
+过程中定期 暂停/恢复 (麦克风按钮)、切换配置 (触发托盘菜单的 语言 / VAD灵敏度 / 缓冲时长，
+走窗口自己的 stop + QTimer.singleShot 重启链)，并采样 RSS、tracemalloc、
+操作系统线程数 (包括 QThread / PortAudio / torch 的原生线程)、句柄数、识别日志文件大小。
+跑完后按 "每小时音频" 计算增长斜率，超过阈值就以非 0 退出码失败，并打印 tracemalloc 增长最多的分配位置。
+上屏换成空操作 (不往当前活动窗口里打字)，历史记录写到单独的 log/soak_history.db。
+
+运行示例 (4 小时音频，20 倍速回放):
+    python tests/soak_harness.py --audio sample.wav --hours 4 --speed 20
+"""
+import os
+import sys
+import csv
+import time
+import argparse
+import threading
+import tracemalloc
+
+# 没有显示器也能创建窗口 / 托盘图标
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+sys.path.insert(0, SRC_DIR)
+
+import yaml
+import numpy as np
+from PyQt6.QtWidgets import QApplication
+
+
+# === 进程资源采样 ===
+def get_rss_mb():
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / 1024 / 1024
+    except ImportError:
+        pass
+    if sys.platform == "win32":
+        import ctypes
+        from ctypes import wintypes
+
+        class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+            _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD),
+                        ("PeakWorkingSetSize", ctypes.c_size_t), ("WorkingSetSize", ctypes.c_size_t),
+                        ("QuotaPeakPagedPoolUsage", ctypes.c_size_t), ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                        ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t), ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                        ("PagefileUsage", ctypes.c_size_t), ("PeakPagefileUsage", ctypes.c_size_t)]
+        counters = PROCESS_MEMORY_COUNTERS()
+        counters.cb = ctypes.sizeof(counters)
+        handle = ctypes.windll.kernel32.GetCurrentProcess()
+        ctypes.windll.psapi.GetProcessMemoryInfo(handle, ctypes.byref(counters), counters.cb)
+        return counters.WorkingSetSize / 1024 / 1024
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def get_thread_count():
+    """操作系统看到的线程数 (threading.active_count 数不到 QThread 和原生线程)"""
+    try:
+        import psutil
+        return psutil.Process().num_threads()
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("Threads:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return threading.active_count()
+
+
+def get_handle_count():
+    if sys.platform == "win32":
+        import ctypes
+        count = ctypes.c_ulong()
+        ctypes.windll.kernel32.GetProcessHandleCount(ctypes.windll.kernel32.GetCurrentProcess(),
+                                                     ctypes.byref(count))
+        return count.value
+    try:
+        return len(os.listdir("/proc/self/fd"))
+    except OSError:
+        return 0
+
+
+def slope_per_hour(xs_hours, ys):
+    if len(xs_hours) < 3 or xs_hours[-1] - xs_hours[0] <= 0:
+        return 0.0
+    return float(np.polyfit(np.asarray(xs_hours), np.asarray(ys), 1)[0])
+
+
+# === 配置切换序列 (托盘菜单: 语言 / VAD灵敏度 / 缓冲时长 里的选项) ===
+CONFIG_SWITCHES = [
+    ("language", "en"),
+    ("vad", 1.4),
+    ("buffer", 4),
+    ("language", "zh"),
+    ("vad", 1.0),
+    ("buffer", 6),
+]
+
+
+class SoakRunner:
+    """驱动 ModernUIWindow：Worker 由窗口自己创建 / 重启，这里只跟踪它消耗的音频和出的结果"""
+
+    def __init__(self, args, config):
+        from audio_io import read_wav, replay_stream_factory
+        import window as window_module
+        samples, rate = read_wav(args.audio)
+        # 上屏不真的打字
+        window_module.insert_text_into_active_window = lambda text: None
+        self.window = window_module.ModernUIWindow(config)
+        self.window.stream_factory = replay_stream_factory(samples, rate, speed=args.speed, loop=True)
+        self.args = args
+        self.worker = None
+        self.worker_frames = 0
+        self.audio_seconds_done = 0.0   # 已结束的 Worker 消耗的音频
+        self.results = 0
+        self.restarts = 0
+        self.pauses = 0
+
+    def track_worker(self):
+        """窗口换了 Worker (或者停了) 时结算上一个的音频，连上新的结果信号"""
+        worker = self.window.worker
+        if self.worker is not None:
+            self.worker_frames = self.worker.stream.frames_read
+        if worker is self.worker:
+            return
+        if self.worker is not None:
+            self.audio_seconds_done += self.worker_frames / self.worker.sample_rate
+        self.worker = worker
+        self.worker_frames = 0
+        if worker is not None:
+            worker.result_ready.connect(self.on_result)
+
+    def switch_config(self, menu, value):
+        """和用户点托盘菜单一样触发对应的 QAction"""
+        w = self.window
+        if menu == "language":
+            actions = [a for a in w.lang_action_group.actions() if a.data() == value]
+        elif menu == "vad":
+            actions = [a for a in w.vad_action_group.actions() if abs(a.data() - value) < 0.01]
+        else:
+            actions = [a for a in w.action_group_buffer if a.text() == f"{value} 秒"]
+        if actions:
+            actions[0].trigger()
+            self.restarts += 1
+
+    def log_kb(self):
+        try:
+            return os.path.getsize(self.window.log_file_path) / 1024
+        except OSError:
+            return 0.0
+
+    def on_result(self, text, audio_id):
+        self.results += 1
+
+    def audio_hours(self):
+        current = 0.0
+        if self.worker is not None:
+            current = self.worker_frames / self.worker.sample_rate
+        return (self.audio_seconds_done + current) / 3600.0
+
+    def close(self):
+        self.window.exiting = True
+        self.window.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ASRInput 长时间压力测试")
+    parser.add_argument("--audio", required=True, help="回放用的录音 (WAV，循环播放)")
+    parser.add_argument("--hours", type=float, default=4.0, help="总共回放多少小时的音频")
+    parser.add_argument("--speed", type=float, default=10.0, help="回放倍速")
+    parser.add_argument("--config", default=os.path.join(SRC_DIR, "config.yaml"))
+    parser.add_argument("--sample-every", type=float, default=60.0, help="每隔多少秒音频采样一次资源")
+    parser.add_argument("--pause-every", type=float, default=600.0, help="每隔多少秒音频暂停一次")
+    parser.add_argument("--pause-for", type=float, default=2.0, help="暂停持续的真实秒数")
+    parser.add_argument("--switch-every", type=float, default=1800.0, help="每隔多少秒音频切换一次配置 (重启 Worker)")
+    parser.add_argument("--warmup", type=float, default=0.1, help="计算斜率时忽略的开头比例")
+    parser.add_argument("--max-rss-slope", type=float, default=20.0, help="RSS 允许增长 MB/小时音频")
+    parser.add_argument("--max-py-slope", type=float, default=5.0, help="tracemalloc 允许增长 MB/小时音频")
+    parser.add_argument("--max-handle-slope", type=float, default=20.0, help="句柄数允许增长 个/小时音频")
+    parser.add_argument("--max-thread-growth", type=int, default=2, help="线程数相对基线允许多出几个")
+    parser.add_argument("--max-log-slope", type=float, default=2048.0,
+                        help="识别日志允许增长 KB/小时音频 (正常每句一行，远小于这个值)")
+    parser.add_argument("--csv", default=None, help="采样数据输出路径 (默认 log/soak_<时间>.csv)")
+    args = parser.parse_args()
+
+    with open(args.config, "r", encoding="utf-8") as f:
+        config = yaml.safe_load(f) or {}
+    config["history_db_path"] = "log/soak_history.db"
+    config["auto_send_delay"] = 1
+
+    app = QApplication(sys.argv)
+    tracemalloc.start(25)
+
+    runner = SoakRunner(args, config)
+
+    samples = []
+    baseline_snapshot = None
+    baseline_threads = None
+    next_sample = 0.0
+    next_pause = args.pause_every
+    next_switch = args.switch_every
+    switch_index = 0
+    total_seconds = args.hours * 3600
+    start_wall = time.time()
+
+    try:
+        while True:
+            app.processEvents()
+            runner.track_worker()
+            audio_s = runner.audio_hours() * 3600
+            if audio_s >= total_seconds:
+                break
+
+            if audio_s >= next_pause and runner.worker is not None:
+                next_pause += args.pause_every
+                # 麦克风按钮: 暂停 -> 恢复
+                runner.window.toggle_recognition()
+                deadline = time.time() + args.pause_for
+                while time.time() < deadline:
+                    app.processEvents()
+                    time.sleep(0.05)
+                runner.window.toggle_recognition()
+                runner.pauses += 1
+
+            if audio_s >= next_switch and runner.worker is not None:
+                next_switch += args.switch_every
+                runner.switch_config(*CONFIG_SWITCHES[switch_index % len(CONFIG_SWITCHES)])
+                switch_index += 1
+
+            if audio_s >= next_sample:
+                next_sample += args.sample_every
+                current, _ = tracemalloc.get_traced_memory()
+                row = {
+                    "audio_hours": runner.audio_hours(),
+                    "wall_seconds": time.time() - start_wall,
+                    "rss_mb": get_rss_mb(),
+                    "py_mb": current / 1024 / 1024,
+                    "threads": get_thread_count(),
+                    "handles": get_handle_count(),
+                    "log_kb": runner.log_kb(),
+                    "results": runner.results,
+                }
+                samples.append(row)
+                if baseline_snapshot is None and row["audio_hours"] >= args.hours * args.warmup:
+                    baseline_snapshot = tracemalloc.take_snapshot()
+                    baseline_threads = row["threads"]
+                print(f"[soak] {row['audio_hours']:.2f}h 音频 | RSS {row['rss_mb']:.1f} MB | "
+                      f"py {row['py_mb']:.1f} MB | 线程 {row['threads']} | 句柄 {row['handles']} | "
+                      f"日志 {row['log_kb']:.0f} KB | 结果 {row['results']}")
+            time.sleep(0.05)
+    finally:
+        runner.track_worker()
+        runner.close()
+
+    # === 输出采样数据 ===
+    os.makedirs("log", exist_ok=True)
+    csv_path = args.csv or f"log/soak_{time.strftime('%Y%m%d_%H%M%S')}.csv"
+    if samples:
+        with open(csv_path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=list(samples[0].keys()))
+            writer.writeheader()
+            writer.writerows(samples)
+
+    # === 斜率判定 (忽略预热阶段) ===
+    steady = [r for r in samples if r["audio_hours"] >= args.hours * args.warmup]
+    hours = [r["audio_hours"] for r in steady]
+    rss_slope = slope_per_hour(hours, [r["rss_mb"] for r in steady])
+    py_slope = slope_per_hour(hours, [r["py_mb"] for r in steady])
+    handle_slope = slope_per_hour(hours, [r["handles"] for r in steady])
+    log_slope = slope_per_hour(hours, [r["log_kb"] for r in steady])
+    thread_growth = (steady[-1]["threads"] - baseline_threads) if steady and baseline_threads else 0
+
+    print("\n=== Soak 结果 ===")
+    print(f"音频 {runner.audio_hours():.2f} 小时 | 结果 {runner.results} 条 | "
+          f"暂停 {runner.pauses} 次 | 重启 {runner.restarts} 次 | 采样数据: {csv_path}")
+    checks = [
+        ("RSS 斜率 (MB/h)", rss_slope, args.max_rss_slope),
+        ("Python 堆斜率 (MB/h)", py_slope, args.max_py_slope),
+        ("句柄斜率 (个/h)", handle_slope, args.max_handle_slope),
+        ("线程增长 (个)", thread_growth, args.max_thread_growth),
+        ("识别日志斜率 (KB/h)", log_slope, args.max_log_slope),
+    ]
+    failed = False
+    for name, value, limit in checks:
+        ok = value <= limit
+        failed = failed or not ok
+        print(f"{'✅' if ok else '❌'} {name}: {value:.2f} (上限 {limit})")
+
+    if baseline_snapshot is not None:
+        print("\n=== tracemalloc 增长最多的分配位置 (相对预热后基线) ===")
+        stats = tracemalloc.take_snapshot().compare_to(baseline_snapshot, "lineno")
+        for stat in stats[:10]:
+            print(stat)
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()